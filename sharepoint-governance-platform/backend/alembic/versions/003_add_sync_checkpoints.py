@@ -0,0 +1,30 @@
+"""Add sync checkpoints table for delta-based discovery
+
+Revision ID: 003_add_sync_checkpoints
+Revises: 002_add_two_factor
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003_add_sync_checkpoints'
+down_revision = '002_add_two_factor'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create sync_checkpoints table
+    op.create_table(
+        'sync_checkpoints',
+        sa.Column('source', sa.String(length=100), nullable=False),
+        sa.Column('delta_link', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade():
+    op.drop_table('sync_checkpoints')
@@ -0,0 +1,23 @@
+"""Add watermark column to sync checkpoints
+
+Revision ID: 004_add_sync_watermark
+Revises: 003_add_sync_checkpoints
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_add_sync_watermark'
+down_revision = '003_add_sync_checkpoints'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('sync_checkpoints', sa.Column('watermark', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('sync_checkpoints', 'watermark')
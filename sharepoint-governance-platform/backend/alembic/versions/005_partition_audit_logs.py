@@ -0,0 +1,133 @@
+"""Partition audit_logs by month on event_datetime
+
+Revision ID: 005_partition_audit_logs
+Revises: 004_add_sync_watermark
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005_partition_audit_logs'
+down_revision = '004_add_sync_watermark'
+branch_labels = None
+depends_on = None
+
+# Months created past the current one; the maintenance job keeps this up
+PREMAKE_MONTHS = 3
+
+AUDIT_COLUMNS = (
+    "audit_id, event_type, operation, event_datetime, user_id, user_email, site_id, site_url, "
+    "resource_name, resource_type, client_ip, user_agent, result_status, details, ms_audit_id, "
+    "synced_from_ms365"
+)
+
+AUDIT_INDEXES = (
+    ('idx_audit_event_datetime', 'event_datetime'),
+    ('idx_audit_user_id', 'user_id'),
+    ('idx_audit_site_id', 'site_id'),
+    ('idx_audit_operation', 'operation'),
+    ('idx_audit_site_datetime', 'site_id, event_datetime'),
+)
+
+
+def _add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _drop_heap_indexes():
+    op.execute("DROP INDEX IF EXISTS ix_audit_ms_audit_id")
+    for name, _ in AUDIT_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def _create_indexes():
+    for name, columns in AUDIT_INDEXES:
+        op.execute(f"CREATE INDEX {name} ON audit_logs ({columns})")
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # Move the heap table aside; index and constraint names must be free
+    _drop_heap_indexes()
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_heap")
+    op.execute("ALTER TABLE audit_logs_heap RENAME CONSTRAINT audit_logs_pkey TO audit_logs_heap_pkey")
+
+    op.execute("""
+        CREATE TABLE audit_logs (
+            audit_id UUID NOT NULL,
+            event_type VARCHAR(100) NOT NULL,
+            operation VARCHAR(100) NOT NULL,
+            event_datetime TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            user_id UUID REFERENCES users (user_id),
+            user_email VARCHAR(255),
+            site_id UUID REFERENCES sharepoint_sites (site_id),
+            site_url VARCHAR(500),
+            resource_name VARCHAR(500),
+            resource_type VARCHAR(100),
+            client_ip VARCHAR(45),
+            user_agent VARCHAR(500),
+            result_status VARCHAR(50) NOT NULL,
+            details JSONB,
+            ms_audit_id VARCHAR(255),
+            synced_from_ms365 TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT audit_logs_pkey PRIMARY KEY (audit_id, event_datetime),
+            CONSTRAINT uq_audit_ms_audit_id UNIQUE (ms_audit_id, event_datetime)
+        ) PARTITION BY RANGE (event_datetime)
+    """)
+    _create_indexes()
+
+    # One partition per month from the oldest stored event, plus a few ahead
+    current = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    oldest = bind.execute(sa.text("SELECT min(event_datetime) FROM audit_logs_heap")).scalar()
+    month = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0) if oldest else current
+    while month <= _add_months(current, PREMAKE_MONTHS):
+        op.execute(
+            f"CREATE TABLE audit_logs_p{month:%Y_%m} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+        )
+        month = _add_months(month, 1)
+    op.execute("CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT")
+
+    # Copy history; the old unique index guarantees no ms_audit_id conflicts
+    op.execute(f"INSERT INTO audit_logs ({AUDIT_COLUMNS}) SELECT {AUDIT_COLUMNS} FROM audit_logs_heap")
+    op.execute("DROP TABLE audit_logs_heap")
+
+
+def downgrade():
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_partitioned")
+    op.execute("ALTER TABLE audit_logs_partitioned RENAME CONSTRAINT audit_logs_pkey TO audit_logs_partitioned_pkey")
+    for name, _ in AUDIT_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    op.create_table('audit_logs',
+        sa.Column('audit_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('operation', sa.String(length=100), nullable=False),
+        sa.Column('event_datetime', sa.DateTime(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('user_email', sa.String(length=255), nullable=True),
+        sa.Column('site_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('site_url', sa.String(length=500), nullable=True),
+        sa.Column('resource_name', sa.String(length=500), nullable=True),
+        sa.Column('resource_type', sa.String(length=100), nullable=True),
+        sa.Column('client_ip', sa.String(length=45), nullable=True),
+        sa.Column('user_agent', sa.String(length=500), nullable=True),
+        sa.Column('result_status', sa.String(length=50), nullable=False),
+        sa.Column('details', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('ms_audit_id', sa.String(length=255), nullable=True),
+        sa.Column('synced_from_ms365', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['site_id'], ['sharepoint_sites.site_id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+        sa.PrimaryKeyConstraint('audit_id')
+    )
+    op.execute(f"INSERT INTO audit_logs ({AUDIT_COLUMNS}) SELECT {AUDIT_COLUMNS} FROM audit_logs_partitioned")
+    op.execute("DROP TABLE audit_logs_partitioned")
+
+    op.create_index(op.f('ix_audit_ms_audit_id'), 'audit_logs', ['ms_audit_id'], unique=True)
+    _create_indexes()
@@ -0,0 +1,28 @@
+"""Add composite indexes for keyset pagination
+
+Revision ID: 006_add_keyset_indexes
+Revises: 005_partition_audit_logs
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_add_keyset_indexes'
+down_revision = '005_partition_audit_logs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (event_datetime, audit_id) also serves plain time-range scans
+    op.create_index('idx_audit_datetime_id', 'audit_logs', ['event_datetime', 'audit_id'], unique=False)
+    op.drop_index('idx_audit_event_datetime', table_name='audit_logs')
+    op.create_index('idx_site_name_id', 'sharepoint_sites', ['name', 'site_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_site_name_id', table_name='sharepoint_sites')
+    op.create_index('idx_audit_event_datetime', 'audit_logs', ['event_datetime'], unique=False)
+    op.drop_index('idx_audit_datetime_id', table_name='audit_logs')
@@ -0,0 +1,55 @@
+"""Add trigram and full-text search indexes
+
+Revision ID: 007_add_search_indexes
+Revises: 006_add_keyset_indexes
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007_add_search_indexes'
+down_revision = '006_add_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+# Name ranks above description, description above the words of the URL
+SITE_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('simple', regexp_replace(coalesce(site_url, ''), '[^[:alnum:]]+', ' ', 'g')), 'C')"
+)
+
+TRIGRAM_INDEXES = (
+    ('idx_site_name_trgm', 'sharepoint_sites', 'name'),
+    ('idx_site_url_trgm', 'sharepoint_sites', 'site_url'),
+    ('idx_audit_user_email_trgm', 'audit_logs', 'user_email'),
+    ('idx_audit_site_url_trgm', 'audit_logs', 'site_url'),
+)
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # GIN trigram indexes serve LIKE/ILIKE '%term%' (terms of 3+ characters)
+    for name, table, column in TRIGRAM_INDEXES:
+        op.create_index(
+            name, table, [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+    op.execute(
+        f"ALTER TABLE sharepoint_sites ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SITE_SEARCH_VECTOR}) STORED"
+    )
+    op.create_index('idx_site_search_vector', 'sharepoint_sites', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('idx_site_search_vector', table_name='sharepoint_sites')
+    op.drop_column('sharepoint_sites', 'search_vector')
+
+    for name, table, _ in TRIGRAM_INDEXES:
+        op.drop_index(name, table_name=table)
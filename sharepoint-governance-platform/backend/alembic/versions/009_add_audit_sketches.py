@@ -0,0 +1,33 @@
+"""Add daily audit sketches
+
+Revision ID: 009_add_audit_sketches
+Revises: 008_add_audit_rollups
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009_add_audit_sketches'
+down_revision = '008_add_audit_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled during ingest; existing history: python -m app.tasks.rollups --days N
+    op.create_table(
+        'audit_sketches',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('operation', sa.String(length=100), nullable=False),
+        sa.Column('dimension', sa.String(length=20), nullable=False),
+        sa.Column('distinct_sketch', sa.LargeBinary(), nullable=True),
+        sa.Column('top_sketch', sa.LargeBinary(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('day', 'operation', 'dimension')
+    )
+
+
+def downgrade():
+    op.drop_table('audit_sketches')
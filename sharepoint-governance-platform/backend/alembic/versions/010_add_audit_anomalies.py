@@ -0,0 +1,46 @@
+"""Add audit_anomalies and the ingest-time index for incremental scoring
+
+Revision ID: 010_add_audit_anomalies
+Revises: 009_add_audit_sketches
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '010_add_audit_anomalies'
+down_revision = '009_add_audit_sketches'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'audit_anomalies',
+        sa.Column('audit_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('event_datetime', sa.DateTime(), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('operation', sa.String(length=100), nullable=False),
+        sa.Column('user_email', sa.String(length=255), nullable=True),
+        sa.Column('site_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('site_url', sa.String(length=500), nullable=True),
+        sa.Column('anomaly_score', sa.Float(), nullable=False),
+        sa.Column('reason', sa.String(length=255), nullable=True),
+        sa.Column('model_version', sa.String(length=50), nullable=False),
+        sa.Column('detected_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('audit_id', 'event_datetime')
+    )
+    op.create_index('idx_anomaly_datetime', 'audit_anomalies', ['event_datetime'], unique=False)
+    op.create_index('idx_anomaly_site_datetime', 'audit_anomalies', ['site_id', 'event_datetime'], unique=False)
+
+    # New events are found by ingest time (created on every partition)
+    op.create_index('idx_audit_synced', 'audit_logs', ['synced_from_ms365'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_audit_synced', table_name='audit_logs')
+    op.drop_index('idx_anomaly_site_datetime', table_name='audit_anomalies')
+    op.drop_index('idx_anomaly_datetime', table_name='audit_anomalies')
+    op.drop_table('audit_anomalies')
@@ -0,0 +1,35 @@
+"""Add per-user and per-site behaviour baselines
+
+Revision ID: 011_add_behavior_baselines
+Revises: 010_add_audit_anomalies
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '011_add_behavior_baselines'
+down_revision = '010_add_audit_anomalies'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled during ingest; existing history: python -m app.tasks.rollups --days N --baselines
+    op.create_table(
+        'behavior_baselines',
+        sa.Column('entity_type', sa.String(length=20), nullable=False),
+        sa.Column('entity_key', sa.String(length=500), nullable=False),
+        sa.Column('profile', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('total_weight', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('event_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_event_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('entity_type', 'entity_key')
+    )
+
+
+def downgrade():
+    op.drop_table('behavior_baselines')
@@ -0,0 +1,46 @@
+"""Add materialized site risk scores
+
+Revision ID: 012_add_site_risk_scores
+Revises: 011_add_behavior_baselines
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '012_add_site_risk_scores'
+down_revision = '011_add_behavior_baselines'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled after the next site discovery or audit sync; until then a
+    # site's score is computed on first request
+    op.create_table(
+        'site_risk_scores',
+        sa.Column('site_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('site_name', sa.String(length=255), nullable=False),
+        sa.Column('site_url', sa.String(length=500), nullable=False),
+        sa.Column('risk_score', sa.Integer(), nullable=False),
+        sa.Column('risk_level', sa.String(length=20), nullable=False),
+        sa.Column('risk_factors', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('days_inactive', sa.Integer(), nullable=True),
+        sa.Column('storage_usage_percent', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('external_users', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('overdue_reviews', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('recent_anomalies', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('computed_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['site_id'], ['sharepoint_sites.site_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('site_id')
+    )
+    op.create_index('idx_site_risk_rank', 'site_risk_scores', ['risk_score', 'site_id'])
+    op.create_index('idx_site_risk_level', 'site_risk_scores', ['risk_level'])
+
+
+def downgrade():
+    op.drop_index('idx_site_risk_level', table_name='site_risk_scores')
+    op.drop_index('idx_site_risk_rank', table_name='site_risk_scores')
+    op.drop_table('site_risk_scores')
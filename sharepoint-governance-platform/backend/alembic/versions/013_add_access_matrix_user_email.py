@@ -0,0 +1,30 @@
+"""Add grantee email to access_matrix
+
+Revision ID: 013_add_access_matrix_user_email
+Revises: 012_add_site_risk_scores
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '013_add_access_matrix_user_email'
+down_revision = '012_add_site_risk_scores'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('access_matrix', sa.Column('user_email', sa.String(length=255), nullable=True))
+
+    # Directory users keep their rows; unresolved grantees (collapsed to one
+    # row per role before this column existed) are restored by the next discovery
+    op.execute(
+        "UPDATE access_matrix a SET user_email = u.email "
+        "FROM users u WHERE a.user_id = u.user_id"
+    )
+
+
+def downgrade():
+    op.drop_column('access_matrix', 'user_email')
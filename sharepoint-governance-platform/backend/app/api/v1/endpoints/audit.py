@@ -3,20 +3,27 @@ Audit API endpoints
 """
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from datetime import datetime, timedelta
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 import uuid
-import csv
-import io
 
 from app.api.deps import get_db, get_current_user, require_role
 from app.models.user import User, UserRole
 from app.models.audit import AuditLog
+from app.db.pagination import NEXT, PREV, InvalidCursor, encode_cursor, estimate_count, keyset_rows, paginate
+from app.services.audit_archive_service import get_audit_archive_service
+from app.services.audit_export_service import EXPORT_MEDIA_TYPES, AuditExportService
+from app.services.compliance_report_service import get_compliance_report_service
+from app.services.search_service import contains
 
 router = APIRouter()
 
+# Keyset pagination order for audit log listings (newest first)
+AUDIT_LOG_KEY = (AuditLog.event_datetime, AuditLog.audit_id)
+
 
 class AuditLogResponse(BaseModel):
     """Schema for audit log response"""
@@ -32,10 +39,20 @@ class AuditLogResponse(BaseModel):
     
     class Config:
         from_attributes = True
+    
+    @field_validator('audit_id', mode='before')
+    @classmethod
+    def _audit_id_str(cls, value):
+        return str(value)
+
+
+def _audit_log_key(log: AuditLogResponse) -> tuple:
+    return log.event_datetime, uuid.UUID(log.audit_id)
 
 
 @router.get("/logs", response_model=List[AuditLogResponse])
 async def query_audit_logs(
+    response: Response,
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     event_type: Optional[str] = None,
@@ -44,15 +61,26 @@ async def query_audit_logs(
     site_url: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor / X-Prev-Cursor of a previous page (replaces skip)"),
+    count: Optional[str] = Query(None, regex="^(exact|estimated)$"),
     user: User = Depends(require_role(UserRole.ADMIN, UserRole.AUDITOR, UserRole.COMPLIANCE_OFFICER)),
     db: Session = Depends(get_db)
 ):
     """
     Query audit logs with filters
     
+    Pages are keyed on (event_datetime, audit_id), newest first: follow the
+    X-Next-Cursor / X-Prev-Cursor response headers with ?cursor=. A non-zero
+    skip keeps the older offset pagination. With ?count=, X-Total-Count
+    carries the number of matching database (hot) rows, exact or estimated.
+    
+    Ranges reaching past the hot window are continued from the cold-tier
+    archive; archived rows follow the (newer) database rows.
+    
     Requires Admin, Auditor, or Compliance Officer role
     """
     query = db.query(AuditLog)
+    range_start = start_date
     
     # Apply filters
     if start_date:
@@ -63,7 +91,8 @@ async def query_audit_logs(
     else:
         # Default to last 30 days if no end date
         if not start_date:
-            query = query.filter(AuditLog.event_datetime >= datetime.utcnow() - timedelta(days=30))
+            range_start = datetime.utcnow() - timedelta(days=30)
+            query = query.filter(AuditLog.event_datetime >= range_start)
     
     if event_type:
         query = query.filter(AuditLog.event_type == event_type)
@@ -72,91 +101,115 @@ async def query_audit_logs(
         query = query.filter(AuditLog.operation == operation)
     
     if user_email:
-        query = query.filter(AuditLog.user_email.like(f"%{user_email}%"))
+        query = query.filter(contains(AuditLog.user_email, user_email))
     
     if site_url:
-        query = query.filter(AuditLog.site_url.like(f"%{site_url}%"))
-    
-    # Order by event datetime (newest first)
-    query = query.order_by(AuditLog.event_datetime.desc())
-    
-    # Apply pagination
-    logs = query.offset(skip).limit(limit).all()
+        query = query.filter(contains(AuditLog.site_url, site_url))
+    
+    archive = get_audit_archive_service(db)
+    reads_archive = archive.covers(range_start)
+    archive_filters = dict(
+        event_type=event_type,
+        operation=operation,
+        user_email=user_email,
+        site_url=site_url,
+    )
     
-    return [AuditLogResponse.from_orm(log) for log in logs]
+    if count == "exact":
+        response.headers["X-Total-Count"] = str(query.count())
+    elif count == "estimated":
+        response.headers["X-Total-Count"] = str(estimate_count(db, query))
+    
+    if skip and not cursor:
+        # Offset pagination (newest first)
+        logs = [
+            AuditLogResponse.from_orm(log)
+            for log in query.order_by(*[column.desc() for column in AUDIT_LOG_KEY]).offset(skip).limit(limit).all()
+        ]
+        
+        if len(logs) < limit and reads_archive:
+            # A short page means the database rows ran out within this page
+            hot_total = skip + len(logs) if logs else query.count()
+            archived = archive.query_logs(
+                range_start,
+                end_date,
+                skip=max(skip - hot_total, 0),
+                limit=limit - len(logs),
+                **archive_filters,
+            )
+            logs.extend(AuditLogResponse(**row) for row in archived)
+        
+        if len(logs) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(_audit_log_key(logs[-1]))
+        return logs
+    
+    def fetch(direction: str, key: Optional[list], n: int) -> List[AuditLogResponse]:
+        # Archived months are all older than the database rows: walking
+        # forward (older) they come after them, walking back before them
+        rows = []
+        if direction == PREV and reads_archive:
+            rows = [
+                AuditLogResponse(**row)
+                for row in archive.query_logs(range_start, end_date, limit=n, key=key, ascending=True, **archive_filters)
+            ]
+        if len(rows) < n:
+            rows.extend(
+                AuditLogResponse.from_orm(log)
+                for log in keyset_rows(query, AUDIT_LOG_KEY, direction, key, n - len(rows), descending=True)
+            )
+        if direction == NEXT and len(rows) < n and reads_archive:
+            rows.extend(
+                AuditLogResponse(**row)
+                for row in archive.query_logs(range_start, end_date, limit=n - len(rows), key=key, **archive_filters)
+            )
+        return rows
+    
+    try:
+        page = paginate(fetch, _audit_log_key, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.prev_cursor:
+        response.headers["X-Prev-Cursor"] = page.prev_cursor
+    return page.items
 
 
 @router.get("/logs/export")
 async def export_audit_logs(
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
-    format: str = Query("csv", regex="^(csv|json)$"),
-    user: User = Depends(require_role(UserRole.ADMIN, UserRole.AUDITOR, UserRole.COMPLIANCE_OFFICER)),
-    db: Session = Depends(get_db)
+    format: str = Query("csv", regex="^(csv|json|ndjson)$"),
+    gzip: bool = Query(False, description="Compress the export with gzip"),
+    user: User = Depends(require_role(UserRole.ADMIN, UserRole.AUDITOR, UserRole.COMPLIANCE_OFFICER))
 ):
     """
-    Export audit logs to CSV or JSON
+    Export audit logs to CSV, JSON or NDJSON
+    
+    The export is streamed: rows are read through a server-side cursor and
+    written out as they arrive, so memory use does not grow with the range.
+    Ranges reaching past the hot window include rows from the cold-tier archive.
     
     Requires Admin, Auditor, or Compliance Officer role
     """
-    query = db.query(AuditLog)
-    
-    # Apply date filters
-    if start_date:
-        query = query.filter(AuditLog.event_datetime >= start_date)
-    
-    if end_date:
-        query = query.filter(AuditLog.event_datetime <= end_date)
-    else:
+    range_start = start_date
+    if not start_date and not end_date:
         # Default to last 90 days for exports
-        if not start_date:
-            query = query.filter(AuditLog.event_datetime >= datetime.utcnow() - timedelta(days=90))
-    
-    logs = query.order_by(AuditLog.event_datetime.desc()).all()
-    
-    if format == "csv":
-        # Generate CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Event DateTime', 'Event Type', 'Operation', 'User Email',
-            'Site URL', 'Resource Name', 'Result Status', 'Client IP'
-        ])
-        
-        # Write data
-        for log in logs:
-            writer.writerow([
-                log.event_datetime.isoformat(),
-                log.event_type,
-                log.operation,
-                log.user_email or '',
-                log.site_url or '',
-                log.resource_name or '',
-                log.result_status,
-                log.client_ip or ''
-            ])
-        
-        csv_data = output.getvalue()
-        
-        return Response(
-            content=csv_data,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=audit_logs_{datetime.utcnow().strftime('%Y%m%d')}.csv"}
-        )
-    
-    else:  # JSON
-        logs_data = [AuditLogResponse.from_orm(log).dict() for log in logs]
-        
-        import json
-        json_data = json.dumps(logs_data, default=str, indent=2)
-        
-        return Response(
-            content=json_data,
-            media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename=audit_logs_{datetime.utcnow().strftime('%Y%m%d')}.json"}
-        )
+        range_start = datetime.utcnow() - timedelta(days=90)
+    
+    exporter = AuditExportService(range_start, end_date)
+    filename = f"audit_logs_{datetime.utcnow().strftime('%Y%m%d')}.{format}"
+    media_type = EXPORT_MEDIA_TYPES[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        exporter.stream(format, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 
 @router.get("/compliance-report")
@@ -170,49 +223,14 @@ async def generate_compliance_report(
     """
     Generate compliance report (GDPR, ISO 27001, SOX)
     
+    Returns summary counts, per-operation and per-day breakdowns, and the
+    100 most recent matching events.
+    
     Requires Admin or Compliance Officer role
     """
-    # Query relevant audit events based on compliance type
-    query = db.query(AuditLog).filter(
-        AuditLog.event_datetime >= start_date,
-        AuditLog.event_datetime <= end_date
-    )
-    
-    if report_type == "gdpr":
-        # GDPR-relevant operations: data access, export, deletion
-        operations = ['FileAccessed', 'FileDownloaded', 'FileDeleted', 'UserDeleted', 'SiteDeleted']
-        query = query.filter(AuditLog.operation.in_(operations))
-    
-    elif report_type == "iso27001":
-        # ISO 27001-relevant: security events, permission changes
-        operations = ['PermissionModified', 'SharingChanged', 'SecurityRoleChanged', 'SiteAccessChanged']
-        query = query.filter(AuditLog.operation.in_(operations))
-    
-    elif report_type == "sox":
-        # SOX-relevant: administrative actions, configuration changes
-        operations = ['ConfigurationChanged', 'PolicyModified', 'AdminActionPerformed']
-        query = query.filter(AuditLog.operation.in_(operations))
-    
-    logs = query.order_by(AuditLog.event_datetime.desc()).all()
-    
-    # Generate summary statistics
-    total_events = len(logs)
-    unique_users = len(set(log.user_email for log in logs if log.user_email))
-    unique_sites = len(set(log.site_url for log in logs if log.site_url))
-    
-    return {
-        "report_type": report_type.upper(),
-        "period": {
-            "start_date": start_date,
-            "end_date": end_date
-        },
-        "summary": {
-            "total_events": total_events,
-            "unique_users": unique_users,
-            "unique_sites": unique_sites
-        },
-        "events": [AuditLogResponse.from_orm(log) for log in logs[:100]]  # Limit to first 100
-    }
+    report = get_compliance_report_service(db).generate(report_type, start_date, end_date, sample_size=100)
+    report["events"] = [AuditLogResponse(**row) for row in report["events"]]
+    return report
 
 
 import logging
@@ -11,7 +11,7 @@ from app.api.deps import get_db, get_current_user
 from app.models.user import User, UserRole
 from app.models.site import SharePointSite, SiteOwnership, SiteClassification
 from app.models.access_review import AccessReviewCycle, ReviewStatus
-from app.models.audit import AuditLog
+from app.services.audit_rollup_service import get_audit_rollup_service
 
 router = APIRouter()
 
@@ -90,9 +90,7 @@ async def get_overview_metrics(
         
         # Recent audit activity (last 24 hours)
         yesterday = now - timedelta(hours=24)
-        recent_audit_events = db.query(AuditLog).filter(
-            AuditLog.event_datetime >= yesterday
-        ).count()
+        recent_audit_events = get_audit_rollup_service(db).event_count(yesterday)
         
         # Inactive sites (no activity in 90 days)
         ninety_days_ago = now - timedelta(days=90)
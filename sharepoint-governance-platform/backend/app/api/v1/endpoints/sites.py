@@ -2,7 +2,7 @@
 Sites API endpoints
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Background Tasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 import uuid
@@ -13,17 +13,28 @@ from app.models.site import SharePointSite, SiteOwnership, AccessMatrix, SiteCla
 from app.schemas.site import (
     SiteResponse, SiteListResponse, SiteHealthResponse,
     SiteDiscoveryResponse, SiteOwnerResponse, SiteAccessResponse,
-    SiteClassificationEnum
+    SiteClassificationEnum, SiteSearchResult
 )
 from app.services.site_discovery_service import SiteDiscoveryService
+from app.services.search_service import contains, get_site_search_service
+from app.db.pagination import InvalidCursor, encode_cursor, estimate_count, keyset_rows, paginate
 
 router = APIRouter()
 
+# Keyset pagination order for site listings
+SITE_LIST_KEY = (SharePointSite.name, SharePointSite.site_id)
+
+
+def _site_key(site: SharePointSite) -> tuple:
+    return site.name, site.site_id
+
 
 @router.get("/", response_model=SiteListResponse)
 async def list_sites(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor / prev_cursor of a previous page (replaces skip)"),
+    count: Optional[str] = Query(None, regex="^(exact|estimated|none)$"),
     classification: Optional[SiteClassificationEnum] = None,
     search: Optional[str] = None,
     is_archived: Optional[bool] = None,
@@ -36,6 +47,10 @@ async def list_sites(
     - Site owners see only their sites
     - Admins see all sites
     - Filters: classification, search, archived status
+    - Sorted by (name, site_id); pass next_cursor / prev_cursor back as
+      ?cursor= for keyset pages, or a non-zero skip for offset pages
+    - count: exact (default without a cursor), estimated, or none
+      (default with a cursor)
     """
     query = db.query(SharePointSite)
     
@@ -51,8 +66,8 @@ async def list_sites(
     if search:
         query = query.filter(
             or_(
-                SharePointSite.name.ilike(f"%{search}%"),
-                SharePointSite.site_url.ilike(f"%{search}%")
+                contains(SharePointSite.name, search, case_sensitive=False),
+                contains(SharePointSite.site_url, search, case_sensitive=False)
             )
         )
     
@@ -60,19 +75,70 @@ async def list_sites(
         query = query.filter(SharePointSite.is_archived == is_archived)
     
     # Get total count
-    total = query.count()
-    
-    # Apply pagination
-    sites = query.offset(skip).limit(limit).all()
+    count = count or ("none" if cursor else "exact")
+    total = None
+    if count == "exact":
+        total = query.count()
+    elif count == "estimated":
+        total = estimate_count(db, query)
+    
+    if skip and not cursor:
+        # Offset pagination
+        sites = query.order_by(*SITE_LIST_KEY).offset(skip).limit(limit).all()
+        next_cursor = encode_cursor(_site_key(sites[-1])) if len(sites) == limit else None
+        prev_cursor = None
+    else:
+        try:
+            page = paginate(
+                lambda direction, key, n: keyset_rows(query, SITE_LIST_KEY, direction, key, n),
+                _site_key,
+                limit,
+                cursor
+            )
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        sites, next_cursor, prev_cursor = page.items, page.next_cursor, page.prev_cursor
     
     return SiteListResponse(
         total=total,
         sites=[SiteResponse.from_orm(site) for site in sites],
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
     )
 
 
+@router.get("/search", response_model=List[SiteSearchResult])
+async def search_sites(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    classification: Optional[SiteClassificationEnum] = None,
+    is_archived: Optional[bool] = None,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Ranked search over site name, description and URL
+    
+    - Matches word prefixes, near-miss spellings of the name and URL substrings
+    - Site owners search only their sites
+    """
+    search_service = get_site_search_service(db)
+    results = search_service.search(
+        q,
+        limit=limit,
+        classification=classification.value if classification else None,
+        is_archived=is_archived,
+        owner_id=user.user_id if user.role == UserRole.SITE_OWNER else None
+    )
+    
+    return [
+        SiteSearchResult(**SiteResponse.from_orm(site).dict(), rank=rank)
+        for site, rank in results
+    ]
+
+
 @router.get("/{site_id}", response_model=SiteResponse)
 async def get_site(
     site_id: str,
@@ -287,7 +353,7 @@ async def trigger_site_discovery(
     async def run_discovery():
         try:
             discovery_service = SiteDiscoveryService(db)
-            stats = await discovery_service.discover_all_sites()
+            stats = await discovery_service.discover_sites()
             # TODO: Store job results in database
         except Exception as e:
             logger.error(f"Site discovery job {job_id} failed: {str(e)}")
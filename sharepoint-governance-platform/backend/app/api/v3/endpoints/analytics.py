@@ -1,9 +1,9 @@
 """
 Phase 3 AI Analytics & Advanced Compliance API Endpoints
 """
-from typing import Optional
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, Query, Response
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
@@ -11,6 +11,10 @@ from app.api.deps import get_db, get_current_user, require_role
 from app.models.user import User, UserRole
 from app.services.anomaly_detection_service import get_anomaly_detection_service, AnomalyDetectionService
 from app.services.reporting_service import get_reporting_service, ReportingService
+from app.services.compliance_report_service import get_compliance_report_service
+from app.services.audit_sketch_service import get_audit_sketch_service
+from app.services.site_risk_service import get_site_risk_service
+from app.db.pagination import InvalidCursor
 
 router = APIRouter()
 
@@ -25,7 +29,7 @@ async def get_access_anomalies(
     db: Session = Depends(get_db),
     ai_service: AnomalyDetectionService = Depends(get_anomaly_detection_service)
 ):
-    """Detect anomalous access patterns using AI"""
+    """Anomalous access patterns flagged by the anomaly model after each audit sync"""
     anomalies = await ai_service.detect_access_anomalies(site_id=site_id, days=days)
     return {"anamalies": anomalies, "total": len(anomalies)}
 
@@ -37,11 +41,52 @@ async def get_site_risk_score(
     db: Session = Depends(get_db),
     ai_service: AnomalyDetectionService = Depends(get_anomaly_detection_service)
 ):
-    """Calculate AI-powered risk score for a site"""
-    risk_data = await ai_service.calculate_site_risk_score(site_id)
+    """Risk score for a site, recomputed after site discovery and each audit sync"""
+    try:
+        risk_data = await ai_service.calculate_site_risk_score(site_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     return risk_data
 
 
+@router.get("/sites/risk-ranking")
+async def get_site_risk_ranking(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page"),
+    risk_level: Optional[str] = Query(None, regex="^(low|medium|high|critical)$"),
+    user: User = Depends(require_role(UserRole.ADMIN, UserRole.AUDITOR, UserRole.EXECUTIVE)),
+    db: Session = Depends(get_db)
+):
+    """Tenant-wide site ranking by risk score, highest first"""
+    try:
+        page = get_site_risk_service(db).ranking(limit=limit, cursor=cursor, risk_level=risk_level)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "sites": page.items,
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor
+    }
+
+
+@router.get("/audit/approximate")
+async def get_approximate_audit_activity(
+    start_date: date = Query(...),
+    end_date: date = Query(...),
+    operation: Optional[List[str]] = Query(None, description="Restrict to these operations"),
+    top: int = Query(10, ge=1, le=50),
+    user: User = Depends(require_role(UserRole.ADMIN, UserRole.AUDITOR, UserRole.EXECUTIVE, UserRole.COMPLIANCE_OFFICER)),
+    db: Session = Depends(get_db)
+):
+    """
+    Approximate unique users/sites and most active users/sites for a date range
+    
+    Answered from daily HyperLogLog and Top-K sketches instead of scanning
+    audit logs; estimates carry the error bounds returned with them.
+    """
+    return get_audit_sketch_service(db).summary(start_date, end_date, operations=operation, top=top)
+
+
 # Advanced Reporting Endpoints
 
 class ReportRequest(BaseModel):
@@ -86,7 +131,7 @@ async def generate_gdpr_report(
     
     Includes: data access logs, deletion evidence, processing records
     """
-    # TODO: Implement GDPR-specific report logic
+    report = get_compliance_report_service(db).generate("gdpr", start_date, end_date)
     return {
         "report_type": "GDPR",
         "period": {
@@ -94,6 +139,10 @@ async def generate_gdpr_report(
             "end": end_date.isoformat()
         },
         "status": "generated",
+        "summary": report["summary"],
+        "by_operation": report["by_operation"],
+        "by_day": report["by_day"],
+        "events": report["events"],
         "sections": [
             "Data Access Logs",
             "Right to Erasure Evidence",
@@ -115,7 +164,7 @@ async def generate_iso27001_report(
     
     Includes: access controls, security incidents, change management
     """
-    # TODO: Implement ISO 27001-specific report logic
+    report = get_compliance_report_service(db).generate("iso27001", start_date, end_date)
     return {
         "report_type": "ISO 27001",
         "period": {
@@ -123,6 +172,10 @@ async def generate_iso27001_report(
             "end": end_date.isoformat()
         },
         "status": "generated",
+        "summary": report["summary"],
+        "by_operation": report["by_operation"],
+        "by_day": report["by_day"],
+        "events": report["events"],
         "sections": [
             "Access Control Evidence",
             "Security Incident Logs",
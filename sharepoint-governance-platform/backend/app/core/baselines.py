@@ -0,0 +1,147 @@
+"""
+Exponentially decayed behaviour profiles for per-user and per-site baselines
+
+A profile keeps decayed weights for the hour of day, the operation and the
+peer (the site a user touches, or the user touching a site) of past events.
+Scoring an event compares each of its weights with the largest weight of the
+same kind: log2((max + 1) / (weight + 1)) bits, so a night-shift user's usual
+hours score 0 however unusual they are across the tenant.
+
+Weights are kept relative to as_of. advance() decays the whole profile once
+per batch (O(size)); add() and deviation() are O(1) per event.
+"""
+from typing import Any, Dict, Optional
+from datetime import datetime
+import math
+
+HOURS = 24
+
+
+def _relative_surprise(weight: float, max_weight: float) -> float:
+    # +1 smoothing: an unseen value against a single past event is 1 bit
+    return math.log2((max_weight + 1.0) / (weight + 1.0))
+
+
+class BehaviorProfile:
+    """
+    Decayed hour-of-day, operation and peer weights of one user or site
+
+    Each event adds a weight of 1 at its own time; weights halve every
+    half_life_days. Peers beyond max_peers (the least weighted ones) are
+    dropped when the profile is serialized.
+    """
+
+    def __init__(self, half_life_days: float = 14.0, max_peers: int = 200):
+        self.half_life_seconds = half_life_days * 86400.0
+        self.max_peers = max_peers
+        self.as_of: Optional[datetime] = None
+        self.total = 0.0
+        self.events = 0
+        self.hours = [0.0] * HOURS
+        self.operations: Dict[str, float] = {}
+        self.peers: Dict[str, float] = {}
+        self._max_operation = 0.0
+        self._max_peer = 0.0
+
+    def _decay(self, seconds: float) -> float:
+        return 0.5 ** (seconds / self.half_life_seconds)
+
+    def advance(self, when: datetime):
+        """Decay all weights to a later time (no-op for an earlier one)"""
+        if self.as_of is None:
+            self.as_of = when
+            return
+        if when <= self.as_of:
+            return
+
+        factor = self._decay((when - self.as_of).total_seconds())
+        self.as_of = when
+        self.total *= factor
+        self.hours = [weight * factor for weight in self.hours]
+        self.operations = {key: weight * factor for key, weight in self.operations.items()}
+        self.peers = {key: weight * factor for key, weight in self.peers.items()}
+        self._max_operation *= factor
+        self._max_peer *= factor
+
+    def _weight(self, when: datetime) -> float:
+        if self.as_of is None:
+            self.as_of = when
+        if when > self.as_of:
+            self.advance(when)
+            return 1.0
+        # Older than as_of (out of order within a batch, or late-arriving)
+        return self._decay((self.as_of - when).total_seconds())
+
+    def add(self, when: datetime, operation: str, peer: Optional[str] = None):
+        """
+        Add an event
+
+        Args:
+            when: Event time (naive UTC)
+            operation: Operation name
+            peer: Site URL for a user profile, user email for a site profile
+        """
+        weight = self._weight(when)
+        self.total += weight
+        self.events += 1
+        self.hours[when.hour] += weight
+
+        operation_weight = self.operations.get(operation, 0.0) + weight
+        self.operations[operation] = operation_weight
+        self._max_operation = max(self._max_operation, operation_weight)
+
+        if peer:
+            peer_weight = self.peers.get(peer, 0.0) + weight
+            self.peers[peer] = peer_weight
+            self._max_peer = max(self._max_peer, peer_weight)
+
+    def deviation(self, when: datetime, operation: str, peer: Optional[str] = None) -> Dict[str, float]:
+        """
+        How unusual an event is for this profile, per component
+
+        Args:
+            when: Event time (naive UTC)
+            operation: Operation name
+            peer: Site URL for a user profile, user email for a site profile
+
+        Returns:
+            Bits of relative surprise for 'hour', 'operation' and 'peer'
+            (0 for the most usual value)
+        """
+        return {
+            'hour': _relative_surprise(self.hours[when.hour], max(self.hours)),
+            'operation': _relative_surprise(self.operations.get(operation, 0.0), self._max_operation),
+            'peer': _relative_surprise(self.peers.get(peer, 0.0), self._max_peer) if peer else 0.0,
+        }
+
+    def distinct_peers(self, min_weight: float = 0.05) -> int:
+        """Number of peers whose decayed weight is still at least min_weight"""
+        return sum(1 for weight in self.peers.values() if weight >= min_weight)
+
+    def to_dict(self) -> Dict[str, Any]:
+        if len(self.peers) > self.max_peers:
+            kept = sorted(self.peers.items(), key=lambda item: item[1], reverse=True)[:self.max_peers]
+            self.peers = dict(kept)
+        return {
+            'as_of': self.as_of.isoformat() if self.as_of else None,
+            'total': self.total,
+            'events': self.events,
+            'hours': self.hours,
+            'operations': self.operations,
+            'peers': self.peers,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], half_life_days: float = 14.0, max_peers: int = 200) -> "BehaviorProfile":
+        profile = cls(half_life_days, max_peers)
+        if not data:
+            return profile
+        profile.as_of = datetime.fromisoformat(data['as_of']) if data.get('as_of') else None
+        profile.total = data.get('total', 0.0)
+        profile.events = data.get('events', 0)
+        profile.hours = list(data.get('hours') or [0.0] * HOURS)
+        profile.operations = dict(data.get('operations') or {})
+        profile.peers = dict(data.get('peers') or {})
+        profile._max_operation = max(profile.operations.values(), default=0.0)
+        profile._max_peer = max(profile.peers.values(), default=0.0)
+        return profile
@@ -20,6 +20,7 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     DATABASE_POOL_SIZE: int = 20
     DATABASE_MAX_OVERFLOW: int = 10
+    BULK_WRITE_CHUNK_SIZE: int = 1000  # rows per bulk INSERT/COPY statement
     
     # Redis
     REDIS_URL: str
@@ -30,6 +31,30 @@ class Settings(BaseSettings):
     CLIENT_ID: str
     CLIENT_SECRET: str
     SHAREPOINT_SITE_URL: str
+    # Email domains of tenant users; grantees outside them are external
+    # (empty: grantees missing from the user directory are external)
+    TENANT_DOMAINS: List[str] = []
+    
+    # Microsoft Graph transport (shared async connection pool)
+    GRAPH_API_BASE_URL: str = "https://graph.microsoft.com/v1.0"
+    GRAPH_HTTP2_ENABLED: bool = True
+    GRAPH_MAX_CONNECTIONS: int = 100
+    GRAPH_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    GRAPH_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    GRAPH_REQUEST_TIMEOUT: float = 60.0  # seconds
+    GRAPH_CONNECT_TIMEOUT: float = 10.0  # seconds
+    GRAPH_BATCH_MAX_RETRIES: int = 3  # retries for failed $batch sub-requests
+    GRAPH_PAGE_SIZE: int = 500  # $top for paged collections
+    
+    # Microsoft 365 throttling (shared token buckets, AIMD-adjusted)
+    GRAPH_RATE_LIMIT_PER_SECOND: float = 50.0
+    GRAPH_RATE_LIMIT_BURST: int = 100
+    SHAREPOINT_RATE_LIMIT_PER_SECOND: float = 20.0
+    SHAREPOINT_RATE_LIMIT_BURST: int = 40
+    THROTTLE_MIN_RATE_PER_SECOND: float = 1.0
+    THROTTLE_MAX_RETRIES: int = 5
+    THROTTLE_BACKOFF_BASE_SECONDS: float = 1.0
+    THROTTLE_BACKOFF_MAX_SECONDS: float = 60.0
     
     # Active Directory
     LDAP_SERVER: str
@@ -55,12 +80,45 @@ class Settings(BaseSettings):
             return [i.strip() for i in v.split(",")]
         return v
     
+    @validator("TENANT_DOMAINS", pre=True)
+    def assemble_tenant_domains(cls, v):
+        if isinstance(v, str):
+            v = v.split(",")
+        return [i.strip().lower() for i in v if i.strip()]
+    
     # Background Jobs (cron expressions)
     SITE_DISCOVERY_SCHEDULE_CRON: str = "0 2 * * *"  # 2 AM daily
     AUDIT_SYNC_SCHEDULE_CRON: str = "0 */6 * * *"  # Every 6 hours
     ACCESS_REVIEW_SCHEDULE_CRON: str = "0 0 1 1,4,7,10 *"  # Quarterly (1st day of Jan, Apr, Jul, Oct)
     USER_SYNC_SCHEDULE_CRON: str = "0 1 * * *"  # 1 AM daily
-    
+    AUDIT_PARTITION_SCHEDULE_CRON: str = "30 0 * * *"  # 12:30 AM daily
+    ANOMALY_TRAINING_SCHEDULE_CRON: str = "0 3 * * *"  # 3 AM daily
+    
+    # Audit Sync
+    AUDIT_INGEST_CHUNK_SIZE: int = 2000  # audit rows per INSERT ... ON CONFLICT DO NOTHING + commit
+    AUDIT_SYNC_INITIAL_LOOKBACK_HOURS: int = 6  # window for the first run without a watermark
+    AUDIT_SYNC_OVERLAP_MINUTES: int = 10  # re-read before the watermark to catch late-arriving events
+    AUDIT_SYNC_WINDOW_HOURS: int = 6  # catch-up is fetched in windows of at most this size
+    AUDIT_SYNC_MAX_WINDOWS_PER_RUN: int = 28  # bound on catch-up work per run (remaining windows wait)
+    AUDIT_FETCH_SHARDS: int = 4  # time slices fetched concurrently per window (1 = sequential)
+    AUDIT_FETCH_MIN_SHARD_MINUTES: int = 30  # short windows use fewer slices so none is smaller than this
+    AUDIT_BACKFILL_SHARDS: int = 16  # time slices fetched concurrently by AuditService.backfill
+    
+    # Site Discovery
+    SITE_DISCOVERY_MODE: str = "delta"  # "delta" (incremental via /sites/delta) or "full" (re-list every site)
+    DISCOVERY_WORKERS: int = 8  # concurrent enrichment workers
+    DISCOVERY_GRAPH_CONCURRENCY: int = 4  # concurrent Graph $batch calls
+    DISCOVERY_SHAREPOINT_CONCURRENCY: int = 8  # concurrent SharePoint REST calls
+    SITE_URL_INDEX_MAX_AGE_SECONDS: int = 3600  # audit sync rebuilds an older site URL index
+    
+    # ML Service (batch risk inference)
+    ML_SERVICE_URL: str = "http://ml-service:8001"
+    ML_MAX_CONNECTIONS: int = 8
+    ML_REQUEST_TIMEOUT: float = 60.0  # seconds
+    ML_BATCH_SIZE: int = 5000  # sites per /predict/risk/batch request
+    ML_MAX_CONCURRENT_REQUESTS: int = 4  # batch requests in flight at once
+    ML_MAX_RETRIES: int = 3  # retries for transport errors and 502/503/504
+
     # Rate Limiting
     API_RATE_LIMIT: int = 100  # requests per period
     API_RATE_LIMIT_PERIOD: int = 60  # seconds
@@ -92,14 +150,38 @@ class Settings(BaseSettings):
     CACHE_TTL_DASHBOARD_METRICS: int = 30  # seconds
     CACHE_TTL_SITE_METADATA: int = 3600  # 1 hour
     CACHE_TTL_PERMISSIONS: int = 300  # 5 minutes
+    EXPORT_FETCH_ROWS: int = 5000  # rows per server-side cursor fetch in streaming exports
+    EXPORT_CHUNK_BYTES: int = 65536  # response chunk size for streaming exports
+    AUDIT_SKETCH_HLL_PRECISION: int = 12  # HyperLogLog registers = 2^precision (1.6% error at 12)
+    AUDIT_SKETCH_CMS_WIDTH: int = 1024  # Count-Min counters per row (overcount <= e/width of events)
+    AUDIT_SKETCH_CMS_DEPTH: int = 4  # Count-Min rows (bound holds with probability 1 - e^-depth)
+    AUDIT_SKETCH_TOP_K: int = 50  # heavy hitters tracked per day, operation and dimension
     
     # Feature Flags
     FEATURE_AI_ANOMALY_DETECTION: bool = False
     FEATURE_POWER_BI_INTEGRATION: bool = False # Corrected from original instruction
     FEATURE_MULTI_TENANT: bool = False # Retained from original
     
+    # Anomaly Detection
+    ANOMALY_MODEL_DIR: str = "/app/storage/models"  # persisted (joblib) anomaly models
+    ANOMALY_MODEL_MAX_AGE_HOURS: int = 36  # scoring trains a new model first if the current one is older
+    ANOMALY_MODEL_KEEP_VERSIONS: int = 5  # model versions kept on disk
+    ANOMALY_TRAINING_WINDOW_DAYS: int = 30  # rolling window of audit events a model is fitted on
+    ANOMALY_TRAINING_MAX_ROWS: int = 200000  # events sampled to fit a model
+    ANOMALY_SCORING_BATCH_ROWS: int = 50000  # newly ingested events scored per batch
+    ANOMALY_BASELINE_HALF_LIFE_DAYS: float = 14.0  # per-user/per-site behaviour weights halve this often
+    ANOMALY_BASELINE_MIN_WEIGHT: float = 20.0  # decayed events a baseline needs before it scores events
+    ANOMALY_BASELINE_THRESHOLD_BITS: float = 5.0  # deviation (bits; 5 = 32x rarer than usual) from a baseline flagged as anomalous
+    ANOMALY_BASELINE_MAX_PEERS: int = 200  # sites per user / users per site kept in a baseline
+    
     # Retention Policy
     AUDIT_LOG_RETENTION_MONTHS: int = 12
+    AUDIT_PARTITION_PREMAKE_MONTHS: int = 3  # monthly audit_logs partitions created ahead of time
+    AUDIT_PARTITION_EXPIRED_ACTION: str = "drop"  # "drop" or "detach" (keep expired partitions as standalone tables)
+    AUDIT_ARCHIVE_ENABLED: bool = True  # export expired audit partitions to Parquet before removing them
+    AUDIT_ARCHIVE_URI: str = "/app/storage/audit-archive"  # local path or object store URI (e.g. s3://bucket/audit-archive)
+    AUDIT_ARCHIVE_RETENTION_YEARS: int = 7  # archived months older than this are deleted
+    AUDIT_ARCHIVE_BATCH_ROWS: int = 50000  # rows streamed per Parquet batch
     ACCESS_REVIEW_RETENTION_YEARS: int = 7
     SYSTEM_LOG_RETENTION_DAYS: int = 30
     
@@ -0,0 +1,284 @@
+"""
+Bulk persistence helpers for high-volume writes
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from datetime import datetime
+from enum import Enum
+import csv
+import io
+import json
+import logging
+import uuid
+
+from sqlalchemy import Table, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Marker for NULL in COPY ... (FORMAT csv) payloads
+COPY_NULL = r"\N"
+
+
+class BulkWriter:
+    """
+    Chunked bulk writes that bypass per-object ORM flushes
+
+    On PostgreSQL, upserts use INSERT ... ON CONFLICT DO UPDATE and plain
+    inserts stream through COPY. Other dialects fall back to multi-row
+    INSERT statements so the same code path runs under SQLite in tests.
+    All statements run on the session's connection, inside its transaction.
+    """
+
+    def __init__(self, db: Session, chunk_size: Optional[int] = None):
+        self.db = db
+        self.chunk_size = chunk_size or settings.BULK_WRITE_CHUNK_SIZE
+
+    @property
+    def is_postgresql(self) -> bool:
+        return self.db.get_bind().dialect.name == "postgresql"
+
+    def _chunks(self, rows: Sequence[Any]) -> Iterable[Sequence[Any]]:
+        for start in range(0, len(rows), self.chunk_size):
+            yield rows[start:start + self.chunk_size]
+
+    def upsert(
+        self,
+        model,
+        rows: List[Dict[str, Any]],
+        conflict_columns: List[str],
+        update_columns: List[str],
+        returning: Optional[List[str]] = None,
+        increment_columns: Optional[List[str]] = None
+    ) -> List[Any]:
+        """
+        INSERT ... ON CONFLICT (conflict_columns) DO UPDATE in chunks
+
+        Args:
+            model: Mapped class to write
+            rows: Column/value dicts; Python-side column defaults are applied
+            conflict_columns: Unique columns identifying an existing row
+            update_columns: Columns overwritten when the row already exists
+            returning: Columns to return for every inserted or updated row
+            increment_columns: Counter columns added to (existing + new)
+                instead of overwritten when the row already exists
+
+        Returns:
+            Returned rows (empty if returning is not given)
+        """
+        table = model.__table__
+        insert_fn = postgresql.insert if self.is_postgresql else sqlite.insert
+        rows = self._prepare(table, rows)
+        returned = []
+
+        for chunk in self._chunks(rows):
+            stmt = insert_fn(table).values(list(chunk))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=conflict_columns,
+                set_={
+                    **{column: stmt.excluded[column] for column in update_columns},
+                    **{column: table.c[column] + stmt.excluded[column] for column in increment_columns or []},
+                },
+            )
+            if returning:
+                stmt = stmt.returning(*[table.c[column] for column in returning])
+                returned.extend(self.db.execute(stmt).all())
+            else:
+                self.db.execute(stmt)
+
+        return returned
+
+    def insert_ignore(
+        self,
+        model,
+        rows: List[Dict[str, Any]],
+        conflict_columns: List[str],
+        returning: Optional[List[str]] = None
+    ) -> List[Any]:
+        """
+        INSERT ... ON CONFLICT (conflict_columns) DO NOTHING in chunks
+
+        Lets the unique index deduplicate instead of checking rows one by one.
+
+        Args:
+            model: Mapped class to write
+            rows: Column/value dicts; Python-side column defaults are applied
+            conflict_columns: Unique columns identifying a duplicate
+            returning: Columns to return for the rows actually inserted
+
+        Returns:
+            Returned rows for inserted rows only (empty if returning is not given)
+        """
+        table = model.__table__
+        insert_fn = postgresql.insert if self.is_postgresql else sqlite.insert
+        rows = self._prepare(table, rows)
+        returned = []
+
+        for chunk in self._chunks(rows):
+            stmt = insert_fn(table).values(list(chunk)).on_conflict_do_nothing(index_elements=conflict_columns)
+            if returning:
+                stmt = stmt.returning(*[table.c[column] for column in returning])
+                returned.extend(self.db.execute(stmt).all())
+            else:
+                self.db.execute(stmt)
+
+        return returned
+
+    def update_by_pk(self, model, rows: List[Dict[str, Any]]):
+        """
+        Bulk UPDATE rows identified by their primary key
+
+        Args:
+            model: Mapped class to write
+            rows: Dicts holding the primary key plus the columns to change
+        """
+        for chunk in self._chunks(rows):
+            self.db.execute(update(model), list(chunk))
+
+    def insert(self, model, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert rows in chunks, streaming them through COPY on PostgreSQL
+
+        Args:
+            model: Mapped class to write
+            rows: Column/value dicts; Python-side column defaults are applied
+
+        Returns:
+            Number of rows written
+        """
+        if not rows:
+            return 0
+
+        table = model.__table__
+        rows = self._prepare(table, rows)
+
+        for chunk in self._chunks(rows):
+            if self.is_postgresql:
+                self._copy(table, chunk)
+            else:
+                self.db.execute(insert(table), list(chunk))
+
+        return len(rows)
+
+    def sync_children(
+        self,
+        model,
+        parent_column: str,
+        parent_ids: List[Any],
+        rows: List[Dict[str, Any]],
+        key_columns: List[str]
+    ) -> Dict[str, int]:
+        """
+        Make a child table match the given rows for a set of parents
+
+        Rows are compared on key_columns: only rows that disappeared are
+        deleted and only new rows are inserted, so unchanged rows (and their
+        original timestamps) are left alone instead of being rewritten.
+
+        Args:
+            model: Mapped child class (e.g. AccessMatrix)
+            parent_column: Foreign key column naming the parent (e.g. 'site_id')
+            parent_ids: Parents whose children are being replaced
+            rows: Desired child rows for those parents
+            key_columns: Columns identifying a logical row; must include parent_column
+
+        Returns:
+            Counts of 'inserted' and 'deleted' rows
+        """
+        table = model.__table__
+        pk = table.primary_key.columns.values()[0]
+        key_cols = [table.c[column] for column in key_columns]
+
+        existing = {}
+        for chunk in self._chunks(list(parent_ids)):
+            result = self.db.execute(
+                select(pk, *key_cols).where(table.c[parent_column].in_(chunk))
+            )
+            for row in result:
+                existing.setdefault(tuple(row[1:]), []).append(row[0])
+
+        wanted = {}
+        for row in rows:
+            wanted.setdefault(tuple(row.get(column) for column in key_columns), row)
+
+        stale_ids = [
+            row_id
+            for key, row_ids in existing.items() if key not in wanted
+            for row_id in row_ids
+        ]
+        # Keys that appear more than once in the table collapse to one row
+        stale_ids.extend(
+            row_id
+            for key, row_ids in existing.items() if key in wanted
+            for row_id in row_ids[1:]
+        )
+        new_rows = [row for key, row in wanted.items() if key not in existing]
+
+        for chunk in self._chunks(stale_ids):
+            self.db.execute(delete(table).where(pk.in_(chunk)))
+        self.insert(model, new_rows)
+
+        return {'inserted': len(new_rows), 'deleted': len(stale_ids)}
+
+    def _copy(self, table: Table, rows: Sequence[Dict[str, Any]]):
+        """Stream rows into a table with COPY ... FROM STDIN (CSV)"""
+        columns = list(rows[0].keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([self._copy_value(row.get(column)) for column in columns])
+        buffer.seek(0)
+
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        sql = f"COPY {table.name} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+
+        # Raw DBAPI (psycopg2) connection bound to the session's transaction
+        dbapi_connection = self.db.connection().connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
+
+    @staticmethod
+    def _copy_value(value: Any) -> Any:
+        """Render a Python value in PostgreSQL's CSV input format"""
+        if value is None:
+            return COPY_NULL
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        if isinstance(value, Enum):
+            # Enum columns store member names, matching SQLAlchemy's Enum type
+            return value.name
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, default=str)
+        return value
+
+    @staticmethod
+    def _prepare(table: Table, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Apply Python-side column defaults the ORM would normally fill in and
+        give every row the same keys, as multi-row statements and COPY need
+        """
+        columns = [
+            column for column in table.columns
+            if column.default is not None or any(column.name in row for row in rows)
+        ]
+
+        prepared = []
+        for row in rows:
+            values = {}
+            for column in columns:
+                if column.name in row:
+                    values[column.name] = row[column.name]
+                elif column.default is None:
+                    values[column.name] = None
+                elif column.default.is_scalar:
+                    values[column.name] = column.default.arg
+                elif column.default.is_callable:
+                    values[column.name] = column.default.arg(None)
+            prepared.append(values)
+        return prepared
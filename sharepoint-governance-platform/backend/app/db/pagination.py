@@ -0,0 +1,231 @@
+"""
+Keyset (cursor) pagination and row count estimates
+"""
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from datetime import datetime
+import base64
+import binascii
+import json
+import uuid
+
+from sqlalchemy import literal, text, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+NEXT = "next"
+PREV = "prev"
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing"""
+
+    def __init__(self, items: List[Any], next_cursor: Optional[str], prev_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"t": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"u": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "t" in value:
+            return datetime.fromisoformat(value["t"])
+        if "u" in value:
+            return uuid.UUID(value["u"])
+        raise InvalidCursor("Unknown cursor value")
+    return value
+
+
+def encode_cursor(key: Sequence[Any], direction: str = NEXT) -> str:
+    """
+    Build an opaque cursor pointing just past a row
+
+    Args:
+        key: Sort key of the row (e.g. (event_datetime, audit_id))
+        direction: NEXT for rows after the key, PREV for rows before it
+
+    Returns:
+        URL-safe base64 token
+    """
+    payload = json.dumps({"k": [_encode_value(value) for value in key], "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[List[Any], str]:
+    """
+    Decode a cursor built by encode_cursor
+
+    Returns:
+        (sort key, direction)
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key = [_decode_value(value) for value in payload["k"]]
+        direction = payload["d"]
+    except (ValueError, KeyError, TypeError, binascii.Error) as e:
+        raise InvalidCursor("Invalid pagination cursor") from e
+
+    if direction not in (NEXT, PREV) or not key:
+        raise InvalidCursor("Invalid pagination cursor")
+    return key, direction
+
+
+def paginate(
+    fetch: Callable[[str, Optional[List[Any]], int], List[Any]],
+    key_of: Callable[[Any], Sequence[Any]],
+    limit: int,
+    cursor: Optional[str] = None
+) -> KeysetPage:
+    """
+    Fetch one page around a cursor
+
+    Args:
+        fetch: fetch(direction, key, n) returning up to n rows strictly after
+            key (NEXT) or before it (PREV), in the order they are walked;
+            key is None for the first page
+        key_of: Sort key of a row
+        limit: Page size
+        cursor: Cursor from a previous page (None for the first page)
+
+    Returns:
+        The page in listing order, with cursors for the neighbouring pages
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    key, direction = decode_cursor(cursor) if cursor else (None, NEXT)
+
+    # One extra row tells whether another page follows
+    rows = fetch(direction, key, limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == PREV:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage([], None, None)
+
+    first, last = key_of(rows[0]), key_of(rows[-1])
+    if direction == NEXT:
+        next_cursor = encode_cursor(last, NEXT) if has_more else None
+        prev_cursor = encode_cursor(first, PREV) if key is not None else None
+    else:
+        next_cursor = encode_cursor(last, NEXT)
+        prev_cursor = encode_cursor(first, PREV) if has_more else None
+
+    return KeysetPage(rows, next_cursor, prev_cursor)
+
+
+def keyset_rows(
+    query: Query,
+    columns: Sequence[Any],
+    direction: str,
+    key: Optional[Sequence[Any]],
+    limit: int,
+    descending: bool = False
+) -> List[Any]:
+    """
+    Rows of a query strictly after (or before) a key, using a row-value comparison
+
+    (a, b) < (:a, :b) lets PostgreSQL seek straight into a matching composite
+    index instead of counting past skipped rows.
+
+    Args:
+        query: Filtered query without ORDER BY
+        columns: Sort columns, ending with a unique column
+        direction: NEXT or PREV
+        key: Sort key to continue from (None = start of the listing)
+        limit: Maximum rows to return
+        descending: Whether the listing is sorted descending
+
+    Returns:
+        Rows in the order they are walked (reversed for PREV)
+    """
+    walk_descending = descending == (direction == NEXT)
+
+    if key is not None:
+        row = tuple_(*columns)
+        bound = tuple_(*[literal(value, column.type) for value, column in zip(key, columns)])
+        query = query.filter(row < bound if walk_descending else row > bound)
+
+    order = [column.desc() if walk_descending else column.asc() for column in columns]
+    return query.order_by(*order).limit(limit).all()
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) wrapper so the statement keeps its bound parameters"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def table_row_estimate(db: Session, table_name: str) -> int:
+    """
+    Row count of a table from pg_class statistics (summed over partitions)
+
+    Args:
+        db: Database session (PostgreSQL)
+        table_name: Table to estimate
+
+    Returns:
+        Estimated row count as of the last ANALYZE/autovacuum
+    """
+    estimate = db.execute(
+        text(
+            "SELECT coalesce(sum(greatest(c.reltuples, 0)), 0) FROM pg_class c "
+            "WHERE c.oid = to_regclass(:table) "
+            "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:table))"
+        ),
+        {"table": table_name},
+    ).scalar()
+    return int(estimate or 0)
+
+
+def estimate_count(db: Session, query: Query) -> int:
+    """
+    Cheap row count for a listing query
+
+    On PostgreSQL an unfiltered query over one table is answered from
+    pg_class, anything else from the planner's row estimate (EXPLAIN, which
+    does not run the query). Other databases run an exact COUNT.
+
+    Args:
+        db: Database session
+        query: Filtered listing query
+
+    Returns:
+        Estimated number of rows
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return query.count()
+
+    froms = query.statement.get_final_froms()
+    if query.whereclause is None and len(froms) == 1 and hasattr(froms[0], "name"):
+        return table_row_estimate(db, froms[0].name)
+
+    plan = db.execute(_Explain(query.order_by(None).statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -1,33 +1,69 @@
 """
 Microsoft Graph API client for SharePoint and M365 integration
 """
-from typing import List, Dict, Optional, Any
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Any
 from datetime import datetime, timedelta
+import asyncio
 import logging
 
-from msgraph.core import GraphClient
-from azure.identity import ClientSecretCredential
 from app.core.config import settings
+from app.integrations.graph_transport import GraphTransport
+from app.integrations.throttling import (
+    graph_limiter, parse_retry_after, backoff_delay, RETRY_ATTEMPTS, THROTTLE_STATUSES,
+)
 
 logger = logging.getLogger(__name__)
 
+# Microsoft Graph accepts at most 20 sub-requests per $batch call
+GRAPH_BATCH_LIMIT = 20
+
+# Sub-request statuses worth retrying on their own
+RETRYABLE_BATCH_STATUSES = {429, 500, 502, 503, 504}
+
 
 class MicrosoftGraphService:
     """Microsoft Graph API client wrapper"""
     
     def __init__(self):
         """Initialize Graph client with app credentials"""
-        self.credential = ClientSecretCredential(
-            tenant_id=settings.TENANT_ID,
-            client_id=settings.CLIENT_ID,
-            client_secret=settings.CLIENT_SECRET
-        )
-        self.client = GraphClient(credential=self.credential)
+        self.transport = GraphTransport()
+    
+    async def aclose(self):
+        """Release pooled Graph connections"""
+        await self.transport.aclose()
+    
+    async def iter_sites(
+        self,
+        search: Optional[str] = None,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Iterate over SharePoint sites in the tenant one page at a time
+        
+        Args:
+            search: Optional search query to filter sites
+            page_size: Sites per page (default: GRAPH_PAGE_SIZE)
+        
+        Yields:
+            Lists of site objects
+        """
+        params = {
+            "$select": "id,name,displayName,webUrl,createdDateTime,lastModifiedDateTime,description",
+            "$top": page_size or settings.GRAPH_PAGE_SIZE,
+        }
+        
+        if search:
+            params["$search"] = f"\"{search}\""
+        
+        async for sites in self.transport.iter_pages("/sites", params=params):
+            yield sites
     
     async def get_all_sites(self, search: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Get all SharePoint sites in the tenant
         
+        Prefer iter_sites() for large tenants; this holds every page in memory.
+        
         Args:
             search: Optional search query to filter sites
         
@@ -35,18 +71,9 @@ class MicrosoftGraphService:
             List of site objects
         """
         try:
-            endpoint = "/sites?$select=id,name,displayName,webUrl,createdDateTime,lastModifiedDateTime,description"
-            
-            if search:
-                endpoint += f"&$search=\"{search}\""
-            
-            response = self.client.get(endpoint)
-            sites = response.json().get('value', [])
-            
-            # Handle pagination
-            while '@odata.nextLink' in response.json():
-                response = self.client.get(response.json()['@odata.nextLink'])
-                sites.extend(response.json().get('value', []))
+            sites = []
+            async for page in self.iter_sites(search):
+                sites.extend(page)
             
             logger.info(f"Retrieved {len(sites)} sites from Microsoft Graph")
             return sites
@@ -55,6 +82,34 @@ class MicrosoftGraphService:
             logger.error(f"Error retrieving sites: {str(e)}")
             raise
     
+    async def iter_sites_delta(
+        self,
+        delta_link: Optional[str] = None
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Iterate over site changes via the /sites/delta query
+        
+        Without a delta link every site in the tenant is returned (a full
+        resync). Removed sites carry a 'deleted' facet.
+        
+        Args:
+            delta_link: @odata.deltaLink saved from a previous run
+        
+        Yields:
+            (sites, delta_link) tuples; delta_link is only set on the final page
+        
+        Raises:
+            GraphRequestError: HTTP 410 if the delta link has expired and a
+                full resync is required
+        """
+        if delta_link:
+            pages = self.transport.iter_delta_pages(delta_link)
+        else:
+            pages = self.transport.iter_delta_pages("/sites/delta")
+        
+        async for sites, next_delta_link in pages:
+            yield sites, next_delta_link
+    
     async def get_site_by_url(self, site_url: str) -> Optional[Dict[str, Any]]:
         """
         Get site details by URL
@@ -75,9 +130,7 @@ class MicrosoftGraphService:
             path = '/' + parts[1] if len(parts) > 1 else ''
             
             endpoint = f"/sites/{hostname}:{path}"
-            response = self.client.get(endpoint)
-            
-            return response.json()
+            return await self.transport.get(endpoint)
         
         except Exception as e:
             logger.error(f"Error retrieving site {site_url}: {str(e)}")
@@ -92,43 +145,280 @@ class MicrosoftGraphService:
         
         Returns:
             List of permission objects
+        
+        Raises:
+            GraphRequestError: If the permissions could not be retrieved. An empty
+                list is never returned on failure, so callers do not mistake a
+                throttled call for a site without permissions.
         """
         try:
             endpoint = f"/sites/{site_id}/permissions"
-            response = self.client.get(endpoint)
-            permissions = response.json().get('value', [])
+            page = await self.transport.get(endpoint)
+            permissions = page.get('value', [])
             
             logger.info(f"Retrieved {len(permissions)} permissions for site {site_id}")
             return permissions
         
         except Exception as e:
             logger.error(f"Error retrieving permissions for site {site_id}: {str(e)}")
-            return []
+            raise
     
-    async def get_site_owners(self, site_id: str) -> List[Dict[str, Any]]:
+    async def get_site_permissions_batch(self, site_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Get permissions for many sites using JSON batching
+        
+        Args:
+            site_ids: Microsoft Graph site IDs
+        
+        Returns:
+            Mapping of site ID to permission objects. Sites whose sub-request
+            failed are left out so callers can keep their existing data.
+        """
+        requests = [
+            {"id": str(idx), "method": "GET", "url": f"/sites/{site_id}/permissions"}
+            for idx, site_id in enumerate(site_ids)
+        ]
+        
+        try:
+            responses = await self.batch(requests)
+        except Exception as e:
+            logger.error(f"Error retrieving permissions for {len(site_ids)} sites via $batch: {str(e)}")
+            return {}
+        
+        permissions = {}
+        for idx, site_id in enumerate(site_ids):
+            response = responses.get(str(idx))
+            if response and response.get('status', 500) < 400:
+                permissions[site_id] = (response.get('body') or {}).get('value', [])
+            else:
+                status = response.get('status') if response else 'no response'
+                logger.error(f"Error retrieving permissions for site {site_id}: batch status {status}")
+        
+        logger.info(f"Retrieved permissions for {len(permissions)}/{len(site_ids)} sites via $batch")
+        return permissions
+    
+    async def batch(self, requests: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Execute sub-requests through the Graph JSON $batch endpoint
+        
+        Requests are packed into $batch calls of up to 20 sub-requests.
+        Sub-requests that fail with a throttling or server error are
+        retried individually, honouring their Retry-After header.
+        
+        Args:
+            requests: Sub-requests, each with 'id', 'method' and 'url'
+                (plus optional 'body' and 'headers')
+        
+        Returns:
+            Mapping of sub-request ID to its response ('status', 'headers', 'body')
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = list(requests)
+        attempt = 0
+        
+        while pending:
+            retry = []
+            retry_after = 0.0
+            
+            for start in range(0, len(pending), GRAPH_BATCH_LIMIT):
+                chunk = pending[start:start + GRAPH_BATCH_LIMIT]
+                by_id = {request['id']: request for request in chunk}
+                
+                body = await self.transport.post("/$batch", json={"requests": chunk})
+                
+                for response in (body or {}).get('responses', []):
+                    request_id = response.get('id')
+                    results[request_id] = response
+                    
+                    status = response.get('status')
+                    if status in RETRYABLE_BATCH_STATUSES and request_id in by_id:
+                        retry.append(by_id[request_id])
+                        headers = response.get('headers') or {}
+                        sub_retry_after = parse_retry_after(headers.get('Retry-After')) or 0.0
+                        retry_after = max(retry_after, sub_retry_after)
+                        if status in THROTTLE_STATUSES:
+                            graph_limiter.record_throttle(status, sub_retry_after)
+            
+            if not retry or attempt >= settings.GRAPH_BATCH_MAX_RETRIES:
+                if retry:
+                    logger.warning(f"Giving up on {len(retry)} Graph batch sub-requests after {attempt + 1} attempts")
+                break
+            
+            delay = retry_after or backoff_delay(attempt)
+            logger.info(f"Retrying {len(retry)} Graph batch sub-requests in {delay:.1f}s")
+            RETRY_ATTEMPTS.labels("graph").inc(len(retry))
+            await asyncio.sleep(delay)
+            attempt += 1
+            pending = retry
+        
+        return results
+    
+    @staticmethod
+    def filter_owners(permissions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Select owner/write grants from a site's permission objects"""
+        return [
+            p for p in permissions
+            if 'roles' in p and ('owner' in p['roles'] or 'write' in p['roles'])
+        ]
+    
+    async def get_site_owners(
+        self,
+        site_id: str,
+        permissions: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Get site owners/administrators
         
         Args:
             site_id: Microsoft Graph site ID
+            permissions: Already-fetched permissions for the site, if available
         
         Returns:
             List of owner objects
         """
-        try:
-            # Get site owners via permissions with role filter
+        # Get site owners via permissions with role filter; failures propagate
+        # from get_site_permissions rather than looking like "no owners"
+        if permissions is None:
             permissions = await self.get_site_permissions(site_id)
-            
-            owners = [
-                p for p in permissions
-                if 'roles' in p and ('owner' in p['roles'] or 'write' in p['roles'])
-            ]
-            
-            return owners
         
-        except Exception as e:
-            logger.error(f"Error retrieving owners for site {site_id}: {str(e)}")
-            return []
+        return self.filter_owners(permissions)
+    
+    async def iter_audit_logs(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        operations: Optional[List[str]] = None,
+        page_size: Optional[int] = None,
+        end_inclusive: bool = True
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Iterate over Microsoft 365 audit log events one page at a time
+        
+        Args:
+            start_date: Start date for audit logs
+            end_date: End date for audit logs
+            operations: Optional list of operations to filter (e.g., FileAccessed, FileModified)
+            page_size: Events per page (default: GRAPH_PAGE_SIZE)
+            end_inclusive: Include events at exactly end_date; time slices
+                other than the last exclude it so adjacent slices do not overlap
+        
+        Yields:
+            Lists of audit log events
+        """
+        # Format dates for Graph API
+        start_str = start_date.isoformat() + 'Z'
+        end_str = end_date.isoformat() + 'Z'
+        end_operator = 'le' if end_inclusive else 'lt'
+        
+        audit_filter = f"activityDateTime ge {start_str} and activityDateTime {end_operator} {end_str}"
+        
+        if operations:
+            operations_filter = ' or '.join([f"operationType eq '{op}'" for op in operations])
+            audit_filter += f" and ({operations_filter})"
+        
+        params = {
+            "$filter": audit_filter,
+            "$top": page_size or settings.GRAPH_PAGE_SIZE,
+        }
+        
+        async for logs in self.transport.iter_pages("/auditLogs/directoryAudits", params=params):
+            yield logs
+    
+    async def iter_audit_logs_sharded(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        operations: Optional[List[str]] = None,
+        shards: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Iterate over audit log events, fetching time slices concurrently
+        
+        The range is split into equal slices, each followed through its own
+        nextLink chain in a separate task. Pages are yielded as they arrive,
+        so they are not in time order across slices. Every request still goes
+        through the shared Graph rate limiter, so slices share one throttling
+        budget. A bounded queue keeps at most a few pages per slice in memory.
+        
+        Args:
+            start_date: Start date for audit logs
+            end_date: End date for audit logs
+            operations: Optional list of operations to filter
+            shards: Number of slices (default: AUDIT_FETCH_SHARDS, reduced so
+                no slice is shorter than AUDIT_FETCH_MIN_SHARD_MINUTES)
+        
+        Yields:
+            Lists of audit log events
+        """
+        slices = self._audit_time_slices(start_date, end_date, shards)
+        if len(slices) == 1:
+            async for logs in self.iter_audit_logs(start_date, end_date, operations):
+                yield logs
+            return
+        
+        logger.info(f"Fetching audit logs from {start_date} to {end_date} in {len(slices)} slices")
+        
+        queue: asyncio.Queue = asyncio.Queue(maxsize=len(slices) * 2)
+        done = object()
+        
+        async def fetch_slice(slice_start: datetime, slice_end: datetime, last: bool):
+            try:
+                async for logs in self.iter_audit_logs(
+                    slice_start, slice_end, operations, end_inclusive=last
+                ):
+                    await queue.put(logs)
+                await queue.put(done)
+            except Exception as e:
+                await queue.put(e)
+        
+        tasks = [
+            asyncio.create_task(fetch_slice(slice_start, slice_end, index == len(slices) - 1))
+            for index, (slice_start, slice_end) in enumerate(slices)
+        ]
+        
+        try:
+            remaining = len(tasks)
+            while remaining:
+                item = await queue.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            # Stop the other slices if one failed or the consumer stopped early
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    @staticmethod
+    def _audit_time_slices(
+        start_date: datetime,
+        end_date: datetime,
+        shards: Optional[int] = None
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        Split [start_date, end_date] into equal, contiguous time slices
+        
+        Args:
+            start_date: Start of the range
+            end_date: End of the range
+            shards: Requested number of slices (default: AUDIT_FETCH_SHARDS)
+        
+        Returns:
+            (slice_start, slice_end) pairs in time order
+        """
+        span = end_date - start_date
+        min_slice = timedelta(minutes=settings.AUDIT_FETCH_MIN_SHARD_MINUTES)
+        count = shards or settings.AUDIT_FETCH_SHARDS
+        if min_slice > timedelta(0):
+            count = min(count, int(span / min_slice))
+        count = max(count, 1)
+        
+        step = span / count
+        boundaries = [start_date + step * index for index in range(count)] + [end_date]
+        return list(zip(boundaries[:-1], boundaries[1:]))
     
     async def get_audit_logs(
         self,
@@ -139,6 +429,8 @@ class MicrosoftGraphService:
         """
         Get audit logs from Microsoft 365 Unified Audit Log
         
+        Prefer iter_audit_logs() for large windows; this holds every page in memory.
+        
         Args:
             start_date: Start date for audit logs
             end_date: End date for audit logs
@@ -148,23 +440,9 @@ class MicrosoftGraphService:
             List of audit log events
         """
         try:
-            # Format dates for Graph API
-            start_str = start_date.isoformat() + 'Z'
-            end_str = end_date.isoformat() + 'Z'
-            
-            endpoint = f"/auditLogs/directoryAudits?$filter=activityDateTime ge {start_str} and activityDateTime le {end_str}"
-            
-            if operations:
-                operations_filter = ' or '.join([f"operationType eq '{op}'" for op in operations])
-                endpoint += f" and ({operations_filter})"
-            
-            response = self.client.get(endpoint)
-            logs = response.json().get('value', [])
-            
-            # Handle pagination
-            while '@odata.nextLink' in response.json():
-                response = self.client.get(response.json()['@odata.nextLink'])
-                logs.extend(response.json().get('value', []))
+            logs = []
+            async for page in self.iter_audit_logs(start_date, end_date, operations):
+                logs.extend(page)
             
             logger.info(f"Retrieved {len(logs)} audit log entries")
             return logs
@@ -185,13 +463,33 @@ class MicrosoftGraphService:
         """
         try:
             endpoint = f"/users/{email}"
-            response = self.client.get(endpoint)
-            return response.json()
+            return await self.transport.get(endpoint)
         
         except Exception as e:
             logger.warning(f"User not found: {email}")
             return None
     
+    async def iter_group_members(
+        self,
+        group_id: str,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Iterate over members of a group one page at a time
+        
+        Args:
+            group_id: Microsoft 365 group ID
+            page_size: Members per page (default: GRAPH_PAGE_SIZE)
+        
+        Yields:
+            Lists of member objects
+        """
+        endpoint = f"/groups/{group_id}/members"
+        params = {"$top": page_size or settings.GRAPH_PAGE_SIZE}
+        
+        async for members in self.transport.iter_pages(endpoint, params=params):
+            yield members
+    
     async def get_group_members(self, group_id: str) -> List[Dict[str, Any]]:
         """
         Get members of a group
@@ -203,14 +501,9 @@ class MicrosoftGraphService:
             List of member objects
         """
         try:
-            endpoint = f"/groups/{group_id}/members"
-            response = self.client.get(endpoint)
-            members = response.json().get('value', [])
-            
-            # Handle pagination
-            while '@odata.nextLink' in response.json():
-                response = self.client.get(response.json()['@odata.nextLink'])
-                members.extend(response.json().get('value', []))
+            members = []
+            async for page in self.iter_group_members(group_id):
+                members.extend(page)
             
             return members
         
@@ -227,8 +520,8 @@ class MicrosoftGraphService:
         """
         try:
             endpoint = "/security/retentionPolicies"
-            response = self.client.get(endpoint)
-            policies = response.json().get('value', [])
+            page = await self.transport.get(endpoint)
+            policies = page.get('value', [])
             
             logger.info(f"Retrieved {len(policies)} retention policies")
             return policies
@@ -276,7 +569,7 @@ class MicrosoftGraphService:
             
             # Send from configured email address
             endpoint = f"/users/{settings.EMAIL_FROM}/sendMail"
-            self.client.post(endpoint, data=message)
+            await self.transport.post(endpoint, json=message)
             
             logger.info(f"Email sent to {to_email}: {subject}")
             return True
@@ -0,0 +1,243 @@
+"""
+Async HTTP transport for Microsoft Graph built on httpx
+"""
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Any
+import asyncio
+import logging
+import time
+
+import httpx
+from azure.identity.aio import ClientSecretCredential
+
+from app.core.config import settings
+from app.integrations.throttling import (
+    graph_limiter, parse_retry_after, backoff_delay,
+    RETRY_ATTEMPTS, RETRYABLE_STATUSES, THROTTLE_STATUSES,
+)
+
+logger = logging.getLogger(__name__)
+
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+
+# Refresh the bearer token this many seconds before it expires
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+
+class GraphRequestError(Exception):
+    """Raised when Microsoft Graph answers with an error status"""
+
+    def __init__(self, status_code: int, message: str, response: Optional[httpx.Response] = None):
+        super().__init__(f"Graph request failed with HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.response = response
+
+
+class GraphTransport:
+    """
+    Pooled async transport for Microsoft Graph
+
+    A single httpx.AsyncClient is shared by every caller so connections are
+    kept alive (and multiplexed over HTTP/2) instead of being re-established
+    per request. Nothing here blocks the event loop. Every request passes
+    through the shared Graph rate limiter and is retried on throttling.
+    """
+
+    def __init__(self):
+        """Initialize credentials; the HTTP client is created lazily"""
+        self.credential = ClientSecretCredential(
+            tenant_id=settings.TENANT_ID,
+            client_id=settings.CLIENT_ID,
+            client_secret=settings.CLIENT_SECRET
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._token: Optional[str] = None
+        self._token_expires_on: float = 0.0
+        self._token_lock: Optional[asyncio.Lock] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get or create the shared connection pool"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=settings.GRAPH_API_BASE_URL,
+                http2=settings.GRAPH_HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=settings.GRAPH_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.GRAPH_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.GRAPH_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    settings.GRAPH_REQUEST_TIMEOUT,
+                    connect=settings.GRAPH_CONNECT_TIMEOUT,
+                ),
+            )
+            logger.info(
+                f"Graph connection pool created (http2={settings.GRAPH_HTTP2_ENABLED}, "
+                f"max_connections={settings.GRAPH_MAX_CONNECTIONS})"
+            )
+        return self._client
+
+    async def _get_token(self) -> str:
+        """Return a cached bearer token, refreshing it shortly before expiry"""
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+
+        async with self._token_lock:
+            if self._token is None or time.time() >= self._token_expires_on - TOKEN_REFRESH_MARGIN_SECONDS:
+                access_token = await self.credential.get_token(GRAPH_SCOPE)
+                self._token = access_token.token
+                self._token_expires_on = float(access_token.expires_on)
+
+        return self._token
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """
+        Send a request to Microsoft Graph
+
+        Args:
+            method: HTTP method
+            url: Path relative to GRAPH_API_BASE_URL or an absolute URL (e.g. @odata.nextLink)
+            params: Optional query parameters
+            json: Optional JSON body
+            headers: Optional extra headers
+
+        Returns:
+            The successful httpx response
+
+        Raises:
+            GraphRequestError: If Graph returns a 4xx/5xx status after retries
+        """
+        max_retries = settings.THROTTLE_MAX_RETRIES
+
+        for attempt in range(max_retries + 1):
+            await graph_limiter.acquire()
+
+            request_headers = {
+                "Authorization": f"Bearer {await self._get_token()}",
+                "Accept": "application/json",
+            }
+            if headers:
+                request_headers.update(headers)
+
+            try:
+                response = await self._get_client().request(
+                    method,
+                    url,
+                    params=params,
+                    json=json,
+                    headers=request_headers,
+                )
+            except httpx.TransportError as e:
+                if attempt == max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"Graph transport error ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                RETRY_ATTEMPTS.labels("graph").inc()
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code in RETRYABLE_STATUSES and attempt < max_retries:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code in THROTTLE_STATUSES:
+                    graph_limiter.record_throttle(response.status_code, retry_after)
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                logger.info(f"Graph returned HTTP {response.status_code} for {method} {url}, retrying in {delay:.1f}s")
+                RETRY_ATTEMPTS.labels("graph").inc()
+                await asyncio.sleep(delay)
+                continue
+
+            break
+
+        if response.status_code >= 400:
+            if response.status_code in THROTTLE_STATUSES:
+                graph_limiter.record_throttle(response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+            raise GraphRequestError(response.status_code, self._error_message(response), response)
+
+        graph_limiter.on_success()
+        return response
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """GET a Graph resource and return the decoded JSON body"""
+        response = await self.request("GET", url, params=params)
+        return response.json()
+
+    async def iter_pages(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Follow @odata.nextLink and yield one page of items at a time
+
+        Only the current page is held in memory; each response body is
+        decoded exactly once.
+
+        Args:
+            url: Path of the collection relative to GRAPH_API_BASE_URL
+            params: Query parameters for the first request (nextLink URLs
+                already carry them)
+
+        Yields:
+            The 'value' list of each page
+        """
+        page = await self.get(url, params=params)
+
+        while True:
+            next_link = page.get('@odata.nextLink')
+            yield page.get('value', [])
+
+            if not next_link:
+                break
+            page = await self.get(next_link)
+
+    async def iter_delta_pages(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Follow a delta query and yield one page of changes at a time
+
+        Args:
+            url: Delta function path, or a previously saved @odata.deltaLink
+            params: Query parameters for the first request
+
+        Yields:
+            (items, delta_link) tuples; delta_link is None except on the last
+            page, where it is the link to resume from next time
+        """
+        page = await self.get(url, params=params)
+
+        while True:
+            next_link = page.get('@odata.nextLink')
+            yield page.get('value', []), page.get('@odata.deltaLink')
+
+            if not next_link:
+                break
+            page = await self.get(next_link)
+
+    async def post(self, url: str, json: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """POST to a Graph resource and return the decoded JSON body, if any"""
+        response = await self.request("POST", url, json=json)
+        return response.json() if response.content else None
+
+    async def aclose(self):
+        """Close the connection pool and credential"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("Graph connection pool closed")
+        self._client = None
+        await self.credential.close()
+
+    def _error_message(self, response: httpx.Response) -> str:
+        """Extract the Graph error message from an error response"""
+        try:
+            return response.json().get('error', {}).get('message') or response.reason_phrase
+        except ValueError:
+            return response.reason_phrase
@@ -0,0 +1,140 @@
+"""
+Async client for the ML inference service (ml_service)
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import asyncio
+import logging
+
+import httpx
+
+from app.core.config import settings
+from app.integrations.throttling import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Statuses retried with backoff (ml_service restarting or not ready yet)
+ML_RETRYABLE_STATUSES = {502, 503, 504}
+
+
+class MLServiceError(Exception):
+    """Raised when the ML service answers with an error status"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"ML service request failed with HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+
+class MLServiceClient:
+    """
+    Pooled async client for ml_service
+
+    One httpx.AsyncClient is shared so connections are kept alive across
+    calls. Batch predictions are split into ML_BATCH_SIZE chunks, sent
+    ML_MAX_CONCURRENT_REQUESTS at a time, so the whole tenant is scored in a
+    few dozen requests instead of one per site.
+    """
+
+    def __init__(self):
+        """The HTTP client is created lazily"""
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get or create the shared connection pool"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=settings.ML_SERVICE_URL,
+                limits=httpx.Limits(
+                    max_connections=settings.ML_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.ML_MAX_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(settings.ML_REQUEST_TIMEOUT),
+            )
+        return self._client
+
+    async def _post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST to ml_service, retrying transport errors and 502/503/504"""
+        max_retries = settings.ML_MAX_RETRIES
+
+        for attempt in range(max_retries + 1):
+            try:
+                response = await self._get_client().post(url, json=payload)
+            except httpx.TransportError as e:
+                if attempt == max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"ML service transport error ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code in ML_RETRYABLE_STATUSES and attempt < max_retries:
+                delay = backoff_delay(attempt)
+                logger.warning(f"ML service returned HTTP {response.status_code}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.is_error:
+                raise MLServiceError(response.status_code, response.text)
+            return response.json()
+
+    async def is_ready(self) -> bool:
+        """Whether ml_service has its model loaded"""
+        try:
+            response = await self._get_client().get("/ready")
+        except httpx.TransportError:
+            return False
+        return response.status_code == 200
+
+    async def predict_risk_batch(
+        self,
+        site_ids: Sequence[str],
+        features: Dict[str, Sequence[float]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Risk predictions for many sites
+
+        Args:
+            site_ids: Site IDs
+            features: Feature name -> one value per site, in site_ids order
+
+        Returns:
+            Site ID -> {"risk_score", "anomalies", "confidence", "model_version"}
+
+        Raises:
+            MLServiceError: If ml_service rejects a chunk
+        """
+        site_ids = [str(site_id) for site_id in site_ids]
+        size = settings.ML_BATCH_SIZE
+        semaphore = asyncio.Semaphore(settings.ML_MAX_CONCURRENT_REQUESTS)
+
+        async def predict_chunk(start: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._post("/predict/risk/batch", {
+                    "site_ids": site_ids[start:start + size],
+                    "features": {name: list(values[start:start + size]) for name, values in features.items()},
+                })
+
+        chunks: List[Dict[str, Any]] = await asyncio.gather(
+            *[predict_chunk(start) for start in range(0, len(site_ids), size)]
+        )
+
+        predictions = {}
+        for chunk in chunks:
+            for site_id, risk_score, anomalies in zip(chunk["site_ids"], chunk["risk_scores"], chunk["anomalies"]):
+                predictions[site_id] = {
+                    "risk_score": risk_score,
+                    "anomalies": anomalies,
+                    "confidence": chunk["confidence"],
+                    "model_version": chunk["model_version"],
+                }
+        return predictions
+
+    async def aclose(self):
+        """Close the connection pool"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("ML service connection pool closed")
+        self._client = None
+
+
+# Global ML service client instance
+ml_client = MLServiceClient()
@@ -3,17 +3,28 @@ SharePoint client using Office365-REST-Python-Client
 """
 from typing import List, Dict, Optional, Any
 import logging
+import time
 
 from office365.sharepoint.client_context import ClientContext
 from office365.runtime.auth.client_credential import ClientCredential
+from office365.runtime.client_request_exception import ClientRequestException
 
 from app.core.config import settings
+from app.integrations.throttling import (
+    sharepoint_limiter, parse_retry_after, backoff_delay,
+    RETRY_ATTEMPTS, RETRYABLE_STATUSES, THROTTLE_STATUSES,
+)
 
 logger = logging.getLogger(__name__)
 
 
 class SharePointService:
-    """SharePoint Online client wrapper"""
+    """
+    SharePoint Online client wrapper
+
+    Calls are blocking and may sleep for a throttle pause or Retry-After;
+    async callers run them with asyncio.to_thread.
+    """
     
     def __init__(self, site_url: Optional[str] = None):
         """
@@ -34,6 +45,40 @@ class SharePointService:
         url = site_url or self.site_url
         return ClientContext(url).with_credentials(self.credentials)
     
+    def _execute_query(self, ctx: ClientContext):
+        """
+        Execute pending queries under the SharePoint rate limiter
+        
+        Retries HTTP 429/5xx responses with Retry-After or jittered
+        exponential backoff. The failed query is re-queued before retrying,
+        the same way ClientContext.execute_query_retry does.
+        """
+        max_retries = settings.THROTTLE_MAX_RETRIES
+        
+        for attempt in range(max_retries + 1):
+            sharepoint_limiter.acquire_sync()
+            try:
+                ctx.execute_query()
+                sharepoint_limiter.on_success()
+                return
+            except ClientRequestException as e:
+                response = getattr(e, 'response', None)
+                status_code = response.status_code if response is not None else None
+                if status_code not in RETRYABLE_STATUSES:
+                    raise
+                
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if status_code in THROTTLE_STATUSES:
+                    sharepoint_limiter.record_throttle(status_code, retry_after)
+                if attempt == max_retries:
+                    raise
+                
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                logger.info(f"SharePoint returned HTTP {status_code}, retrying in {delay:.1f}s")
+                RETRY_ATTEMPTS.labels("sharepoint").inc()
+                ctx.add_query(ctx.current_query)
+                time.sleep(delay)
+    
     def get_site_details(self, site_url: str) -> Optional[Dict[str, Any]]:
         """
         Get detailed site information
@@ -48,7 +93,7 @@ class SharePointService:
             ctx = self._get_context(site_url)
             web = ctx.web
             ctx.load(web)
-            ctx.execute_query()
+            self._execute_query(ctx)
             
             return {
                 'title': web.title,
@@ -79,7 +124,7 @@ class SharePointService:
             ctx = self._get_context(site_url)
             users = ctx.web.site_users
             ctx.load(users)
-            ctx.execute_query()
+            self._execute_query(ctx)
             
             user_list = []
             for user in users:
@@ -113,7 +158,7 @@ class SharePointService:
             ctx = self._get_context(site_url)
             groups = ctx.web.site_groups
             ctx.load(groups)
-            ctx.execute_query()
+            self._execute_query(ctx)
             
             group_list = []
             for group in groups:
@@ -146,13 +191,13 @@ class SharePointService:
             ctx = self._get_context(site_url)
             role_assignments = ctx.web.role_assignments
             ctx.load(role_assignments)
-            ctx.execute_query()
+            self._execute_query(ctx)
             
             assignment_list = []
             for assignment in role_assignments:
                 ctx.load(assignment.member)
                 ctx.load(assignment.role_definition_bindings)
-                ctx.execute_query()
+                self._execute_query(ctx)
                 
                 roles = [role.name for role in assignment.role_definition_bindings]
                 
@@ -184,7 +229,7 @@ class SharePointService:
             ctx = self._get_context(site_url)
             lists = ctx.web.lists
             ctx.load(lists)
-            ctx.execute_query()
+            self._execute_query(ctx)
             
             library_list = []
             for lst in lists:
@@ -227,7 +272,7 @@ class SharePointService:
                 bin_items = ctx.site.recycle_bin  # Second stage
             
             ctx.load(bin_items)
-            ctx.execute_query()
+            self._execute_query(ctx)
             
             item_list = []
             for item in bin_items:
@@ -262,7 +307,7 @@ class SharePointService:
             ctx = self._get_context(site_url)
             site = ctx.site
             ctx.load(site)
-            ctx.execute_query()
+            self._execute_query(ctx)
             
             # Note: Storage metrics may require admin permissions
             usage = site.usage if hasattr(site, 'usage') else None
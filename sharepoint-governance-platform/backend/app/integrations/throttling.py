@@ -0,0 +1,174 @@
+"""
+Throttling-aware rate limiting and retry helpers for Microsoft 365 APIs
+"""
+from typing import Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Statuses Microsoft 365 uses to signal throttling
+THROTTLE_STATUSES = {429, 503}
+
+# Statuses worth retrying with backoff
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+THROTTLE_EVENTS = Counter(
+    "m365_throttle_events_total",
+    "Throttled responses (429/503) received from Microsoft 365 APIs",
+    ["service", "status"],
+)
+RETRY_ATTEMPTS = Counter(
+    "m365_request_retries_total",
+    "Microsoft 365 API requests retried after a throttling or server error",
+    ["service"],
+)
+RATE_LIMIT = Gauge(
+    "m365_rate_limit_per_second",
+    "Current adaptive request rate allowed by the rate limiter",
+    ["service"],
+)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header
+
+    Args:
+        value: Header value, either delay-seconds or an HTTP-date
+
+    Returns:
+        Delay in seconds, or None if the header is missing or invalid
+    """
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter
+
+    Args:
+        attempt: Zero-based retry attempt
+
+    Returns:
+        Delay in seconds, uniformly drawn from [0, min(max, base * 2^attempt)]
+    """
+    ceiling = min(
+        settings.THROTTLE_BACKOFF_MAX_SECONDS,
+        settings.THROTTLE_BACKOFF_BASE_SECONDS * (2 ** attempt)
+    )
+    return random.uniform(0, ceiling)
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by every caller of one Microsoft 365 API
+
+    The refill rate adapts AIMD-style: it is halved whenever the service
+    throttles us and creeps back up towards the configured maximum on each
+    success. A Retry-After pause blocks the whole bucket, not just the
+    request that was throttled. Safe to use from coroutines and threads.
+    """
+
+    def __init__(self, service: str, rate: float, burst: int, min_rate: float):
+        self.service = service
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+        RATE_LIMIT.labels(service).set(rate)
+
+    def _reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            # Tokens may go negative: each waiter reserves its own future slot
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    async def acquire(self):
+        """Wait for permission to send one request (async callers)"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self):
+        """Wait for permission to send one request (blocking callers)"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_throttled(self, retry_after: Optional[float] = None):
+        """Record a throttling response: halve the rate and honour Retry-After"""
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            RATE_LIMIT.labels(self.service).set(self.rate)
+
+        logger.warning(
+            f"{self.service} throttled; rate lowered to {self.rate:.2f} req/s"
+            + (f", pausing {retry_after:.1f}s" if retry_after else "")
+        )
+
+    def on_success(self):
+        """Record a successful response: additively recover the rate"""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.01)
+            RATE_LIMIT.labels(self.service).set(self.rate)
+
+    def record_throttle(self, status_code: int, retry_after: Optional[float] = None):
+        """Count a throttling response in Prometheus and slow the limiter down"""
+        THROTTLE_EVENTS.labels(self.service, str(status_code)).inc()
+        self.on_throttled(retry_after)
+
+
+# Global limiters shared by all Graph / SharePoint REST callers
+graph_limiter = AdaptiveRateLimiter(
+    "graph",
+    rate=settings.GRAPH_RATE_LIMIT_PER_SECOND,
+    burst=settings.GRAPH_RATE_LIMIT_BURST,
+    min_rate=settings.THROTTLE_MIN_RATE_PER_SECOND,
+)
+sharepoint_limiter = AdaptiveRateLimiter(
+    "sharepoint",
+    rate=settings.SHAREPOINT_RATE_LIMIT_PER_SECOND,
+    burst=settings.SHAREPOINT_RATE_LIMIT_BURST,
+    min_rate=settings.THROTTLE_MIN_RATE_PER_SECOND,
+)
@@ -45,6 +45,8 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     from app.core.cache import cache
+    from app.integrations.graph_client import graph_service
+    from app.integrations.ml_client import ml_client
     
     # Startup
     logger.info(f"Starting {settings.APP_NAME} v{settings.VERSION}")
@@ -66,6 +68,8 @@ async def lifespan(app: FastAPI):
     stop_scheduler()
     
     # Cleanup resources
+    await graph_service.aclose()
+    await ml_client.aclose()
     await cache.close()
 
 
@@ -2,11 +2,12 @@
 Model imports for easy access
 """
 from app.models.user import User, UserRole
-from app.models.site import SharePointSite, SiteOwnership, AccessMatrix, SiteClassification
+from app.models.site import SharePointSite, SiteOwnership, AccessMatrix, SiteClassification, SiteRiskScore
 from app.models.access_review import AccessReviewCycle, AccessReviewItem, ReviewStatus, AccessDecision
-from app.models.audit import AuditLog, AdminActionLog, AdminActionType, AdminActionStatus
+from app.models.audit import AuditLog, AuditSiteRollup, AuditUserRollup, AuditSketch, AuditAnomaly, BehaviorBaseline, AdminActionLog, AdminActionType, AdminActionStatus
 from app.models.retention import DocumentLibrary, RecycleBinItem, RetentionPolicy, RetentionExclusion
 from app.models.two_factor import UserTwoFactor, TrustedDevice, SetupWizardStatus
+from app.models.sync import SyncCheckpoint
 
 
 __all__ = [
@@ -19,6 +20,7 @@ __all__ = [
     "SiteOwnership",
     "AccessMatrix",
     "SiteClassification",
+    "SiteRiskScore",
     
     # Access Review
     "AccessReviewCycle",
@@ -28,6 +30,11 @@ __all__ = [
     
     # Audit
     "AuditLog",
+    "AuditSiteRollup",
+    "AuditUserRollup",
+    "AuditSketch",
+    "AuditAnomaly",
+    "BehaviorBaseline",
     "AdminActionLog",
     "AdminActionType",
     "AdminActionStatus",
@@ -42,5 +49,8 @@ __all__ = [
     "UserTwoFactor",
     "TrustedDevice",
     "SetupWizardStatus",
+    
+    # Sync
+    "SyncCheckpoint",
 ]
 
@@ -3,7 +3,7 @@ Access Review models
 """
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Integer, Text, Index
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Integer, Text, Index, Boolean
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
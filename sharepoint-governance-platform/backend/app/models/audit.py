@@ -3,7 +3,7 @@ Audit and Admin Action models
 """
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index
+from sqlalchemy import Column, String, Date, DateTime, Float, ForeignKey, Text, Index, Boolean, Enum, Integer, LargeBinary, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
@@ -12,17 +12,28 @@ from app.db.session import Base
 
 
 class AuditLog(Base):
-    """Materialized audit log from Microsoft 365"""
+    """
+    Materialized audit log from Microsoft 365
+    
+    Range-partitioned by month on event_datetime (see AuditPartitionService).
+    PostgreSQL requires the partition key in every unique constraint, so the
+    primary key and the ms_audit_id constraint both include event_datetime.
+    """
     __tablename__ = "audit_logs"
     
     # Partition by month for performance
     __table_args__ = (
-        Index('idx_audit_event_datetime', 'event_datetime'),
+        UniqueConstraint('ms_audit_id', 'event_datetime', name='uq_audit_ms_audit_id'),
+        Index('idx_audit_datetime_id', 'event_datetime', 'audit_id'),  # time ranges and keyset pagination
         Index('idx_audit_user_id', 'user_id'),
         Index('idx_audit_site_id', 'site_id'),
         Index('idx_audit_operation', 'operation'),
         Index('idx_audit_site_datetime', 'site_id', 'event_datetime'),
-        {'postgresql_partition_by': 'RANGE (event_datetime)'}  # Partitioning hint
+        Index('idx_audit_synced', 'synced_from_ms365'),  # incremental anomaly scoring
+        # Substring filters (LIKE '%x%')
+        Index('idx_audit_user_email_trgm', 'user_email', postgresql_using='gin', postgresql_ops={'user_email': 'gin_trgm_ops'}),
+        Index('idx_audit_site_url_trgm', 'site_url', postgresql_using='gin', postgresql_ops={'site_url': 'gin_trgm_ops'}),
+        {'postgresql_partition_by': 'RANGE (event_datetime)'}
     )
 
     audit_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -30,7 +41,7 @@ class AuditLog(Base):
     # Event details
     event_type = Column(String(100), nullable=False)
     operation = Column(String(100), nullable=False)
-    event_datetime = Column(DateTime, nullable=False, index=True)
+    event_datetime = Column(DateTime, primary_key=True)  # partition key
     
     # User and site
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=True)
@@ -53,7 +64,7 @@ class AuditLog(Base):
     details = Column(JSONB, nullable=True)
     
     # Microsoft 365 original ID
-    ms_audit_id = Column(String(255), nullable=True, unique=True)
+    ms_audit_id = Column(String(255), nullable=True)
     
     # Sync tracking
     synced_from_ms365 = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -66,6 +77,131 @@ class AuditLog(Base):
         return f"<AuditLog {self.operation} by {self.user_email} at {self.event_datetime}>"
 
 
+class AuditSiteRollup(Base):
+    """
+    Hourly audit event counts per site and operation
+    
+    Maintained incrementally by AuditService as events are ingested (see
+    AuditRollupService); events without a site are counted under site_url ''.
+    """
+    __tablename__ = "audit_rollup_site_hourly"
+    
+    bucket = Column(DateTime, primary_key=True)  # start of the UTC hour
+    site_url = Column(String(500), primary_key=True, default='')
+    operation = Column(String(100), primary_key=True)
+    site_id = Column(UUID(as_uuid=True), nullable=True)
+    event_count = Column(Integer, default=0, nullable=False)
+    failed_count = Column(Integer, default=0, nullable=False)  # result_status other than Success
+    
+    __table_args__ = (
+        Index('idx_rollup_site_id_bucket', 'site_id', 'bucket'),
+    )
+    
+    def __repr__(self):
+        return f"<AuditSiteRollup {self.bucket} {self.site_url} {self.operation}={self.event_count}>"
+
+
+class AuditUserRollup(Base):
+    """
+    Hourly audit event counts per user and operation
+    
+    Maintained alongside AuditSiteRollup; events without a user are counted
+    under user_email ''.
+    """
+    __tablename__ = "audit_rollup_user_hourly"
+    
+    bucket = Column(DateTime, primary_key=True)  # start of the UTC hour
+    user_email = Column(String(255), primary_key=True, default='')
+    operation = Column(String(100), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=True)
+    event_count = Column(Integer, default=0, nullable=False)
+    failed_count = Column(Integer, default=0, nullable=False)  # result_status other than Success
+    
+    __table_args__ = (
+        Index('idx_rollup_user_id_bucket', 'user_id', 'bucket'),
+    )
+    
+    def __repr__(self):
+        return f"<AuditUserRollup {self.bucket} {self.user_email} {self.operation}={self.event_count}>"
+
+
+class AuditSketch(Base):
+    """
+    Daily probabilistic sketches of audit activity per operation
+    
+    For each day, operation and dimension ('user' or 'site') one row holds a
+    HyperLogLog of the distinct values and a Top-K (Count-Min) sketch of the
+    most active ones (see app.core.sketches). Sketches merge across days, so
+    any date range is answered from a handful of rows.
+    """
+    __tablename__ = "audit_sketches"
+    
+    day = Column(Date, primary_key=True)
+    operation = Column(String(100), primary_key=True)
+    dimension = Column(String(20), primary_key=True)  # user, site
+    distinct_sketch = Column(LargeBinary, nullable=True)  # HyperLogLog
+    top_sketch = Column(LargeBinary, nullable=True)  # TopK
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<AuditSketch {self.day} {self.operation} {self.dimension}>"
+
+
+class AuditAnomaly(Base):
+    """
+    Audit event flagged by the anomaly model
+    
+    Written by AnomalyDetectionService.score_new_events after each audit sync;
+    denormalizes the event fields the analytics API returns so reads never
+    touch audit_logs.
+    """
+    __tablename__ = "audit_anomalies"
+    
+    audit_id = Column(UUID(as_uuid=True), primary_key=True)
+    event_datetime = Column(DateTime, primary_key=True)
+    
+    event_type = Column(String(100), nullable=False)
+    operation = Column(String(100), nullable=False)
+    user_email = Column(String(255), nullable=True)
+    site_id = Column(UUID(as_uuid=True), nullable=True)
+    site_url = Column(String(500), nullable=True)
+    
+    anomaly_score = Column(Float, nullable=False)  # lower = more anomalous
+    reason = Column(String(255), nullable=True)
+    model_version = Column(String(50), nullable=False)  # model file version, 'rules' or 'baseline'
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_anomaly_datetime', 'event_datetime'),
+        Index('idx_anomaly_site_datetime', 'site_id', 'event_datetime'),
+    )
+    
+    def __repr__(self):
+        return f"<AuditAnomaly {self.operation} by {self.user_email} at {self.event_datetime}>"
+
+
+class BehaviorBaseline(Base):
+    """
+    Decayed behaviour profile of one user or site
+    
+    profile holds a BehaviorProfile (app.core.baselines): hour-of-day,
+    operation and peer weights that halve every ANOMALY_BASELINE_HALF_LIFE_DAYS.
+    Updated during audit ingest, which scores each new event against it.
+    """
+    __tablename__ = "behavior_baselines"
+    
+    entity_type = Column(String(20), primary_key=True)  # user, site
+    entity_key = Column(String(500), primary_key=True)  # lower-cased email, or site URL
+    profile = Column(JSONB, nullable=True)
+    total_weight = Column(Float, default=0.0, nullable=False)  # decayed event count at last_event_at
+    event_count = Column(Integer, default=0, nullable=False)
+    last_event_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<BehaviorBaseline {self.entity_type} {self.entity_key}>"
+
+
 class AdminActionType(str, PyEnum):
     """Administrative action types"""
     RETENTION_ADD = "retention_add"
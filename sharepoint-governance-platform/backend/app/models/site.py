@@ -3,8 +3,8 @@ SharePoint Site models
 """
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import Column, String, DateTime, Integer, Boolean, Enum, ForeignKey, Index
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, Float, Integer, Boolean, Enum, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
 
@@ -47,6 +47,9 @@ class SharePointSite(Base):
     ms_site_id = Column(String(255), nullable=True, unique=True)
     ms_group_id = Column(String(255), nullable=True)
     
+    # Full-text search uses the generated search_vector column added by
+    # migration 007 (PostgreSQL only, so it is not mapped here)
+    
     # Relationships
     owners = relationship("SiteOwnership", back_populates="site")
     access_matrix = relationship("AccessMatrix", back_populates="site")
@@ -57,6 +60,10 @@ class SharePointSite(Base):
     __table_args__ = (
         Index('idx_site_classification_active', 'classification', 'is_archived'),
         Index('idx_site_last_activity', 'last_activity'),
+        Index('idx_site_name_id', 'name', 'site_id'),  # keyset pagination
+        # Substring filters (LIKE/ILIKE '%x%')
+        Index('idx_site_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('idx_site_url_trgm', 'site_url', postgresql_using='gin', postgresql_ops={'site_url': 'gin_trgm_ops'}),
     )
     
     def __repr__(self):
@@ -103,6 +110,7 @@ class AccessMatrix(Base):
     access_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     site_id = Column(UUID(as_uuid=True), ForeignKey("sharepoint_sites.site_id"), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=True)
+    user_email = Column(String(255), nullable=True)  # grantee, also when not in the directory
     
     # Permission details
     permission_level = Column(String(100), nullable=False)  # Full Control, Edit, Read, etc.
@@ -131,3 +139,40 @@ class AccessMatrix(Base):
     
     def __repr__(self):
         return f"<AccessMatrix site={self.site_id} user={self.user_id} level={self.permission_level}>"
+
+
+class SiteRiskScore(Base):
+    """
+    Materialized site risk score
+    
+    Recomputed for every site in bulk by SiteRiskService after site discovery
+    and audit sync; the risk-score and ranking endpoints read it instead of
+    querying each site's permissions, reviews and anomalies.
+    """
+    __tablename__ = "site_risk_scores"
+
+    site_id = Column(UUID(as_uuid=True), ForeignKey("sharepoint_sites.site_id", ondelete="CASCADE"), primary_key=True)
+    site_name = Column(String(255), nullable=False)
+    site_url = Column(String(500), nullable=False)
+    
+    risk_score = Column(Integer, nullable=False)  # 0-100
+    risk_level = Column(String(20), nullable=False)  # low, medium, high, critical
+    risk_factors = Column(JSONB, nullable=True)  # human-readable factor list
+    
+    # Factor inputs
+    days_inactive = Column(Integer, nullable=True)
+    storage_usage_percent = Column(Float, default=0.0, nullable=False)
+    external_users = Column(Integer, default=0, nullable=False)
+    overdue_reviews = Column(Integer, default=0, nullable=False)
+    recent_anomalies = Column(Integer, default=0, nullable=False)
+    
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_site_risk_rank', 'risk_score', 'site_id'),  # keyset ranking
+        Index('idx_site_risk_level', 'risk_level'),
+    )
+    
+    def __repr__(self):
+        return f"<SiteRiskScore site={self.site_id} score={self.risk_score}>"
@@ -0,0 +1,20 @@
+"""
+Synchronization checkpoint models
+"""
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Text
+
+from app.db.session import Base
+
+
+class SyncCheckpoint(Base):
+    """Persisted resume point for an incremental Microsoft 365 sync"""
+    __tablename__ = "sync_checkpoints"
+
+    source = Column(String(100), primary_key=True)  # e.g. 'site_discovery'
+    delta_link = Column(Text, nullable=True)  # Graph @odata.deltaLink to resume from
+    watermark = Column(DateTime, nullable=True)  # Latest event time ingested (UTC)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<SyncCheckpoint(source={self.source}, updated_at={self.updated_at})>"
@@ -25,7 +25,12 @@ class UserTwoFactor(Base):
     
     # Relationships
     user = relationship("User", backref="two_factor")
-    trusted_devices = relationship("TrustedDevice", back_populates="user", cascade="all, delete-orphan")
+    trusted_devices = relationship(
+        "TrustedDevice",
+        primaryjoin="UserTwoFactor.user_id == foreign(TrustedDevice.user_id)",  # both reference users.user_id
+        back_populates="user",
+        cascade="all, delete-orphan"
+    )
     
     def __repr__(self):
         return f"<UserTwoFactor user_id={self.user_id} enabled={self.is_enabled}>"
@@ -48,7 +53,11 @@ class TrustedDevice(Base):
     is_active = Column(Boolean, default=True, nullable=False)  # Can be revoked
     
     # Relationships
-    user = relationship("UserTwoFactor", back_populates="trusted_devices")
+    user = relationship(
+        "UserTwoFactor",
+        primaryjoin="UserTwoFactor.user_id == foreign(TrustedDevice.user_id)",
+        back_populates="trusted_devices"
+    )
     
     def __repr__(self):
         return f"<TrustedDevice {self.device_name} for user_id={self.user_id}>"
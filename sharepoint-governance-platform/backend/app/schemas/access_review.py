@@ -1,7 +1,7 @@
 """
 Access Review schemas
 """
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from pydantic import BaseModel
 from enum import Enum
@@ -3,7 +3,7 @@ Pydantic schemas for Sites API
 """
 from typing import Optional, List
 from datetime import datetime
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, field_validator
 from enum import Enum
 
 
@@ -42,14 +42,26 @@ class SiteResponse(SiteBase):
     
     class Config:
         from_attributes = True
+    
+    @field_validator('site_id', mode='before')
+    @classmethod
+    def _site_id_str(cls, value):
+        return str(value)
 
 
 class SiteListResponse(BaseModel):
     """Schema for paginated site list"""
-    total: int
+    total: Optional[int] = None  # exact or estimated; None when not requested
     sites: List[SiteResponse]
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class SiteSearchResult(SiteResponse):
+    """Schema for a ranked site search hit"""
+    rank: float = 0.0
 
 
 class SiteHealthResponse(BaseModel):
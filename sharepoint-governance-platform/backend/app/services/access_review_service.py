@@ -5,11 +5,15 @@ from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 import logging
+import uuid
 
+from app.core.config import settings
+from app.db.bulk import BulkWriter
 from app.models.access_review import AccessReviewCycle, AccessReviewItem, ReviewStatus, AccessDecision
 from app.models.site import SharePointSite, SiteOwnership, AccessMatrix
 from app.models.user import User
 from app.integrations.graph_client import graph_service
+from app.services.identity_resolver import identity_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -42,76 +46,116 @@ class AccessReviewService:
             cycle_number = int(f"{now.year}{quarter}")
             
             # Get all active sites
-            sites = self.db.query(SharePointSite).filter(
+            sites = self.db.query(
+                SharePointSite.site_id,
+                SharePointSite.name,
+                SharePointSite.site_url,
+            ).filter(
                 SharePointSite.is_archived == False
             ).all()
             
             stats['total_sites'] = len(sites)
             
-            for site in sites:
-                # Check if review already exists for this cycle
-                existing_review = self.db.query(AccessReviewCycle).filter(
-                    AccessReviewCycle.site_id == site.site_id,
+            # Sites that already have a review for this cycle
+            reviewed_site_ids = {
+                site_id for (site_id,) in self.db.query(AccessReviewCycle.site_id).filter(
                     AccessReviewCycle.cycle_number == cycle_number
-                ).first()
-                
-                if existing_review:
-                    stats['reviews_skipped'] += 1
-                    continue
+                )
+            }
+            
+            # Primary owner per site
+            primary_owners = {}
+            for site_id, user_id in self.db.query(SiteOwnership.site_id, SiteOwnership.user_id).filter(
+                SiteOwnership.is_primary_owner == True
+            ):
+                primary_owners.setdefault(site_id, user_id)
+            
+            writer = BulkWriter(self.db)
+            identity_resolver.refresh(self.db)
+            notifications = []
+            
+            for start in range(0, len(sites), settings.BULK_WRITE_CHUNK_SIZE):
+                chunk = sites[start:start + settings.BULK_WRITE_CHUNK_SIZE]
+                cycle_rows = []
+                cycle_ids = {}
                 
-                # Get primary owner
-                primary_owner = self.db.query(SiteOwnership).filter(
-                    SiteOwnership.site_id == site.site_id,
-                    SiteOwnership.is_primary_owner == True
-                ).first()
+                for site in chunk:
+                    # Check if review already exists for this cycle
+                    if site.site_id in reviewed_site_ids:
+                        stats['reviews_skipped'] += 1
+                        continue
+                    
+                    if site.site_id not in primary_owners:
+                        # Skip if no primary owner
+                        logger.warning(f"Site {site.name} has no primary owner, skipping review")
+                        stats['reviews_skipped'] += 1
+                        continue
+                    
+                    # Review cycle IDs are generated here so items can reference them
+                    # without a flush per cycle
+                    review_cycle_id = uuid.uuid4()
+                    due_date = now + timedelta(days=30)  # 30 days to complete
+                    cycle_ids[site.site_id] = review_cycle_id
+                    cycle_rows.append({
+                        'review_cycle_id': review_cycle_id,
+                        'site_id': site.site_id,
+                        'cycle_number': cycle_number,
+                        'start_date': now,
+                        'due_date': due_date,
+                        'status': ReviewStatus.PENDING,
+                        'assigned_to_user_id': primary_owners[site.site_id],
+                    })
+                    notifications.append((primary_owners[site.site_id], site, due_date))
                 
-                if not primary_owner:
-                    # Skip if no primary owner
-                    logger.warning(f"Site {site.name} has no primary owner, skipping review")
-                    stats['reviews_skipped'] += 1
+                if not cycle_rows:
                     continue
                 
-                # Create review cycle
-                review_cycle = AccessReviewCycle(
-                    site_id=site.site_id,
-                    cycle_number=cycle_number,
-                    start_date=now,
-                    due_date=now + timedelta(days=30),  # 30 days to complete
-                    status=ReviewStatus.PENDING,
-                    assigned_to_user_id=primary_owner.user_id,
-                )
-                
-                self.db.add(review_cycle)
-                self.db.flush()  # Get review_cycle_id
-                
                 # Create review items for all access permissions
+                item_rows = []
                 access_list = self.db.query(AccessMatrix).filter(
-                    AccessMatrix.site_id == site.site_id
-                ).all()
+                    AccessMatrix.site_id.in_(list(cycle_ids))
+                )
                 
                 for access in access_list:
-                    review_item = AccessReviewItem(
-                        review_cycle_id=review_cycle.review_cycle_id,
-                        user_id=access.user_id,
-                        user_email=access.external_user_email if access.is_external_user else (
-                            self.db.query(User).filter(User.user_id == access.user_id).first().email if access.user_id else None
-                        ),
-                        permission_level=access.permission_level,
-                        assignment_type=access.assignment_type,
-                        last_access_date=access.last_access,
-                        access_status=AccessDecision.PENDING,
+                    user_email = (
+                        access.user_email
+                        or access.external_user_email
+                        or identity_resolver.email_for(access.user_id)
                     )
-                    self.db.add(review_item)
-                
-                stats['reviews_created'] += 1
+                    if not user_email:
+                        logger.warning(f"Access entry {access.access_id} has no resolvable email, not added to review")
+                        continue
+                    
+                    item_rows.append({
+                        'review_cycle_id': cycle_ids[access.site_id],
+                        'user_id': access.user_id,
+                        'user_email': user_email,
+                        'permission_level': access.permission_level,
+                        'assignment_type': access.assignment_type,
+                        'last_access_date': access.last_access,
+                        'access_status': AccessDecision.PENDING,
+                    })
                 
-                # Send notification email to assignee
-                if primary_owner.user_id:
-                    user = self.db.query(User).filter(User.user_id == primary_owner.user_id).first()
-                    if user:
-                        await self._send_review_notification(user, site, review_cycle)
+                writer.insert(AccessReviewCycle, cycle_rows)
+                writer.insert(AccessReviewItem, item_rows)
+                stats['reviews_created'] += len(cycle_rows)
             
             self.db.commit()
+            
+            # Send notification emails to assignees once the reviews exist
+            assignee_ids = {user_id for user_id, _, _ in notifications if user_id}
+            assignees = {}
+            if assignee_ids:
+                assignees = {
+                    user.user_id: user
+                    for user in self.db.query(User).filter(User.user_id.in_(list(assignee_ids)))
+                }
+            
+            for user_id, site, due_date in notifications:
+                user = assignees.get(user_id)
+                if user:
+                    await self._send_review_notification(user, site.name, site.site_url, due_date)
+            
             logger.info(f"Access review initiation completed: {stats}")
             return stats
         
@@ -123,11 +167,12 @@ class AccessReviewService:
     async def _send_review_notification(
         self,
         user: User,
-        site: SharePointSite,
-        review_cycle: AccessReviewCycle
+        site_name: str,
+        site_url: str,
+        due_date: datetime
     ):
         """Send email notification to site owner about pending review"""
-        subject = f"Action Required: Access Review for {site.name}"
+        subject = f"Action Required: Access Review for {site_name}"
         
         body = f"""
         <html>
@@ -136,9 +181,9 @@ class AccessReviewService:
             <p>Dear {user.name},</p>
             <p>You have been assigned an access review for the following SharePoint site:</p>
             <ul>
-                <li><strong>Site Name:</strong> {site.name}</li>
-                <li><strong>Site URL:</strong> {site.site_url}</li>
-                <li><strong>Review Due Date:</strong> {review_cycle.due_date.strftime('%Y-%m-%d')}</li>
+                <li><strong>Site Name:</strong> {site_name}</li>
+                <li><strong>Site URL:</strong> {site_url}</li>
+                <li><strong>Review Due Date:</strong> {due_date.strftime('%Y-%m-%d')}</li>
             </ul>
             <p>Please review and certify the access permissions for this site within 30 days.</p>
             <p>Login to the SharePoint Governance Platform to complete your review.</p>
@@ -1,122 +1,429 @@
 """
 Phase 3 AI-Powered Anomaly Detection Service
 """
-from typing import List, Dict, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+import asyncio
+import json
 import logging
+import os
 import numpy as np
 
-from app.models.site import SharePointSite
-from app.models.audit import AuditLog
-from app.models.access_review import AccessReviewCycle
+from app.core.config import settings
+from app.db.bulk import BulkWriter
+from app.db.pagination import NEXT, keyset_rows
+from app.models.audit import AuditAnomaly, AuditLog
+from app.models.sync import SyncCheckpoint
+from app.services.behavior_baseline_service import BehaviorBaselineService
+from app.services.site_risk_service import SiteRiskService
 
 logger = logging.getLogger(__name__)
 
+# Columns projected for scoring (no ORM objects, no JSONB details)
+ANOMALY_COLUMNS = ['audit_id', 'event_type', 'operation', 'user_email', 'site_id', 'site_url', 'event_datetime']
+
+FEATURE_NAMES = ['hour_of_day', 'day_of_week', 'is_download', 'is_permission_change', 'is_deletion']
+
+DOWNLOAD_OPERATIONS = ['FileDownloaded', 'FileAccessed']
+
+# SyncCheckpoint key holding the ingest time (synced_from_ms365) scored up to
+ANOMALY_SCORING_CHECKPOINT = "audit_anomalies"
+
+# Re-read this far behind the watermark, for rows a concurrent ingest
+# committed late; already-flagged events are skipped on insert
+SCORING_OVERLAP = timedelta(minutes=5)
+
+# model_version of anomalies flagged by the rule-based fallback
+RULES_VERSION = "rules"
+
+# Worker process for model fitting, created on first use
+_training_pool: Optional[ProcessPoolExecutor] = None
+
+
+def fit_isolation_forest(features: np.ndarray):
+    """Fit the anomaly model (runs in the training worker process)"""
+    from sklearn.ensemble import IsolationForest
+    
+    model = IsolationForest(
+        contamination=0.05,  # 5% anomaly rate
+        random_state=42
+    )
+    return model.fit(features)
+
+
+def get_training_pool() -> ProcessPoolExecutor:
+    """Process pool that keeps model fitting off the event loop and the GIL"""
+    global _training_pool
+    if _training_pool is None:
+        _training_pool = ProcessPoolExecutor(max_workers=1)
+    return _training_pool
+
+
+def shutdown_training_pool():
+    """Stop the training worker process"""
+    global _training_pool
+    if _training_pool is not None:
+        _training_pool.shutdown(wait=False, cancel_futures=True)
+        _training_pool = None
+
+
+class AnomalyModelStore:
+    """
+    Versioned anomaly models on disk
+    
+    Each fit is saved as isolation-forest-<version>.joblib; current.json names
+    the version in use and its training metadata. Loaded models are cached
+    per process by version.
+    """
+    
+    POINTER = "current.json"
+    
+    _cache: Dict[str, Any] = {}
+    
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or settings.ANOMALY_MODEL_DIR)
+    
+    def _path(self, version: str) -> Path:
+        return self.directory / f"isolation-forest-{version}.joblib"
+    
+    def current(self) -> Optional[Dict[str, Any]]:
+        """Metadata of the model in use, or None if none was trained yet"""
+        try:
+            metadata = json.loads((self.directory / self.POINTER).read_text())
+        except (OSError, ValueError):
+            return None
+        if metadata.get('features') != FEATURE_NAMES:
+            return None  # trained on a different feature set
+        metadata['trained_at'] = datetime.fromisoformat(metadata['trained_at'])
+        return metadata
+    
+    def load(self, version: str):
+        """Load a model version"""
+        import joblib
+        
+        if version not in self._cache:
+            self._cache[version] = joblib.load(self._path(version))
+        return self._cache[version]
+    
+    def save(self, model, metadata: Dict[str, Any]) -> str:
+        """
+        Save a new model version and make it current
+        
+        Returns:
+            The new version
+        """
+        import joblib
+        
+        version = metadata['trained_at'].strftime('%Y%m%dT%H%M%S')
+        self.directory.mkdir(parents=True, exist_ok=True)
+        joblib.dump(model, self._path(version))
+        
+        pointer = {**metadata, 'version': version, 'features': FEATURE_NAMES,
+                   'trained_at': metadata['trained_at'].isoformat()}
+        temp = self.directory / f".{self.POINTER}.tmp"
+        temp.write_text(json.dumps(pointer, default=str))
+        os.replace(temp, self.directory / self.POINTER)  # atomic switch
+        
+        self._cache[version] = model
+        return version
+    
+    def prune(self, keep: Optional[int] = None) -> List[str]:
+        """
+        Delete all but the newest model versions
+        
+        Returns:
+            Versions deleted
+        """
+        keep = keep or settings.ANOMALY_MODEL_KEEP_VERSIONS
+        files = sorted(self.directory.glob("isolation-forest-*.joblib"), reverse=True)
+        removed = []
+        for path in files[keep:]:
+            path.unlink(missing_ok=True)
+            version = path.stem[len("isolation-forest-"):]
+            self._cache.pop(version, None)
+            removed.append(version)
+        return removed
+
 
 class AnomalyDetectionService:
-    """Service for AI-powered anomaly detection"""
+    """
+    Service for AI-powered anomaly detection
+    
+    A scheduled job fits the model on a rolling window in a worker process
+    (train_model); after each audit sync only the newly ingested events are
+    scored (score_new_events) and flagged ones stored in audit_anomalies,
+    which the analytics API reads.
+    """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, store: Optional[AnomalyModelStore] = None):
         self.db = db
-        self.model = None
+        self.store = store or AnomalyModelStore()
     
     async def detect_access_anomalies(
         self,
         site_id: Optional[str] = None,
-        days: int = 30
+        days: int = 30,
+        limit: int = 1000
     ) -> List[Dict]:
         """
-        Detect anomalous access patterns using Isolation Forest
+        Anomalous audit events flagged in a recent window
         
         Args:
             site_id: Optional site ID to filter
-            days: Days of historical data to analyze
+            days: Days of history to return
+            limit: Maximum anomalies returned
         
         Returns:
-            List of detected anomalies
+            List of detected anomalies, most anomalous first
         """
-        logger.info(f"Detecting access anomalies for last {days} days")
-        
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        query = self.db.query(AuditLog).filter(
-            AuditLog.event_datetime >= cutoff_date
-        )
-        
+        query = self.db.query(AuditAnomaly).filter(AuditAnomaly.event_datetime >= cutoff_date)
         if site_id:
-            query = query.filter(AuditLog.site_id == site_id)
+            query = query.filter(AuditAnomaly.site_id == site_id)
+        
+        anomalies = query.order_by(AuditAnomaly.anomaly_score, AuditAnomaly.event_datetime.desc()).limit(limit).all()
+        
+        return [
+            {
+                "audit_id": str(anomaly.audit_id),
+                "event_type": anomaly.event_type,
+                "operation": anomaly.operation,
+                "user_email": anomaly.user_email,
+                "site_url": anomaly.site_url,
+                "event_datetime": anomaly.event_datetime.isoformat(),
+                "anomaly_score": anomaly.anomaly_score,
+                "reason": anomaly.reason,
+                "model_version": anomaly.model_version,
+            }
+            for anomaly in anomalies
+        ]
+    
+    async def train_model(self) -> Optional[str]:
+        """
+        Fit a new model version on the last ANOMALY_TRAINING_WINDOW_DAYS of events
         
-        audit_logs = query.all()
+        Returns:
+            The new model version, or None if there is too little data
         
-        if len(audit_logs) < 100:
-            logger.warning("Insufficient data for anomaly detection")
-            return []
+        Raises:
+            ImportError: If scikit-learn is not installed
+        """
+        import sklearn  # noqa: F401 - fail here, not in the worker
         
-        # Extract features for ML model
-        features = self._extract_features(audit_logs)
+        window_end = datetime.utcnow()
+        window_start = window_end - timedelta(days=settings.ANOMALY_TRAINING_WINDOW_DAYS)
         
-        # Use Isolation Forest for anomaly detection
-        try:
-            from sklearn.ensemble import IsolationForest
-            
-            if self.model is None:
-                self.model = IsolationFores(
-                    contamination=0.05,  # 5% anomaly rate
-                    random_state=42
-                )
-            
-            # Train and predict
-            predictions = self.model.fit_predict(features)
+        # Blocking query, run off the event loop; only the fit uses the process pool
+        rows = await asyncio.to_thread(self._training_sample, window_start)
+        
+        if len(rows) < 100:
+            logger.warning("Insufficient data to train the anomaly model")
+            return None
+        
+        events = self._to_arrays(rows, ['event_datetime', 'operation'])
+        features = self._extract_features(events['event_datetime'], events['operation'])
+        
+        loop = asyncio.get_running_loop()
+        model = await loop.run_in_executor(get_training_pool(), fit_isolation_forest, features)
+        
+        version = self.store.save(model, {
+            'trained_at': window_end,
+            'window_start': window_start.isoformat(),
+            'window_end': window_end.isoformat(),
+            'samples': len(features),
+        })
+        self.store.prune()
+        
+        logger.info(f"Trained anomaly model {version} on {len(features)} events")
+        return version
+    
+    def _training_sample(self, window_start: datetime) -> List[Tuple[datetime, str]]:
+        """
+        Random sample of at most ANOMALY_TRAINING_MAX_ROWS events since window_start
+        
+        IsolationForest sub-samples per tree anyway, and fitting cost (offset
+        estimation) grows with the training set. The sample is drawn in the
+        database (a bounded top-N sort), so only the sampled rows are
+        transferred and held in memory.
+        """
+        return self.db.query(AuditLog.event_datetime, AuditLog.operation).filter(
+            AuditLog.event_datetime >= window_start
+        ).order_by(func.random()).limit(settings.ANOMALY_TRAINING_MAX_ROWS).all()
+    
+    async def score_new_events(self) -> Dict[str, Any]:
+        """
+        Score audit events ingested since the last run and store the anomalies
+        
+        Events are read by ingest time (synced_from_ms365), so late-arriving
+        and backfilled events are scored too. Events the model flags but that
+        are usual for their user's behaviour baseline are not stored. A model older than
+        ANOMALY_MODEL_MAX_AGE_HOURS (or none at all) is retrained first;
+        without scikit-learn the rule-based checks are used.
+        
+        Returns:
+            Statistics dictionary with scored events, new anomalies and the model version
+        """
+        now = datetime.utcnow()
+        checkpoint = self.db.get(SyncCheckpoint, ANOMALY_SCORING_CHECKPOINT)
+        if checkpoint is None:
+            checkpoint = SyncCheckpoint(source=ANOMALY_SCORING_CHECKPOINT)
+            self.db.add(checkpoint)
+        
+        if checkpoint.watermark is None:
+            since = now - timedelta(days=settings.ANOMALY_TRAINING_WINDOW_DAYS)
+            event_floor = since  # first run: only the recent window
+        else:
+            since = checkpoint.watermark - SCORING_OVERLAP
+            event_floor = None
+        
+        model, version = await self._current_model()
+        
+        columns = [AuditLog.__table__.c[name] for name in ANOMALY_COLUMNS]
+        key_columns = [AuditLog.synced_from_ms365, AuditLog.audit_id]
+        query = self.db.query(*columns, AuditLog.synced_from_ms365).filter(AuditLog.synced_from_ms365 >= since)
+        if event_floor is not None:
+            query = query.filter(AuditLog.event_datetime >= event_floor)
+        
+        stats = {'scored': 0, 'anomalies': 0, 'model_version': version}
+        key = None
+        
+        while True:
+            rows = keyset_rows(query, key_columns, NEXT, key, settings.ANOMALY_SCORING_BATCH_ROWS)
+            if not rows:
+                break
+            key = (rows[-1].synced_from_ms365, rows[-1].audit_id)
             
-            # Extract anomalies
-            anomalies = []
-            for idx, prediction in enumerate(predictions):
-                if prediction == -1:  # Anomaly
-                    log = audit_logs[idx]
-                    anomalies.append({
-                        "audit_id": str(log.audit_id),
-                        "event_type": log.event_type,
-                        "operation": log.operation,
-                        "user_email": log.user_email,
-                        "site_url": log.site_url,
-                        "event_datetime": log.event_datetime.isoformat(),
-                        "anomaly_score": float(self.model.score_samples([features[idx]])[0]),
-                        "reason": self._explain_anomaly(log, features[idx]),
-                    })
+            events = self._to_arrays(rows, ANOMALY_COLUMNS)
+            flagged = self._score(events, model, version)
+            if flagged:
+                # Routine for the user (e.g. a night shift): not an anomaly
+                explained = BehaviorBaselineService(self.db).explained(flagged)
+                flagged = [anomaly for anomaly, usual in zip(flagged, explained) if not usual]
+            inserted = BulkWriter(self.db).insert_ignore(
+                AuditAnomaly,
+                flagged,
+                conflict_columns=['audit_id', 'event_datetime'],
+                returning=['audit_id'],
+            )
             
-            logger.info(f"Detected {len(anomalies)} anomalies")
-            return anomalies
+            checkpoint.watermark = key[0]
+            checkpoint.updated_at = datetime.utcnow()
+            self.db.commit()
             
-        except ImportError:
-            logger.error("scikit-learn not installed, using rule-based detection")
-            return self._rule_based_anomaly_detection(audit_logs)
+            stats['scored'] += len(rows)
+            stats['anomalies'] += len(inserted)
+        
+        logger.info(f"Anomaly scoring completed: {stats}")
+        return stats
     
-    def _extract_features(self, logs: List[AuditLog]) -> np.ndarray:
-        """Extract numerical features from audit logs"""
-        features = []
-        
-        for log in logs:
-            # Convert to numerical features
-            hour_of_day = log.event_datetime.hour
-            day_of_week = log.event_datetime.weekday()
-            
-            # Binary encoding for event types
-            is_download = 1 if log.operation in ['FileDownloaded', 'FileAccessed'] else 0
-            is_permission_change= 1 if 'Permission' in log.operation else 0
-            is_deletion = 1 if 'Delete' in log.operation else 0
-            
-            features.append([
-                hour_of_day,
-                day_of_week,
-                is_download,
-                is_permission_change,
-                is_deletion,
-            ])
-        
-        return np.array(features)
+    async def _current_model(self) -> Tuple[Any, str]:
+        """
+        Model to score with, training one first if missing or stale
+        
+        Returns:
+            (model, version); (None, RULES_VERSION) if no model is available
+        """
+        metadata = self.store.current()
+        max_age = timedelta(hours=settings.ANOMALY_MODEL_MAX_AGE_HOURS)
+        
+        if metadata is None or datetime.utcnow() - metadata['trained_at'] > max_age:
+            try:
+                if await self.train_model() is not None:
+                    metadata = self.store.current()
+            except ImportError:
+                logger.error("scikit-learn not installed, using rule-based detection")
+                return None, RULES_VERSION
+        
+        if metadata is None:
+            return None, RULES_VERSION
+        return self.store.load(metadata['version']), metadata['version']
+    
+    def _score(self, events: Dict[str, np.ndarray], model, version: str) -> List[Dict]:
+        """
+        Score a batch of events in one call
+        
+        Returns:
+            audit_anomalies rows for the flagged events
+        """
+        features = self._extract_features(events['event_datetime'], events['operation'])
+        
+        if model is None:
+            flagged, reasons = self._rule_based_anomaly_detection(features)
+            scores = np.full(len(features), -1.0)
+        else:
+            # The features are discrete (hour, weekday, flags), so each
+            # distinct feature row is scored once and broadcast
+            unique_features, inverse = np.unique(features, axis=0, return_inverse=True)
+            scores = model.score_samples(unique_features)[inverse.ravel()]
+            # Below the fitted offset means anomalous (predict() == -1)
+            flagged = np.flatnonzero(scores < model.offset_)
+            reasons = [self._explain_anomaly(features[idx]) for idx in flagged]
+        
+        return [
+            {
+                'audit_id': events['audit_id'][idx],
+                'event_datetime': events['event_datetime'][idx].item(),
+                'event_type': events['event_type'][idx],
+                'operation': events['operation'][idx],
+                'user_email': events['user_email'][idx],
+                'site_id': events['site_id'][idx],
+                'site_url': events['site_url'][idx],
+                'anomaly_score': float(scores[idx]),
+                'reason': reason,
+                'model_version': version,
+            }
+            for idx, reason in zip(flagged, reasons)
+        ]
+    
+    @staticmethod
+    def _to_arrays(rows: Sequence[Any], names: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Turn projected rows into one NumPy array per column
+        
+        Returns:
+            Column name -> array (event_datetime as datetime64[us])
+        """
+        values = list(zip(*rows)) if rows else [()] * len(names)
+        events = {name: np.array(column, dtype=object) for name, column in zip(names, values)}
+        events['event_datetime'] = np.array(values[names.index('event_datetime')], dtype='datetime64[us]')
+        return events
+    
+    def _extract_features(self, event_datetimes: np.ndarray, operations: np.ndarray) -> np.ndarray:
+        """
+        Extract numerical features (FEATURE_NAMES) from audit event columns
+        
+        Args:
+            event_datetimes: datetime64 array
+            operations: Operation names
+        
+        Returns:
+            (events x features) float array
+        """
+        event_days = event_datetimes.astype('datetime64[D]')
+        hour_of_day = (event_datetimes.astype('datetime64[h]') - event_days).astype(np.int64)
+        # 1970-01-01 was a Thursday; shift so Monday = 0 like datetime.weekday()
+        day_of_week = (event_days.astype(np.int64) + 3) % 7
+        
+        # Classify each distinct operation once, then broadcast
+        unique_operations, inverse = np.unique(operations.astype(str), return_inverse=True)
+        is_download = np.isin(unique_operations, DOWNLOAD_OPERATIONS)[inverse]
+        is_permission_change = np.char.find(unique_operations, 'Permission')[inverse] >= 0
+        is_deletion = np.char.find(unique_operations, 'Delete')[inverse] >= 0
+        
+        return np.column_stack([
+            hour_of_day,
+            day_of_week,
+            is_download,
+            is_permission_change,
+            is_deletion,
+        ]).astype(np.float64)
     
-    def _explain_anomaly(self, log: AuditLog, features: np.ndarray) -> str:
+    def _explain_anomaly(self, features: np.ndarray) -> str:
         """Generate human-readable explanation for anomaly"""
         hour = int(features[0])
         
@@ -125,137 +432,54 @@ class AnomalyDetectionService:
         if hour < 6 or hour > 22:
             reasons.append("Off-hours access")
         
-        if log.operation in ['FileDownloaded', 'FileAccessed']:
+        if features[2]:
             reasons.append("Unusual access pattern")
         
-        if 'Permission' in log.operation:
+        if features[3]:
             reasons.append("Permission modification")
         
         return "; ".join(reasons) if reasons else "Anomalous pattern detected"
     
-    def _rule_based_anomaly_detection(self, logs: List[AuditLog]) -> List[Dict]:
-        """Fallback rule-based anomaly detection"""
-        anomalies = []
+    def _rule_based_anomaly_detection(self, features: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+        """
+        Fallback rule-based anomaly detection
         
-        for log in logs:
-            is_anomaly = False
-            reasons = []
-            
-            # Off-hours access (before 6 AM or after 10 PM)
-            if log.event_datetime.hour < 6 or log.event_datetime.hour > 22:
-                is_anomaly = True
-                reasons.append("Off-hours access")
-            
-            # Weekend access for sensitive operations
-            if log.event_datetime.weekday() >= 5 and 'Permission' in log.operation:
-                is_anomaly = True
-                reasons.append("Weekend permission change")
-            
-            if is_anomaly:
-                anomalies.append({
-                    "audit_id": str(log.audit_id),
-                    "event_type": log.event_type,
-                    "operation": log.operation,
-                    "user_email": log.user_email,
-                    "site_url": log.site_url,
-                    "event_datetime": log.event_datetime.isoformat(),
-                    "anomaly_score": -1.0,
-                    "reason": "; ".join(reasons),
-                })
-        
-        return anomalies
+        Returns:
+            (indexes of flagged events, reason for each)
+        """
+        hour, day_of_week, is_permission_change = features[:, 0], features[:, 1], features[:, 3].astype(bool)
+        
+        # Off-hours access (before 6 AM or after 10 PM)
+        off_hours = (hour < 6) | (hour > 22)
+        # Weekend access for sensitive operations
+        weekend_permission_change = (day_of_week >= 5) & is_permission_change
+        
+        flagged = np.flatnonzero(off_hours | weekend_permission_change)
+        reasons = []
+        for idx in flagged:
+            event_reasons = []
+            if off_hours[idx]:
+                event_reasons.append("Off-hours access")
+            if weekend_permission_change[idx]:
+                event_reasons.append("Weekend permission change")
+            reasons.append("; ".join(event_reasons))
+        
+        return flagged, reasons
     
     async def calculate_site_risk_score(self, site_id: str) -> Dict:
         """
-        Calculate risk score for a site
+        Risk score for a site, read from the materialized site_risk_scores
         
         Args:
             site_id: Site ID
         
         Returns:
             Risk score and breakdown
+        
+        Raises:
+            ValueError: If the site does not exist
         """
-        logger.info(f"Calculating risk score for site {site_id}")
-        
-        site = self.db.query(SharePointSite).filter(
-            SharePointSite.site_id == site_id
-        ).first()
-        
-        if not site:
-            raise ValueError(f"Site {site_id} not found")
-        
-        risk_score = 0
-        factors = []
-        
-        # Factor 1: Inactivity (max 20 points)
-        if site.last_activity:
-            days_inactive = (datetime.utcnow() - site.last_activity).days
-            if days_inactive > 180:
-                risk_score += 20
-                factors.append(f"Inactive for {days_inactive} days")
-            elif days_inactive > 90:
-                risk_score += 10
-                factors.append(f"Inactive for {days_inactive} days")
-        
-        # Factor 2: Storage usage (max 15 points)
-        if site.storage_usage_percent > 90:
-            risk_score += 15
-            factors.append("Storage usage critical")
-        elif site.storage_usage_percent > 75:
-            risk_score += 8
-            factors.append("Storage usage high")
-        
-        # Factor 3: External users (max 25 points)
-        from app.models.site import AccessMatrix
-        external_users = self.db.query(AccessMatrix).filter(
-            AccessMatrix.site_id == site_id,
-            AccessMatrix.is_external_user == True
-        ).count()
-        
-        if external_users > 10:
-            risk_score += 25
-            factors.append(f"{external_users} external users")
-        elif external_users > 0:
-            risk_score += 15
-            factors.append(f"{external_users} external users")
-        
-        # Factor 4: Overdue access reviews (max 20 points)
-        overdue_reviews = self.db.query(AccessReviewCycle).filter(
-            AccessReviewCycle.site_id == site_id,
-            AccessReviewCycle.due_date < datetime.utcnow(),
-            AccessReviewCycle.status.in_(['pending', 'in_progress'])
-        ).count()
-        
-        if overdue_reviews > 0:
-            risk_score += 20
-            factors.append(f"{overdue_reviews} overdue reviews")
-        
-        # Factor 5: Recent anomalies (max 20 points)
-        recent_anomalies = await self.detect_access_anomalies(site_id=site_id, days=7)
-        if len(recent_anomalies) > 5:
-            risk_score += 20
-            factors.append(f"{len(recent_anomalies)} recent anomalies")
-        elif len(recent_anomalies) > 0:
-            risk_score += 10
-            factors.append(f"{len(recent_anomalies)} recent anomalies")
-        
-        # Determine risk level
-        if risk_score >= 70:
-            risk_level = "critical"
-        elif risk_score >= 50:
-            risk_level = "high"
-        elif risk_score >= 30:
-            risk_level = "medium"
-        else:
-            risk_level = "low"
-        
-        return {
-            "site_id": str(site_id),
-            "site_name": site.name,
-            "risk_score": min(risk_score, 100),
-            "risk_level": risk_level,
-            "risk_factors": factors,
-        }
+        return SiteRiskService(self.db).get(site_id)
 
 
 def get_anomaly_detection_service(db: Session) -> AnomalyDetectionService:
@@ -0,0 +1,358 @@
+"""
+Audit archive service - cold-tier Parquet storage for expired audit partitions
+"""
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from datetime import datetime
+from sqlalchemy import column, func, select, table
+from sqlalchemy.orm import Session
+import json
+import logging
+import posixpath
+import uuid
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pyarrow import fs as pafs
+
+from app.core.config import settings
+from app.models.audit import AuditLog
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("audit_id", pa.string()),
+    ("event_type", pa.string()),
+    ("operation", pa.string()),
+    ("event_datetime", pa.timestamp("us")),
+    ("user_id", pa.string()),
+    ("user_email", pa.string()),
+    ("site_id", pa.string()),
+    ("site_url", pa.string()),
+    ("resource_name", pa.string()),
+    ("resource_type", pa.string()),
+    ("client_ip", pa.string()),
+    ("user_agent", pa.string()),
+    ("result_status", pa.string()),
+    ("details", pa.string()),  # JSON text
+    ("ms_audit_id", pa.string()),
+    ("synced_from_ms365", pa.timestamp("us")),
+])
+
+# Columns read back by default; the JSON details are only loaded on request
+QUERY_COLUMNS = [name for name in ARCHIVE_SCHEMA.names if name != "details"]
+
+
+def _archive_value(value: Any) -> Any:
+    """Convert a database value to its archive representation"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+class AuditArchiveService:
+    """
+    Monthly audit partitions as zstd-compressed Parquet files
+
+    Each archived month is one file under AUDIT_ARCHIVE_URI (a local path or
+    an object store URI such as s3://bucket/prefix), sorted by event time so
+    row-group statistics let date-bounded reads skip most of the file. A
+    manifest.json at the root lists the archived months; it is the source of
+    truth for query-through reads.
+    """
+
+    def __init__(self, db: Optional[Session] = None, uri: Optional[str] = None):
+        self.db = db
+        self.filesystem, self.root = pafs.FileSystem.from_uri(uri or settings.AUDIT_ARCHIVE_URI)
+
+    def archive_partition(self, partition: str, month: datetime) -> Dict[str, Any]:
+        """
+        Export one monthly audit partition to Parquet and record it in the manifest
+
+        Rows are streamed from the database in batches of AUDIT_ARCHIVE_BATCH_ROWS;
+        the file is written under a temporary name, checked against the
+        partition's row count and only then moved into place.
+
+        Args:
+            partition: Partition table name (e.g. audit_logs_p2025_09)
+            month: First day of the partition's month
+
+        Returns:
+            Manifest entry for the archived month
+        """
+        path = self._path(f"{month:%Y}/audit_logs_{month:%Y_%m}.parquet")
+        temp_path = f"{path}.tmp"
+        self.filesystem.create_dir(posixpath.dirname(path), recursive=True)
+
+        # Same column types as audit_logs, so values come back as Python objects
+        source = table(partition, *[
+            column(name, AuditLog.__table__.c[name].type) for name in ARCHIVE_SCHEMA.names
+        ])
+        result = self.db.execute(
+            select(*source.c).order_by(source.c.event_datetime),
+            execution_options={"yield_per": settings.AUDIT_ARCHIVE_BATCH_ROWS},
+        )
+
+        rows = 0
+        with self.filesystem.open_output_stream(temp_path) as sink:
+            with pq.ParquetWriter(sink, ARCHIVE_SCHEMA, compression="zstd") as writer:
+                for batch in result.partitions():
+                    data = {
+                        name: [_archive_value(row[index]) for row in batch]
+                        for index, name in enumerate(ARCHIVE_SCHEMA.names)
+                    }
+                    writer.write_batch(pa.RecordBatch.from_pydict(data, schema=ARCHIVE_SCHEMA))
+                    rows += len(batch)
+
+        expected = self.db.execute(select(func.count()).select_from(source)).scalar()
+        written = pq.ParquetFile(temp_path, filesystem=self.filesystem).metadata.num_rows
+        if written != rows or rows != expected:
+            self.filesystem.delete_file(temp_path)
+            raise RuntimeError(f"Archive of {partition} wrote {written} rows, expected {expected}")
+
+        self.filesystem.move(temp_path, path)
+
+        entry = {
+            "month": f"{month:%Y-%m}",
+            "path": posixpath.relpath(path, self.root),
+            "rows": rows,
+            "bytes": self.filesystem.get_file_info(path).size,
+            "archived_at": datetime.utcnow().isoformat(),
+        }
+        manifest = self._read_manifest()
+        manifest["files"] = [item for item in manifest["files"] if item["month"] != entry["month"]]
+        manifest["files"].append(entry)
+        self._write_manifest(manifest)
+
+        logger.info(f"Archived {rows} audit logs from {partition} to {path} ({entry['bytes']} bytes)")
+        return entry
+
+    def prune(self, years: Optional[int] = None) -> List[str]:
+        """
+        Delete archived months older than the archive retention period
+
+        Args:
+            years: Years to keep (default: AUDIT_ARCHIVE_RETENTION_YEARS)
+
+        Returns:
+            Months removed (YYYY-MM)
+        """
+        years = years or settings.AUDIT_ARCHIVE_RETENTION_YEARS
+        now = datetime.utcnow()
+        cutoff = f"{now.year - years:04d}-{now.month:02d}"
+
+        manifest = self._read_manifest()
+        expired = [item for item in manifest["files"] if item["month"] < cutoff]
+        if not expired:
+            return []
+
+        for item in expired:
+            try:
+                self.filesystem.delete_file(self._path(item["path"]))
+            except FileNotFoundError:
+                pass
+        manifest["files"] = [item for item in manifest["files"] if item["month"] >= cutoff]
+        self._write_manifest(manifest)
+
+        months = [item["month"] for item in expired]
+        logger.info(f"Pruned archived audit months: {', '.join(months)}")
+        return months
+
+    def boundary(self) -> Optional[datetime]:
+        """
+        First instant after the newest archived month
+
+        Returns:
+            Start of the month following the latest archived one, or None
+            if nothing has been archived
+        """
+        months = [item["month"] for item in self._read_manifest()["files"]]
+        if not months:
+            return None
+        year, month = (int(part) for part in max(months).split("-"))
+        return datetime(year + month // 12, month % 12 + 1, 1)
+
+    def covers(self, start_date: Optional[datetime]) -> bool:
+        """Whether a range starting at start_date (None = unbounded) reaches archived months"""
+        boundary = self.boundary()
+        return boundary is not None and (start_date is None or start_date < boundary)
+
+    def query_logs(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        event_type: Optional[str] = None,
+        operation: Optional[str] = None,
+        user_email: Optional[str] = None,
+        site_url: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        key: Optional[Sequence[Any]] = None,
+        ascending: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Read archived audit logs, newest first
+
+        Only files for months overlapping the range are opened, and date and
+        equality filters are pushed down to Parquet row groups. Rows are
+        ordered by (event_datetime, audit_id) like the keyset-paginated API.
+
+        Args:
+            start_date: Inclusive lower bound on event_datetime
+            end_date: Inclusive upper bound on event_datetime
+            skip: Rows to skip (across all archived months)
+            limit: Maximum rows to return (None = all)
+            event_type: Exact event type
+            operation: Exact operation
+            user_email: Substring of the user email
+            site_url: Substring of the site URL
+            columns: Columns to return (default: everything but details)
+            key: Only rows strictly past this (event_datetime, audit_id) key
+                in reading order
+            ascending: Read oldest first instead
+
+        Returns:
+            Audit log rows as dicts
+        """
+        if key is not None:
+            key_datetime, key_id = key[0], str(key[1])
+            if ascending:
+                start_date = max(start_date, key_datetime) if start_date else key_datetime
+            else:
+                end_date = min(end_date, key_datetime) if end_date else key_datetime
+
+        filters = []
+        if start_date:
+            filters.append(("event_datetime", ">=", start_date))
+        if end_date:
+            filters.append(("event_datetime", "<=", end_date))
+        if event_type:
+            filters.append(("event_type", "==", event_type))
+        if operation:
+            filters.append(("operation", "==", operation))
+
+        first_month = f"{start_date:%Y-%m}" if start_date else ""
+        last_month = f"{end_date:%Y-%m}" if end_date else "9999-12"
+        entries = sorted(
+            (item for item in self._read_manifest()["files"] if first_month <= item["month"] <= last_month),
+            key=lambda item: item["month"],
+            reverse=not ascending,
+        )
+
+        columns = columns or QUERY_COLUMNS
+        # Sorting and filtering need their columns even if they are not returned
+        read_columns = list(dict.fromkeys(["event_datetime", "audit_id", "user_email", "site_url", *columns]))
+        order = "ascending" if ascending else "descending"
+
+        rows: List[Dict[str, Any]] = []
+        for item in entries:
+            month_rows = pq.read_table(
+                self._path(item["path"]),
+                filesystem=self.filesystem,
+                columns=read_columns,
+                filters=filters or None,
+            )
+            if user_email:
+                month_rows = month_rows.filter(
+                    pc.fill_null(pc.match_substring(month_rows["user_email"], user_email), False)
+                )
+            if site_url:
+                month_rows = month_rows.filter(
+                    pc.fill_null(pc.match_substring(month_rows["site_url"], site_url), False)
+                )
+            if key is not None:
+                beyond = pc.greater if ascending else pc.less
+                month_rows = month_rows.filter(pc.or_(
+                    beyond(month_rows["event_datetime"], pa.scalar(key_datetime, pa.timestamp("us"))),
+                    pc.and_(
+                        pc.equal(month_rows["event_datetime"], pa.scalar(key_datetime, pa.timestamp("us"))),
+                        beyond(month_rows["audit_id"], key_id),
+                    ),
+                ))
+
+            if skip >= month_rows.num_rows:
+                skip -= month_rows.num_rows
+                continue
+
+            month_rows = month_rows.sort_by([("event_datetime", order), ("audit_id", order)]).slice(skip)
+            skip = 0
+            if limit is not None:
+                month_rows = month_rows.slice(0, limit - len(rows))
+            rows.extend(month_rows.select(columns).to_pylist())
+
+            if limit is not None and len(rows) >= limit:
+                break
+
+        return rows
+
+    def iter_logs(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        columns: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream archived audit logs, newest first, one row group at a time
+
+        Unlike query_logs, at most one Parquet row group (AUDIT_ARCHIVE_BATCH_ROWS
+        rows) is held in memory, so exports of any size run in constant memory.
+
+        Args:
+            start_date: Inclusive lower bound on event_datetime
+            end_date: Inclusive upper bound on event_datetime
+            columns: Columns to return (default: everything but details)
+
+        Yields:
+            Audit log rows as dicts
+        """
+        columns = columns or QUERY_COLUMNS
+        read_columns = list(dict.fromkeys(["event_datetime", *columns]))
+        first_month = f"{start_date:%Y-%m}" if start_date else ""
+        last_month = f"{end_date:%Y-%m}" if end_date else "9999-12"
+        entries = sorted(
+            (item for item in self._read_manifest()["files"] if first_month <= item["month"] <= last_month),
+            key=lambda item: item["month"],
+            reverse=True,
+        )
+
+        for item in entries:
+            parquet_file = pq.ParquetFile(self._path(item["path"]), filesystem=self.filesystem)
+            # Files are written oldest first; walk the row groups backwards
+            for index in reversed(range(parquet_file.num_row_groups)):
+                group = parquet_file.read_row_group(index, columns=read_columns)
+                if start_date:
+                    group = group.filter(pc.greater_equal(group["event_datetime"], pa.scalar(start_date, pa.timestamp("us"))))
+                if end_date:
+                    group = group.filter(pc.less_equal(group["event_datetime"], pa.scalar(end_date, pa.timestamp("us"))))
+                group = group.sort_by([("event_datetime", "descending")]).select(columns)
+                yield from group.to_pylist()
+
+    def _path(self, relative: str) -> str:
+        return posixpath.join(self.root, relative)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        """Load the manifest, or an empty one if nothing was archived yet"""
+        try:
+            with self.filesystem.open_input_stream(self._path(MANIFEST_FILE)) as source:
+                return json.loads(source.read().decode("utf-8"))
+        except FileNotFoundError:
+            return {"version": 1, "files": []}
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        """Replace the manifest (written to a temporary file, then moved)"""
+        manifest["files"].sort(key=lambda item: item["month"])
+        self.filesystem.create_dir(self.root, recursive=True)
+        temp_path = self._path(f"{MANIFEST_FILE}.tmp")
+        with self.filesystem.open_output_stream(temp_path) as sink:
+            sink.write(json.dumps(manifest, indent=2).encode("utf-8"))
+        self.filesystem.move(temp_path, self._path(MANIFEST_FILE))
+
+
+def get_audit_archive_service(db: Session) -> AuditArchiveService:
+    """Dependency to get audit archive service"""
+    return AuditArchiveService(db)
@@ -0,0 +1,204 @@
+"""
+Audit partition service - monthly partition management for audit_logs
+"""
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from sqlalchemy import delete, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+import logging
+import re
+
+from app.core.config import settings
+from app.models.audit import AuditLog
+from app.services.audit_archive_service import AuditArchiveService
+
+logger = logging.getLogger(__name__)
+
+AUDIT_TABLE = "audit_logs"
+
+# Catch-all partition for rows outside every monthly range
+DEFAULT_PARTITION = "audit_logs_default"
+
+PARTITION_NAME_PATTERN = re.compile(r"^audit_logs_p(\d{4})_(\d{2})$")
+
+
+def month_start(value: datetime) -> datetime:
+    """Truncate a datetime to the first instant of its month"""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Shift a month start by a number of months (may be negative)"""
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    """Name of the monthly partition holding the given month, e.g. audit_logs_p2026_10"""
+    return f"audit_logs_p{month:%Y_%m}"
+
+
+class AuditPartitionService:
+    """
+    Keeps audit_logs partitioned by calendar month
+
+    Partitions are created AUDIT_PARTITION_PREMAKE_MONTHS ahead so inserts
+    never land in the default partition, and months older than
+    AUDIT_LOG_RETENTION_MONTHS are archived, then detached (and dropped) as
+    a whole instead of being deleted row by row.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @property
+    def is_postgresql(self) -> bool:
+        return self.db.get_bind().dialect.name == "postgresql"
+
+    def list_partitions(self) -> List[Tuple[str, datetime]]:
+        """
+        List the monthly partitions currently attached to audit_logs
+
+        Returns:
+            (partition name, month start) pairs in time order
+        """
+        rows = self.db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "WHERE parent.relname = :table"
+            ),
+            {"table": AUDIT_TABLE},
+        ).scalars()
+
+        partitions = []
+        for name in rows:
+            match = PARTITION_NAME_PATTERN.match(name)
+            if match:
+                partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    def ensure_partitions(
+        self,
+        start: Optional[datetime] = None,
+        months_ahead: Optional[int] = None
+    ) -> List[str]:
+        """
+        Create any missing monthly partitions
+
+        Args:
+            start: First month to cover (default: start of the retention period)
+            months_ahead: Months to pre-create past the current one
+                (default: AUDIT_PARTITION_PREMAKE_MONTHS)
+
+        Returns:
+            Names of the partitions created
+        """
+        if not self.is_postgresql:
+            return []
+
+        current = month_start(datetime.utcnow())
+        month = month_start(start) if start else self._retention_cutoff()
+        last = add_months(current, settings.AUDIT_PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead)
+        existing = {name for name, _ in self.list_partitions()}
+
+        created = []
+        while month <= last:
+            name = partition_name(month)
+            if name not in existing:
+                try:
+                    # Savepoint so one conflicting month (rows already in the
+                    # default partition) does not abort the others
+                    with self.db.begin_nested():
+                        self.db.execute(text(
+                            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {AUDIT_TABLE} "
+                            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+                        ))
+                    created.append(name)
+                except SQLAlchemyError as e:
+                    logger.error(f"Could not create audit partition {name}: {str(e)}")
+            month = add_months(month, 1)
+
+        self.db.commit()
+        if created:
+            logger.info(f"Created audit partitions: {', '.join(created)}")
+        return created
+
+    def enforce_retention(self, months: Optional[int] = None) -> List[str]:
+        """
+        Remove audit months older than the retention period
+
+        With AUDIT_ARCHIVE_ENABLED each partition is first exported to the
+        cold-tier archive; a partition whose export fails stays attached and
+        is retried on the next run. Whole partitions are then detached and
+        dropped unless AUDIT_PARTITION_EXPIRED_ACTION is "detach". Other
+        databases fall back to a DELETE.
+
+        Args:
+            months: Months to keep (default: AUDIT_LOG_RETENTION_MONTHS)
+
+        Returns:
+            Names of the partitions detached
+        """
+        cutoff = self._retention_cutoff(months)
+
+        if not self.is_postgresql:
+            result = self.db.execute(delete(AuditLog).where(AuditLog.event_datetime < cutoff))
+            self.db.commit()
+            logger.info(f"Deleted {result.rowcount} audit logs older than {cutoff}")
+            return []
+
+        expired = [(name, month) for name, month in self.list_partitions() if add_months(month, 1) <= cutoff]
+        drop = settings.AUDIT_PARTITION_EXPIRED_ACTION == "drop"
+        archive = AuditArchiveService(self.db) if settings.AUDIT_ARCHIVE_ENABLED else None
+
+        removed = []
+        for name, month in expired:
+            if archive is not None:
+                try:
+                    archive.archive_partition(name, month)
+                except Exception as e:
+                    self.db.rollback()
+                    logger.error(f"Archiving audit partition {name} failed, keeping it: {str(e)}")
+                    continue
+
+            self.db.execute(text(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {name}"))
+            if drop:
+                self.db.execute(text(f"DROP TABLE {name}"))
+            self.db.commit()
+            removed.append(name)
+            logger.info(f"Audit partition {name} {'dropped' if drop else 'detached'} (older than {cutoff:%Y-%m})")
+
+        return removed
+
+    def run_maintenance(self) -> Dict[str, int]:
+        """
+        Pre-create upcoming partitions and expire old ones
+
+        Returns:
+            Statistics dictionary with created, expired and pruned archive counts
+        """
+        created = self.ensure_partitions()
+        expired = self.enforce_retention()
+        pruned = AuditArchiveService(self.db).prune() if settings.AUDIT_ARCHIVE_ENABLED else []
+
+        if self.is_postgresql and self.db.execute(
+            text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}
+        ).scalar():
+            default_rows = self.db.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}")).scalar()
+            if default_rows:
+                logger.warning(f"{default_rows} audit logs are in {DEFAULT_PARTITION} (outside every monthly partition)")
+
+        return {'created': len(created), 'expired': len(expired), 'archive_pruned': len(pruned)}
+
+    def _retention_cutoff(self, months: Optional[int] = None) -> datetime:
+        """First month still inside the retention period"""
+        months = months or settings.AUDIT_LOG_RETENTION_MONTHS
+        return add_months(month_start(datetime.utcnow()), -months)
+
+
+def get_audit_partition_service(db: Session) -> AuditPartitionService:
+    """Dependency to get audit partition service"""
+    return AuditPartitionService(db)
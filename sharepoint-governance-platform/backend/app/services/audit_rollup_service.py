@@ -0,0 +1,225 @@
+"""
+Audit rollup service - hourly audit event counts by site and by user
+"""
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime, timedelta
+from sqlalchemy import Text, case, cast, delete, func, insert, literal_column, select
+from sqlalchemy.orm import Session
+import logging
+
+from app.db.bulk import BulkWriter
+from app.models.audit import AuditLog, AuditSiteRollup, AuditUserRollup
+
+logger = logging.getLogger(__name__)
+
+# Columns of inserted audit rows needed to maintain the rollups
+ROLLUP_SOURCE_COLUMNS = [
+    'event_datetime', 'operation', 'result_status', 'site_id', 'site_url', 'user_id', 'user_email',
+]
+
+COUNTER_COLUMNS = ['event_count', 'failed_count']
+
+
+def hour_bucket(value: datetime) -> datetime:
+    """Truncate a datetime to the start of its hour"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class AuditRollupService:
+    """
+    Hourly rollups of audit_logs
+
+    AuditSiteRollup (hour x site x operation) and AuditUserRollup
+    (hour x user x operation) are incremented in the same transaction as the
+    audit rows they count, so dashboards and reports read a few rows per hour
+    instead of scanning audit_logs. rebuild() recomputes a range from
+    audit_logs after a backfill or a manual correction.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @property
+    def is_postgresql(self) -> bool:
+        return self.db.get_bind().dialect.name == "postgresql"
+
+    def apply(self, events: Iterable[Any]) -> int:
+        """
+        Add newly inserted audit events to the rollups (no commit)
+
+        Only pass rows that were actually inserted, or duplicates are counted twice.
+
+        Args:
+            events: Rows or objects with the ROLLUP_SOURCE_COLUMNS attributes
+
+        Returns:
+            Number of events counted
+        """
+        sites: Dict[tuple, Dict[str, Any]] = {}
+        users: Dict[tuple, Dict[str, Any]] = {}
+        counted = 0
+
+        for event in events:
+            bucket = hour_bucket(event.event_datetime)
+            failed = 0 if event.result_status == 'Success' else 1
+
+            site = sites.setdefault((bucket, event.site_url or '', event.operation), {
+                'bucket': bucket,
+                'site_url': event.site_url or '',
+                'operation': event.operation,
+                'site_id': event.site_id,
+                'event_count': 0,
+                'failed_count': 0,
+            })
+            site['event_count'] += 1
+            site['failed_count'] += failed
+
+            user = users.setdefault((bucket, event.user_email or '', event.operation), {
+                'bucket': bucket,
+                'user_email': event.user_email or '',
+                'operation': event.operation,
+                'user_id': event.user_id,
+                'event_count': 0,
+                'failed_count': 0,
+            })
+            user['event_count'] += 1
+            user['failed_count'] += failed
+            counted += 1
+
+        if not counted:
+            return 0
+
+        # Key order keeps concurrent ingests locking rollup rows in the same sequence
+        writer = BulkWriter(self.db)
+        writer.upsert(
+            AuditSiteRollup,
+            [sites[key] for key in sorted(sites)],
+            conflict_columns=['bucket', 'site_url', 'operation'],
+            update_columns=[],
+            increment_columns=COUNTER_COLUMNS,
+        )
+        writer.upsert(
+            AuditUserRollup,
+            [users[key] for key in sorted(users)],
+            conflict_columns=['bucket', 'user_email', 'operation'],
+            update_columns=[],
+            increment_columns=COUNTER_COLUMNS,
+        )
+        return counted
+
+    def rebuild(self, start: datetime, end: datetime, chunk: timedelta = timedelta(days=1)) -> int:
+        """
+        Recompute the rollups for a time range from audit_logs
+
+        Whole hours from the hour containing start up to end are replaced,
+        one chunk per transaction.
+
+        Args:
+            start: Start of the range
+            end: End of the range (exclusive; rounded up to a whole hour)
+            chunk: Range rebuilt per transaction
+
+        Returns:
+            Number of audit events counted
+        """
+        bucket_start = hour_bucket(start)
+        bucket_end = hour_bucket(end) if end == hour_bucket(end) else hour_bucket(end) + timedelta(hours=1)
+        bucket = self._bucket_expression()
+        failed = func.sum(case((AuditLog.result_status == 'Success', 0), else_=1))
+
+        total = 0
+        chunk_start = bucket_start
+        while chunk_start < bucket_end:
+            chunk_end = min(chunk_start + chunk, bucket_end)
+            in_range = [AuditLog.event_datetime >= chunk_start, AuditLog.event_datetime < chunk_end]
+
+            for model, key_column, id_column in (
+                (AuditSiteRollup, AuditLog.site_url, AuditLog.site_id),
+                (AuditUserRollup, AuditLog.user_email, AuditLog.user_id),
+            ):
+                self.db.execute(delete(model).where(model.bucket >= chunk_start, model.bucket < chunk_end))
+                key = func.coalesce(key_column, '')
+                # PostgreSQL has no max(uuid); aggregate the text form
+                any_id = cast(func.max(cast(id_column, Text)), id_column.type)
+                source = (
+                    select(bucket, key, AuditLog.operation, any_id, func.count(), failed)
+                    .where(*in_range)
+                    .group_by(bucket, key, AuditLog.operation)
+                )
+                table = model.__table__
+                self.db.execute(
+                    insert(table).from_select(
+                        ['bucket', key_column.name, 'operation', id_column.name, 'event_count', 'failed_count'],
+                        source,
+                    )
+                )
+
+            counted = self.db.execute(
+                select(func.coalesce(func.sum(AuditSiteRollup.event_count), 0))
+                .where(AuditSiteRollup.bucket >= chunk_start, AuditSiteRollup.bucket < chunk_end)
+            ).scalar()
+            self.db.commit()
+
+            total += counted
+            logger.info(f"Rebuilt audit rollups {chunk_start} - {chunk_end}: {counted} events")
+            chunk_start = chunk_end
+
+        return total
+
+    def event_count(
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        site_id: Optional[Any] = None
+    ) -> int:
+        """
+        Number of audit events in a time range
+
+        Counts whole hours: every hour starting from the hour containing start
+        up to end.
+
+        Args:
+            start: Start of the range
+            end: End of the range (default: now)
+            site_id: Optional site to restrict to
+
+        Returns:
+            Event count
+        """
+        query = select(func.coalesce(func.sum(AuditSiteRollup.event_count), 0)).where(
+            AuditSiteRollup.bucket >= hour_bucket(start)
+        )
+        if end:
+            query = query.where(AuditSiteRollup.bucket <= end)
+        if site_id:
+            query = query.where(AuditSiteRollup.site_id == site_id)
+        return int(self.db.execute(query).scalar())
+
+    def site_hourly(self, start: datetime, end: Optional[datetime] = None) -> List[AuditSiteRollup]:
+        """
+        Hourly per-site, per-operation counts
+
+        Args:
+            start: Start of the range
+            end: End of the range (default: now)
+
+        Returns:
+            Rollup rows ordered by hour
+        """
+        query = self.db.query(AuditSiteRollup).filter(AuditSiteRollup.bucket >= hour_bucket(start))
+        if end:
+            query = query.filter(AuditSiteRollup.bucket <= end)
+        return query.order_by(AuditSiteRollup.bucket).all()
+
+    def _bucket_expression(self):
+        """SQL expression truncating event_datetime to the hour"""
+        if self.is_postgresql:
+            # Literal (not bound) unit so SELECT and GROUP BY render identically
+            return func.date_trunc(literal_column("'hour'"), AuditLog.event_datetime)
+        # SQLite stores DateTime as text in this format
+        return func.strftime('%Y-%m-%d %H:00:00.000000', AuditLog.event_datetime)
+
+
+def get_audit_rollup_service(db: Session) -> AuditRollupService:
+    """Dependency to get audit rollup service"""
+    return AuditRollupService(db)
@@ -1,18 +1,42 @@
 """
 Audit service for syncing and managing audit logs
 """
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
+from prometheus_client import Counter, Gauge
 import logging
 
+from app.core.config import settings
+from app.db.bulk import BulkWriter
 from app.models.audit import AuditLog
-from app.models.user import User
-from app.models.site import SharePointSite
+from app.models.sync import SyncCheckpoint
 from app.integrations.graph_client import graph_service
+from app.services.audit_rollup_service import ROLLUP_SOURCE_COLUMNS, AuditRollupService
+from app.services.audit_sketch_service import AuditSketchService
+from app.services.behavior_baseline_service import BASELINE_SOURCE_COLUMNS, BehaviorBaselineService
+from app.services.identity_resolver import identity_resolver
+from app.services.site_url_index import site_url_index
 
 logger = logging.getLogger(__name__)
 
+# SyncCheckpoint key holding the audit log watermark
+AUDIT_SYNC_CHECKPOINT = "audit_logs"
+
+AUDIT_WATERMARK_LAG = Gauge(
+    "audit_sync_watermark_lag_seconds",
+    "Seconds between now and the latest audit event ingested",
+    ["source"],
+)
+
+AUDIT_UNDATED_EVENTS = Counter(
+    "audit_sync_undated_events_total",
+    "Audit events skipped because activityDateTime was missing or unparseable",
+)
+
+# Columns returned for inserted audit rows (rollups, sketches and baselines)
+INGEST_RETURNING_COLUMNS = list(dict.fromkeys(ROLLUP_SOURCE_COLUMNS + BASELINE_SOURCE_COLUMNS))
+
 
 class AuditService:
     """Service for audit log management"""
@@ -37,83 +61,252 @@ class AuditService:
         Returns:
             Number of audit logs synced
         """
+        synced_count, _ = await self._sync_window(start_date, end_date, operations)
+        return synced_count
+    
+    async def backfill(self, months: Optional[int] = None) -> int:
+        """
+        Re-fetch the audit log history, e.g. after a fresh install or long outage
+        
+        The range is fetched in AUDIT_BACKFILL_SHARDS concurrent time slices;
+        events already stored are skipped on insert, so a backfill can be
+        re-run safely. The incremental watermark is left unchanged. Run it
+        with python -m app.tasks.audit_backfill.
+        
+        Args:
+            months: How far back to go (default: AUDIT_LOG_RETENTION_MONTHS)
+        
+        Returns:
+            Number of audit logs synced
+        """
+        months = months or settings.AUDIT_LOG_RETENTION_MONTHS
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=30 * months)
+        
+        synced_count, _ = await self._sync_window(
+            start_date, end_date, shards=settings.AUDIT_BACKFILL_SHARDS
+        )
+        return synced_count
+    
+    async def sync_incremental(self) -> Dict[str, int]:
+        """
+        Sync audit logs from the persisted watermark up to now
+        
+        Resumes AUDIT_SYNC_OVERLAP_MINUTES before the watermark so late-arriving
+        events are picked up (duplicates are dropped on insert). After downtime
+        the backlog is fetched in windows of AUDIT_SYNC_WINDOW_HOURS, at most
+        AUDIT_SYNC_MAX_WINDOWS_PER_RUN per run; the watermark is saved after
+        every window, so a failed run resumes where it stopped.
+        
+        Returns:
+            Statistics dictionary with synced count, windows and lag
+        """
+        now = datetime.utcnow()
+        checkpoint = self.db.get(SyncCheckpoint, AUDIT_SYNC_CHECKPOINT)
+        if checkpoint is None:
+            checkpoint = SyncCheckpoint(source=AUDIT_SYNC_CHECKPOINT)
+            self.db.add(checkpoint)
+        
+        watermark = checkpoint.watermark
+        if watermark is None:
+            watermark = now - timedelta(hours=settings.AUDIT_SYNC_INITIAL_LOOKBACK_HOURS)
+            logger.info(f"No audit sync watermark yet, starting from {watermark}")
+        
+        window = timedelta(hours=settings.AUDIT_SYNC_WINDOW_HOURS)
+        start = watermark - timedelta(minutes=settings.AUDIT_SYNC_OVERLAP_MINUTES)
+        
+        if now - watermark > window:
+            logger.warning(
+                f"Audit sync is {(now - watermark).total_seconds() / 3600:.1f}h behind; "
+                f"catching up in {settings.AUDIT_SYNC_WINDOW_HOURS}h windows"
+            )
+        
+        stats = {'synced': 0, 'windows': 0}
+        
+        while start < now and stats['windows'] < settings.AUDIT_SYNC_MAX_WINDOWS_PER_RUN:
+            end = min(start + window, now)
+            synced_count, latest = await self._sync_window(start, end)
+            
+            # The watermark is the latest event ingested; a window without
+            # events is fully covered, so the watermark moves to its end.
+            # Never past the window, or the windows after it would be skipped
+            watermark = max(watermark, min(latest, end) if latest else end)
+            checkpoint.watermark = watermark
+            checkpoint.updated_at = datetime.utcnow()
+            self.db.commit()
+            
+            stats['synced'] += synced_count
+            stats['windows'] += 1
+            start = end
+        
+        lag = (datetime.utcnow() - watermark).total_seconds()
+        AUDIT_WATERMARK_LAG.labels(AUDIT_SYNC_CHECKPOINT).set(lag)
+        stats['lag_seconds'] = int(lag)
+        
+        if start < now:
+            logger.warning(f"Audit sync stopped after {stats['windows']} windows; backlog continues next run")
+        
+        logger.info(f"Incremental audit sync completed: {stats}")
+        return stats
+    
+    async def _sync_window(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        operations: Optional[List[str]] = None,
+        shards: Optional[int] = None
+    ) -> Tuple[int, Optional[datetime]]:
+        """
+        Fetch and ingest one time window of audit logs
+        
+        The window is fetched as concurrent time slices, so pages arrive out
+        of time order; the latest event time is tracked across all of them.
+        Events without a parseable activityDateTime are skipped and counted:
+        event_datetime is part of the dedupe key, so they cannot be stored
+        idempotently.
+        
+        Args:
+            start_date: Start of the window
+            end_date: End of the window
+            operations: Optional list of operations to filter
+            shards: Concurrent time slices (default: AUDIT_FETCH_SHARDS)
+        
+        Returns:
+            (number of audit logs inserted, latest event time seen in the window)
+        """
         logger.info(f"Syncing audit logs from {start_date} to {end_date}")
         
         try:
-            # Fetch audit logs from Microsoft Graph
-            audit_events = await graph_service.get_audit_logs(
+            synced_count = 0
+            undated = 0
+            latest = None
+            identity_resolver.refresh(self.db)
+            site_url_index.ensure_fresh(self.db, settings.SITE_URL_INDEX_MAX_AGE_SECONDS)
+            
+            # Stream events page by page; rows are staged and written in chunks,
+            # each committed so progress survives a failure part-way through
+            staged = []
+            async for audit_events in graph_service.iter_audit_logs_sharded(
                 start_date,
                 end_date,
-                operations
-            )
+                operations,
+                shards=shards
+            ):
+                for event in audit_events:
+                    row = self._audit_row(event)
+                    if row is None:
+                        undated += 1
+                        logger.debug(f"Skipping audit event {event.get('id')} without a valid activityDateTime")
+                        continue
+                    staged.append(row)
+                    if latest is None or row['event_datetime'] > latest:
+                        latest = row['event_datetime']
+                
+                if len(staged) >= settings.AUDIT_INGEST_CHUNK_SIZE:
+                    synced_count += self._ingest_rows(staged)
+                    staged = []
             
-            synced_count = 0
+            synced_count += self._ingest_rows(staged)
             
-            for event in audit_events:
-                # Check if event already exists (deduplication)
-                ms_audit_id = event.get('id')
-                if ms_audit_id:
-                    existing = self.db.query(AuditLog).filter(
-                        AuditLog.ms_audit_id == ms_audit_id
-                    ).first()
-                    
-                    if existing:
-                        continue  # Skip if already synced
-                
-                # Extract event details
-                event_type = event.get('category', 'Unknown')
-                operation = event.get('operationType', 'Unknown')
-                event_datetime = self._parse_datetime(event.get('activityDateTime'))
-                
-                # Extract user information
-                user_email = event.get('initiatedBy', {}).get('user', {}).get('userPrincipalName')
-                user = None
-                if user_email:
-                    user = self.db.query(User).filter(User.email == user_email).first()
-                
-                # Extract target resource (site)
-                site_url = event.get('targetResources', [{}])[0].get('displayName')
-                site = None
-                if site_url:
-                    site = self.db.query(SharePointSite).filter(
-                        SharePointSite.site_url.like(f"%{site_url}%")
-                    ).first()
-                
-                # Create audit log entry
-                audit_log = AuditLog(
-                    event_type=event_type,
-                    operation=operation,
-                    event_datetime=event_datetime or datetime.utcnow(),
-                    user_id=user.user_id if user else None,
-                    user_email=user_email,
-                    site_id=site.site_id if site else None,
-                    site_url=site_url,
-                    resource_name=event.get('targetResources', [{}])[0].get('displayName'),
-                    resource_type=event.get('targetResources', [{}])[0].get('type'),
-                    client_ip=event.get('initiatedBy', {}).get('user', {}).get('ipAddress'),
-                    result_status=event.get('result', 'Success'),
-                    details=event,  # Store full event as JSON
-                    ms_audit_id=ms_audit_id,
-                )
-                
-                self.db.add(audit_log)
-                synced_count += 1
+            if undated:
+                AUDIT_UNDATED_EVENTS.inc(undated)
+                logger.warning(f"Skipped {undated} audit events without a valid activityDateTime")
             
-            self.db.commit()
             logger.info(f"Successfully synced {synced_count} audit logs")
-            return synced_count
+            return synced_count, latest
         
         except Exception as e:
             logger.error(f"Error syncing audit logs: {str(e)}")
             self.db.rollback()
             raise
     
+    def _ingest_rows(self, rows: List[Dict]) -> int:
+        """
+        Insert staged audit rows, letting the (ms_audit_id, event_datetime)
+        unique constraint deduplicate
+        
+        The hourly rollups, daily sketches and behaviour baselines are updated
+        for the inserted rows only, in the same transaction, so they never
+        double-count a re-fetched event. Each event is scored against its
+        user's and site's baseline on the way in.
+        
+        Args:
+            rows: Audit log rows built by _audit_row
+        
+        Returns:
+            Number of rows actually inserted (duplicates are skipped)
+        """
+        if not rows:
+            return 0
+        
+        inserted = BulkWriter(self.db, settings.AUDIT_INGEST_CHUNK_SIZE).insert_ignore(
+            AuditLog,
+            rows,
+            conflict_columns=['ms_audit_id', 'event_datetime'],
+            returning=INGEST_RETURNING_COLUMNS,
+        )
+        AuditRollupService(self.db).apply(inserted)
+        AuditSketchService(self.db).apply(inserted)
+        BehaviorBaselineService(self.db).apply(inserted)
+        self.db.commit()
+        
+        if len(inserted) < len(rows):
+            logger.debug(f"Skipped {len(rows) - len(inserted)} audit events already synced")
+        return len(inserted)
+    
+    def _audit_row(self, event: Dict) -> Optional[Dict]:
+        """
+        Map a Microsoft 365 audit event to an audit_logs row
+        
+        Args:
+            event: Graph audit log event
+        
+        Returns:
+            Column/value dict for AuditLog, or None if the event has no
+            parseable activityDateTime
+        """
+        event_datetime = self._parse_datetime(event.get('activityDateTime'))
+        if event_datetime is None:
+            return None
+        
+        # Extract event details
+        event_type = event.get('category', 'Unknown')
+        operation = event.get('operationType', 'Unknown')
+        
+        # Extract user information
+        user_email = event.get('initiatedBy', {}).get('user', {}).get('userPrincipalName')
+        user_id = identity_resolver.resolve(user_email)
+        
+        # Extract target resource (site), matched on the longest site URL prefix
+        site_url = event.get('targetResources', [{}])[0].get('displayName')
+        site_id = site_url_index.resolve(site_url)
+        
+        return {
+            'event_type': event_type,
+            'operation': operation,
+            'event_datetime': event_datetime,
+            'user_id': user_id,
+            'user_email': user_email,
+            'site_id': site_id,
+            'site_url': site_url,
+            'resource_name': event.get('targetResources', [{}])[0].get('displayName'),
+            'resource_type': event.get('targetResources', [{}])[0].get('type'),
+            'client_ip': event.get('initiatedBy', {}).get('user', {}).get('ipAddress'),
+            'result_status': event.get('result', 'Success'),
+            'details': event,  # Store full event as JSON
+            'ms_audit_id': event.get('id'),
+        }
+    
     def _parse_datetime(self, dt_str: Optional[str]) -> Optional[datetime]:
         """Parse ISO datetime string"""
         if not dt_str:
             return None
         try:
-            return datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+            # Stored as naive UTC like the DateTime columns
+            parsed = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            return parsed
         except Exception:
             return None
 
@@ -0,0 +1,255 @@
+"""
+Behaviour baseline service - per-user and per-site profiles scored during ingest
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+from sqlalchemy import delete, tuple_
+from sqlalchemy.orm import Session
+import logging
+
+from app.core.baselines import BehaviorProfile
+from app.core.config import settings
+from app.db.bulk import BulkWriter
+from app.db.pagination import NEXT, keyset_rows
+from app.models.audit import AuditAnomaly, AuditLog, BehaviorBaseline
+
+logger = logging.getLogger(__name__)
+
+# Columns of inserted audit rows needed to score them and update the baselines
+BASELINE_SOURCE_COLUMNS = ['audit_id', 'event_type', 'event_datetime', 'operation', 'user_email', 'site_id', 'site_url']
+
+# model_version of anomalies flagged against a baseline
+BASELINE_VERSION = "baseline"
+
+# A deviation component is named in the anomaly reason from this many bits
+# (the value is 8x rarer than the profile's most usual one)
+REASON_MIN_BITS = 3.0
+
+REASONS = {
+    ('user', 'hour'): "Unusual hour for user",
+    ('user', 'operation'): "Unusual operation for user",
+    ('user', 'peer'): "Site new to user",
+    ('site', 'hour'): "Unusual hour for site",
+    ('site', 'operation'): "Unusual operation on site",
+    ('site', 'peer'): "User new to site",
+}
+
+# Audit rows replayed per transaction when rebuilding baselines, in this order
+REBUILD_BATCH_ROWS = 10000
+REBUILD_KEY = [AuditLog.event_datetime, AuditLog.audit_id]
+
+
+def baseline_keys(event: Any) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Baselines an audit event belongs to
+
+    Returns:
+        (entity_type, entity_key, peer) for the user and the site, where known
+    """
+    user_email = event.user_email.lower() if event.user_email else None
+    keys = []
+    if user_email:
+        keys.append(('user', user_email, event.site_url))
+    if event.site_url:
+        keys.append(('site', event.site_url, user_email))
+    return keys
+
+
+class BehaviorBaselineService:
+    """
+    Rolling per-user and per-site behaviour baselines
+
+    Each new audit event is scored against the decayed profiles of its user
+    and site before being added to them, in the ingest transaction, so
+    scoring never re-reads history. Profiles with less than
+    ANOMALY_BASELINE_MIN_WEIGHT decayed events do not score. Baseline rows are
+    locked (SELECT ... FOR UPDATE) while updated, like the audit sketches.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def apply(self, events: Iterable[Any], flag: bool = True) -> List[Dict]:
+        """
+        Score newly inserted audit events and add them to the baselines (no commit)
+
+        With FEATURE_AI_ANOMALY_DETECTION enabled, flagged events are stored
+        in audit_anomalies.
+
+        Args:
+            events: Rows or objects with the BASELINE_SOURCE_COLUMNS attributes
+            flag: Whether to score the events (False only updates the baselines)
+
+        Returns:
+            audit_anomalies rows for the events deviating from a baseline
+        """
+        events = sorted(events, key=lambda event: event.event_datetime)
+        keys = sorted({(entity_type, key) for event in events for entity_type, key, _ in baseline_keys(event)})
+        if not keys:
+            return []
+
+        profiles = self._lock(keys)
+        latest = events[-1].event_datetime
+        for _, profile in profiles.values():
+            # Decay once per batch; events in the batch are then added in O(1)
+            profile.advance(latest)
+
+        threshold = settings.ANOMALY_BASELINE_THRESHOLD_BITS
+        flagged = []
+        for event in events:
+            worst: Tuple[float, Optional[str], Dict[str, float]] = (0.0, None, {})
+            for entity_type, key, peer in baseline_keys(event):
+                profile = profiles[(entity_type, key)][1]
+                if flag and profile.total >= settings.ANOMALY_BASELINE_MIN_WEIGHT:
+                    components = profile.deviation(event.event_datetime, event.operation, peer)
+                    bits = sum(components.values())
+                    if bits > worst[0]:
+                        worst = (bits, entity_type, components)
+                profile.add(event.event_datetime, event.operation, peer)
+
+            if worst[0] >= threshold:
+                flagged.append(self._anomaly_row(event, *worst))
+
+        for row, profile in profiles.values():
+            row.profile = profile.to_dict()
+            row.total_weight = profile.total
+            row.event_count = profile.events
+            row.last_event_at = profile.as_of
+        self.db.flush()
+
+        if flagged and settings.FEATURE_AI_ANOMALY_DETECTION:
+            BulkWriter(self.db).insert_ignore(AuditAnomaly, flagged, conflict_columns=['audit_id', 'event_datetime'])
+        return flagged
+
+    def explained(self, anomalies: List[Dict]) -> List[bool]:
+        """
+        Whether anomalies flagged by the global model are usual for their user
+
+        The user's current profile already includes the event, so this is
+        slightly lenient; it is meant to drop e.g. a night-shift user's
+        routine off-hours activity.
+
+        Args:
+            anomalies: audit_anomalies rows
+
+        Returns:
+            For each anomaly, True if its user has a warm baseline in which
+            the event's hour, operation and site are all usual
+        """
+        users = {anomaly['user_email'].lower() for anomaly in anomalies if anomaly.get('user_email')}
+        if not users:
+            return [False] * len(anomalies)
+
+        half_life, max_peers = settings.ANOMALY_BASELINE_HALF_LIFE_DAYS, settings.ANOMALY_BASELINE_MAX_PEERS
+        profiles = {
+            row.entity_key: BehaviorProfile.from_dict(row.profile, half_life, max_peers)
+            for row in self.db.query(BehaviorBaseline).filter(
+                BehaviorBaseline.entity_type == 'user',
+                BehaviorBaseline.entity_key.in_(sorted(users)),
+                BehaviorBaseline.total_weight >= settings.ANOMALY_BASELINE_MIN_WEIGHT,
+            )
+        }
+
+        result = []
+        for anomaly in anomalies:
+            profile = profiles.get((anomaly.get('user_email') or '').lower())
+            if profile is None:
+                result.append(False)
+                continue
+            components = profile.deviation(anomaly['event_datetime'], anomaly['operation'], anomaly.get('site_url'))
+            result.append(max(components.values()) < REASON_MIN_BITS)
+        return result
+
+    def rebuild(self, start: datetime, flag: bool = False) -> int:
+        """
+        Replace all baselines with ones built from audit_logs since start
+
+        Events older than a few half-lives hardly contribute, so start only
+        needs to go back that far. Events are replayed in keyset batches of
+        REBUILD_BATCH_ROWS, one transaction each, so the baseline row locks
+        are only held for a batch and concurrent ingest keeps running. Only
+        events ingested before the rebuild started are replayed; later ones
+        are added by ingest itself (scored against the partly rebuilt
+        baselines).
+
+        Args:
+            start: Earliest event to include
+            flag: Whether to score the replayed events too, storing
+                anomalies like ingest does
+
+        Returns:
+            Number of audit events added
+        """
+        started = datetime.utcnow()
+        self.db.execute(delete(BehaviorBaseline))
+        self.db.commit()
+
+        columns = [AuditLog.__table__.c[name] for name in BASELINE_SOURCE_COLUMNS]
+        query = self.db.query(*columns).filter(
+            AuditLog.event_datetime >= start,
+            AuditLog.synced_from_ms365 < started
+        )
+
+        total = 0
+        key = None
+        while True:
+            batch = keyset_rows(query, REBUILD_KEY, NEXT, key, REBUILD_BATCH_ROWS)
+            if not batch:
+                break
+            self.apply(batch, flag=flag)
+            self.db.commit()
+            total += len(batch)
+            key = (batch[-1].event_datetime, batch[-1].audit_id)
+
+        logger.info(f"Rebuilt behaviour baselines from {start}: {total} events")
+        return total
+
+    def _lock(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[BehaviorBaseline, BehaviorProfile]]:
+        """Create missing baseline rows and lock all of them, in key order"""
+        BulkWriter(self.db).insert_ignore(
+            BehaviorBaseline,
+            [{'entity_type': entity_type, 'entity_key': key} for entity_type, key in keys],
+            conflict_columns=['entity_type', 'entity_key'],
+        )
+
+        rows = (
+            self.db.query(BehaviorBaseline)
+            .filter(tuple_(BehaviorBaseline.entity_type, BehaviorBaseline.entity_key).in_(keys))
+            .order_by(BehaviorBaseline.entity_type, BehaviorBaseline.entity_key)
+            .populate_existing()
+            .with_for_update()
+            .all()
+        )
+
+        half_life, max_peers = settings.ANOMALY_BASELINE_HALF_LIFE_DAYS, settings.ANOMALY_BASELINE_MAX_PEERS
+        return {
+            (row.entity_type, row.entity_key): (row, BehaviorProfile.from_dict(row.profile, half_life, max_peers))
+            for row in rows
+        }
+
+    @staticmethod
+    def _anomaly_row(event: Any, bits: float, entity_type: str, components: Dict[str, float]) -> Dict:
+        reasons = [
+            REASONS[(entity_type, component)]
+            for component, component_bits in components.items()
+            if component_bits >= REASON_MIN_BITS
+        ]
+        threshold = settings.ANOMALY_BASELINE_THRESHOLD_BITS
+        return {
+            'audit_id': event.audit_id,
+            'event_datetime': event.event_datetime,
+            'event_type': event.event_type,
+            'operation': event.operation,
+            'user_email': event.user_email,
+            'site_id': event.site_id,
+            'site_url': event.site_url,
+            # Same (-1, 0) range as IsolationForest scores; the threshold maps to -0.5
+            'anomaly_score': -bits / (bits + threshold),
+            'reason': "; ".join(reasons) if reasons else "Deviates from baseline",
+            'model_version': BASELINE_VERSION,
+        }
+
+
+def get_behavior_baseline_service(db: Session) -> BehaviorBaselineService:
+    """Dependency to get behaviour baseline service"""
+    return BehaviorBaselineService(db)
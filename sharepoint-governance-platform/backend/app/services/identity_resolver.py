@@ -0,0 +1,103 @@
+"""
+Identity resolver - cached email <-> user ID mapping for bulk jobs
+"""
+from typing import Dict, Optional
+from datetime import datetime
+from sqlalchemy.orm import Session
+import logging
+import threading
+import uuid
+
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityResolver:
+    """
+    In-memory map between user emails and user IDs
+
+    Discovery, audit sync and access reviews resolve an email per permission
+    or event; answering those from memory replaces one point query per row.
+    Only (email, user_id) pairs are held. Emails are matched case-insensitively.
+    The map is loaded once and then refreshed incrementally from users whose
+    last_sync moved since the previous refresh.
+    """
+
+    def __init__(self):
+        self._user_ids: Dict[str, uuid.UUID] = {}
+        self._emails: Dict[uuid.UUID, str] = {}
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._watermark is not None
+
+    def refresh(self, db: Session) -> int:
+        """
+        Load the map, or apply users created/updated since the last refresh
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of users (re)loaded
+        """
+        query = db.query(User.user_id, User.email, User.last_sync)
+        if self._watermark is not None:
+            # >= so users sharing the watermark timestamp are not missed
+            query = query.filter(User.last_sync >= self._watermark)
+
+        count = 0
+        watermark = self._watermark
+        with self._lock:
+            for user_id, email, last_sync in query.yield_per(5000):
+                self._store(user_id, email)
+                if last_sync and (watermark is None or last_sync > watermark):
+                    watermark = last_sync
+                count += 1
+
+            self._watermark = watermark or datetime.min
+
+        logger.info(f"Identity resolver refreshed {count} users ({len(self._user_ids)} cached)")
+        return count
+
+    def resolve(self, email: Optional[str]) -> Optional[uuid.UUID]:
+        """
+        Look up the user ID for an email address
+
+        Args:
+            email: Email or UPN, any case
+
+        Returns:
+            User ID, or None if the user is unknown
+        """
+        if not email:
+            return None
+        return self._user_ids.get(email.lower())
+
+    def email_for(self, user_id: Optional[uuid.UUID]) -> Optional[str]:
+        """Look up the stored email for a user ID"""
+        if user_id is None:
+            return None
+        return self._emails.get(user_id)
+
+    def clear(self):
+        """Drop the cached map; the next refresh reloads it in full"""
+        with self._lock:
+            self._user_ids.clear()
+            self._emails.clear()
+            self._watermark = None
+
+    def _store(self, user_id: uuid.UUID, email: str):
+        """Add or move a mapping, dropping the user's previous email if it changed"""
+        previous = self._emails.get(user_id)
+        if previous and previous.lower() != email.lower():
+            self._user_ids.pop(previous.lower(), None)
+        self._emails[user_id] = email
+        self._user_ids[email.lower()] = user_id
+
+
+# Global resolver shared by background jobs in this process
+identity_resolver = IdentityResolver()
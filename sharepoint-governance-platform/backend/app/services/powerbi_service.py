@@ -8,9 +8,9 @@ import logging
 import json
 
 from app.models.site import SharePointSite, AccessMatrix
-from app.models.audit import AuditLog
 from app.models.access_review import AccessReviewCycle
 from app.models.user import User
+from app.services.audit_rollup_service import AuditRollupService
 
 logger = logging.getLogger(__name__)
 
@@ -90,28 +90,24 @@ class PowerBIService:
         """
         Get audit logs dataset for Power BI
         
-        Limited to recent data for performance
+        Hourly event counts per site and operation, read from the audit
+        rollups so the dataset size does not grow with audit volume
         """
         cutoff = datetime.utcnow() - timedelta(days=days)
         
-        logs = self.db.query(AuditLog).filter(
-            AuditLog.event_datetime >= cutoff
-        ).all()
+        rollups = AuditRollupService(self.db).site_hourly(cutoff)
         
         dataset = []
-        for log in logs:
+        for rollup in rollups:
             dataset.append({
-                'AuditID': str(log.audit_id),
-                'EventDateTime': log.event_datetime.isoformat(),
-                'EventType': log.event_type,
-                'Operation': log.operation,
-                'UserEmail': log.user_email,
-                'SiteURL': log.site_url,
-                'ResourceName': log.resource_name,
-                'ResultStatus': log.result_status,
-                'Hour': log.event_datetime.hour,
-                'DayOfWeek': log.event_datetime.strftime('%A'),
-                'Date': log.event_datetime.date().isoformat(),
+                'HourStart': rollup.bucket.isoformat(),
+                'Operation': rollup.operation,
+                'SiteURL': rollup.site_url or None,
+                'EventCount': rollup.event_count,
+                'FailedCount': rollup.failed_count,
+                'Hour': rollup.bucket.hour,
+                'DayOfWeek': rollup.bucket.strftime('%A'),
+                'Date': rollup.bucket.date().isoformat(),
             })
         
         return dataset
@@ -4,6 +4,7 @@ Recycle Bin Service for managing SharePoint recycle bin
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
+import asyncio
 import logging
 
 from app.models.site import SharePointSite
@@ -39,8 +40,10 @@ class RecycleBinService:
         if not site:
             raise ValueError(f"Site {site_id} not found")
         
-        # Get recycle bin items from SharePoint
-        bin_items = sharepoint_service.get_recycle_bin_items(
+        # Get recycle bin items from SharePoint (blocking client, throttle
+        # waits included, so off the event loop)
+        bin_items = await asyncio.to_thread(
+            sharepoint_service.get_recycle_bin_items,
             site.site_url,
             stage=stage
         )
@@ -9,7 +9,7 @@ import io
 import json
 
 from app.models.site import SharePointSite
-from app.models.audit import AuditLog
+from app.services.audit_rollup_service import AuditRollupService
 from app.models.access_review import AccessReviewCycle
 
 logger = logging.getLogger(__name__)
@@ -45,10 +45,7 @@ class ReportingService:
             SharePointSite.is_archived == False
         ).count()
         
-        audit_events = self.db.query(AuditLog).filter(
-            AuditLog.event_datetime >= start_date,
-            AuditLog.event_datetime <= end_date
-        ).count()
+        audit_events = AuditRollupService(self.db).event_count(start_date, end_date)
         
         completed_reviews = self.db.query(AccessReviewCycle).filter(
             AccessReviewCycle.certified_date >= start_date,
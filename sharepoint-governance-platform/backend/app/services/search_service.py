@@ -0,0 +1,139 @@
+"""
+Search service - index-backed substring filters and ranked site search
+"""
+from typing import List, Optional, Tuple
+from sqlalchemy import func, literal, literal_column, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+import logging
+import re
+import uuid
+
+from app.models.site import SharePointSite, SiteOwnership
+
+logger = logging.getLogger(__name__)
+
+LIKE_ESCAPE = "\\"
+
+# Generated tsvector column over name/description/URL (migration 007)
+SITE_SEARCH_VECTOR = literal_column("sharepoint_sites.search_vector")
+
+
+def escape_like(term: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally"""
+    return (
+        term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+
+
+def contains(column, term: str, case_sensitive: bool = True) -> ColumnElement:
+    """
+    Substring filter that PostgreSQL can answer from a pg_trgm GIN index
+
+    Args:
+        column: Column to search
+        term: Literal substring (wildcards in it are escaped)
+        case_sensitive: LIKE if True, ILIKE otherwise
+
+    Returns:
+        Filter expression
+    """
+    pattern = f"%{escape_like(term)}%"
+    if case_sensitive:
+        return column.like(pattern, escape=LIKE_ESCAPE)
+    return column.ilike(pattern, escape=LIKE_ESCAPE)
+
+
+def prefix_tsquery(text: str) -> Optional[str]:
+    """
+    Turn free text into a to_tsquery expression matching word prefixes
+
+    'hr proj' becomes 'hr:* & proj:*', so partially typed words match.
+
+    Returns:
+        tsquery text, or None if the input has no words
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+class SiteSearchService:
+    """
+    Ranked site search
+
+    On PostgreSQL, sites match on the full-text search_vector (prefix
+    matching, weighted name > description > URL), on trigram similarity of
+    the name (tolerates typos) or on a URL substring; every branch is served
+    by a GIN index. Other databases fall back to case-insensitive substring
+    matching.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @property
+    def is_postgresql(self) -> bool:
+        return self.db.get_bind().dialect.name == "postgresql"
+
+    def search(
+        self,
+        text: str,
+        limit: int = 20,
+        classification: Optional[str] = None,
+        is_archived: Optional[bool] = None,
+        owner_id: Optional[uuid.UUID] = None
+    ) -> List[Tuple[SharePointSite, float]]:
+        """
+        Search sites by name, description and URL
+
+        Args:
+            text: Free-text query
+            limit: Maximum results
+            classification: Optional classification filter
+            is_archived: Optional archived filter
+            owner_id: Restrict to sites owned by this user
+
+        Returns:
+            (site, rank) pairs, best match first
+        """
+        text = text.strip()
+        tsquery_text = prefix_tsquery(text)
+
+        if self.is_postgresql:
+            matches = [
+                SharePointSite.name.op("%")(text),
+                contains(SharePointSite.site_url, text, case_sensitive=False),
+            ]
+            rank = func.similarity(SharePointSite.name, text)
+            if tsquery_text:
+                tsquery = func.to_tsquery("simple", tsquery_text)
+                matches.append(SITE_SEARCH_VECTOR.op("@@")(tsquery))
+                rank = rank + func.ts_rank_cd(SITE_SEARCH_VECTOR, tsquery)
+        else:
+            matches = [
+                contains(SharePointSite.name, text, case_sensitive=False),
+                contains(SharePointSite.description, text, case_sensitive=False),
+                contains(SharePointSite.site_url, text, case_sensitive=False),
+            ]
+            rank = literal(0.0)
+
+        query = self.db.query(SharePointSite, rank.label("rank")).filter(or_(*matches))
+
+        if owner_id is not None:
+            query = query.join(SiteOwnership).filter(SiteOwnership.user_id == owner_id)
+        if classification:
+            query = query.filter(SharePointSite.classification == classification)
+        if is_archived is not None:
+            query = query.filter(SharePointSite.is_archived == is_archived)
+
+        results = query.order_by(rank.desc(), SharePointSite.name).limit(limit).all()
+        return [(site, float(score or 0)) for site, score in results]
+
+
+def get_site_search_service(db: Session) -> SiteSearchService:
+    """Dependency to get site search service"""
+    return SiteSearchService(db)
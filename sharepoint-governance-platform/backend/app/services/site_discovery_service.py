@@ -1,18 +1,43 @@
 """
 Site Discovery Service - Automated SharePoint site discovery and classification
 """
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
+from prometheus_client import Gauge, Histogram
+import asyncio
 import logging
+import time
 
+from app.core.config import settings
+from app.db.bulk import BulkWriter
 from app.models.site import SharePointSite, SiteClassification, SiteOwnership, AccessMatrix
-from app.models.user import User
-from app.integrations.graph_client import graph_service
+from app.models.sync import SyncCheckpoint
+from app.services.identity_resolver import identity_resolver
+from app.services.site_url_index import site_url_index
+from app.integrations.graph_client import graph_service, GRAPH_BATCH_LIMIT
+from app.integrations.graph_transport import GraphRequestError
 from app.integrations.sharepoint_client import sharepoint_service
 
 logger = logging.getLogger(__name__)
 
+# SyncCheckpoint key holding the /sites/delta link
+SITE_DISCOVERY_CHECKPOINT = "site_discovery"
+
+# Columns identifying one access_matrix row. user_email keeps grantees that
+# are not in the directory (user_id is None, e.g. most external users) apart.
+ACCESS_MATRIX_KEY_COLUMNS = ['site_id', 'user_id', 'user_email', 'permission_level', 'assignment_type', 'is_external_user']
+
+DISCOVERY_STAGE_SECONDS = Histogram(
+    "site_discovery_stage_seconds",
+    "Latency of each site discovery pipeline stage",
+    ["stage"],
+)
+DISCOVERY_SITES_PER_SECOND = Gauge(
+    "site_discovery_sites_per_second",
+    "Sites processed per second by the last site discovery run",
+)
+
 
 class SiteDiscoveryService:
     """Service for discovering and synchronizing SharePoint sites"""
@@ -20,6 +45,17 @@ class SiteDiscoveryService:
     def __init__(self, db: Session):
         self.db = db
     
+    async def discover_sites(self) -> Dict[str, int]:
+        """
+        Discover sites using the configured SITE_DISCOVERY_MODE
+        
+        Returns:
+            Statistics dictionary with counts of new, updated, deleted sites
+        """
+        if settings.SITE_DISCOVERY_MODE == "delta":
+            return await self.discover_sites_delta()
+        return await self.discover_all_sites()
+    
     async def discover_all_sites(self) -> Dict[str, int]:
         """
         Discover all SharePoint sites and update database
@@ -28,41 +64,27 @@ class SiteDiscoveryService:
             Statistics dictionary with counts of new, updated, deleted sites
         """
         logger.info("Starting site discovery process")
+        started = time.perf_counter()
+        identity_resolver.refresh(self.db)
         
         stats = {
             'total_discovered': 0,
             'new_sites': 0,
             'updated_sites': 0,
             'unchanged_sites': 0,
+            'deleted_sites': 0,
         }
         
         try:
-            # Fetch all sites from Microsoft Graph
-            graph_sites = await graph_service.get_all_sites()
-            stats['total_discovered'] = len(graph_sites)
-            
-            # Get existing sites from database
-            existing_sites = {site.site_url: site for site in self.db.query(SharePointSite).all()}
-            
-            for graph_site in graph_sites:
-                site_url = graph_site.get('webUrl')
-                
-                if not site_url:
-                    continue
+            # Stream sites page by page so memory stays flat regardless of tenant size
+            async for graph_sites in graph_service.iter_sites():
+                await self._sync_site_page(graph_sites, stats)
                 
-                # Check if site exists in database
-                if site_url in existing_sites:
-                    # Update existing site
-                    if await self._update_site(existing_sites[site_url], graph_site):
-                        stats['updated_sites'] += 1
-                    else:
-                        stats['unchanged_sites'] += 1
-                else:
-                    # Create new site
-                    await self._create_site(graph_site)
-                    stats['new_sites'] += 1
+                # Commit per page so processed sites can be released from the session
+                self.db.commit()
             
-            self.db.commit()
+            self._record_throughput(stats, started)
+            site_url_index.rebuild(self.db)
             logger.info(f"Site discovery completed: {stats}")
             return stats
         
@@ -71,78 +93,430 @@ class SiteDiscoveryService:
             self.db.rollback()
             raise
     
-    async def _create_site(self, graph_site: Dict) -> SharePointSite:
-        """Create a new site in the database"""
-        site_url = graph_site.get('webUrl')
-        
-        # Get additional details from SharePoint API
-        sp_details = sharepoint_service.get_site_details(site_url)
-        
-        # Classify site
-        classification = self._classify_site(graph_site, sp_details)
-        
-        # Create site object
-        site = SharePointSite(
-            site_url=site_url,
-            name=graph_site.get('displayName') or graph_site.get('name'),
-            description=graph_site.get('description') or (sp_details.get('description') if sp_details else None),
-            classification=classification,
-            created_date=self._parse_datetime(graph_site.get('createdDateTime')),
-            last_activity=self._parse_datetime(graph_site.get('lastModifiedDateTime')),
-            ms_site_id=graph_site.get('id'),
-            ms_group_id=graph_site.get('sharepointIds', {}).get('siteId') if 'sharepointIds' in graph_site else None,
-        )
-        
-        # Get storage metrics if available
-        if sp_details:
-            storage = sharepoint_service.get_storage_metrics(site_url)
+    async def discover_sites_delta(self) -> Dict[str, int]:
+        """
+        Discover only sites created, changed or deleted since the last run
+        
+        Resumes from the delta link saved in sync_checkpoints. Without one, or
+        when Graph reports the link has expired (HTTP 410), the delta query is
+        restarted from scratch, which enumerates every site and seeds a new link.
+        
+        Returns:
+            Statistics dictionary with counts of new, updated, deleted sites
+        """
+        checkpoint = self.db.get(SyncCheckpoint, SITE_DISCOVERY_CHECKPOINT)
+        saved_delta_link = checkpoint.delta_link if checkpoint else None
+        
+        try:
+            return await self._run_site_delta(saved_delta_link)
+        
+        except GraphRequestError as e:
+            if e.status_code != 410 or not saved_delta_link:
+                raise
+            logger.warning("Site delta link expired; falling back to a full rescan")
+            return await self._run_site_delta(None)
+    
+    async def _run_site_delta(self, delta_link: Optional[str]) -> Dict[str, int]:
+        """
+        Apply one /sites/delta run and save the resulting delta link
+        
+        Args:
+            delta_link: Saved delta link, or None for a full resync
+        
+        Returns:
+            Statistics dictionary
+        """
+        logger.info(f"Starting {'incremental' if delta_link else 'full'} delta site discovery")
+        started = time.perf_counter()
+        identity_resolver.refresh(self.db)
+        
+        stats = {
+            'total_discovered': 0,
+            'new_sites': 0,
+            'updated_sites': 0,
+            'unchanged_sites': 0,
+            'deleted_sites': 0,
+        }
+        next_delta_link = None
+        
+        try:
+            async for graph_sites, page_delta_link in graph_service.iter_sites_delta(delta_link):
+                live_sites = [graph_site for graph_site in graph_sites if 'deleted' not in graph_site]
+                deleted_sites = [graph_site for graph_site in graph_sites if 'deleted' in graph_site]
+                
+                await self._sync_site_page(live_sites, stats)
+                stats['deleted_sites'] += self._archive_deleted_sites(deleted_sites)
+                
+                if page_delta_link:
+                    next_delta_link = page_delta_link
+                
+                self.db.commit()
+            
+            # Only advance the checkpoint once every page has been applied
+            if next_delta_link:
+                self._save_delta_link(next_delta_link)
+                self.db.commit()
+            else:
+                logger.warning("Graph did not return a delta link; next run will resync all sites")
+            
+            self._record_throughput(stats, started)
+            site_url_index.rebuild(self.db)
+            logger.info(f"Delta site discovery completed: {stats}")
+            return stats
+        
+        except Exception as e:
+            logger.error(f"Error during delta site discovery: {str(e)}")
+            self.db.rollback()
+            raise
+    
+    def _record_throughput(self, stats: Dict, started: float):
+        """Add run duration and sites/second to stats and export the rate"""
+        duration = time.perf_counter() - started
+        processed = stats['total_discovered'] + stats['deleted_sites']
+        
+        stats['duration_seconds'] = round(duration, 2)
+        stats['sites_per_second'] = round(processed / duration, 2) if duration > 0 else 0.0
+        DISCOVERY_SITES_PER_SECOND.set(stats['sites_per_second'])
+    
+    def _archive_deleted_sites(self, graph_sites: List[Dict]) -> int:
+        """
+        Mark sites removed from the tenant as archived
+        
+        Args:
+            graph_sites: Delta items carrying a 'deleted' facet
+        
+        Returns:
+            Number of sites archived
+        """
+        ms_site_ids = [graph_site['id'] for graph_site in graph_sites if graph_site.get('id')]
+        if not ms_site_ids:
+            return 0
+        
+        sites = self.db.query(SharePointSite).filter(
+            SharePointSite.ms_site_id.in_(ms_site_ids),
+            SharePointSite.is_archived == False
+        ).all()
+        
+        for site in sites:
+            site.is_archived = True
+            logger.info(f"Archived deleted site: {site.name} ({site.site_url})")
+        
+        return len(sites)
+    
+    def _save_delta_link(self, delta_link: str):
+        """Persist the delta link for the next incremental run"""
+        checkpoint = self.db.get(SyncCheckpoint, SITE_DISCOVERY_CHECKPOINT)
+        if checkpoint is None:
+            checkpoint = SyncCheckpoint(source=SITE_DISCOVERY_CHECKPOINT)
+            self.db.add(checkpoint)
+        checkpoint.delta_link = delta_link
+        checkpoint.updated_at = datetime.utcnow()
+    
+    async def _sync_site_page(self, graph_sites: List[Dict], stats: Dict[str, int]):
+        """
+        Create or update one page of sites returned by Microsoft Graph
+        
+        Args:
+            graph_sites: Graph API site objects from a single page
+            stats: Discovery statistics, updated in place
+        """
+        stats['total_discovered'] += len(graph_sites)
+        
+        site_urls = [graph_site.get('webUrl') for graph_site in graph_sites if graph_site.get('webUrl')]
+        if not site_urls:
+            return
+        
+        # Look up only this page's sites instead of loading the whole table
+        existing_sites = {
+            row.site_url: row
+            for row in self.db.query(
+                SharePointSite.site_id,
+                SharePointSite.site_url,
+                SharePointSite.name,
+                SharePointSite.last_activity,
+            ).filter(SharePointSite.site_url.in_(site_urls))
+        }
+        new_sites = []
+        site_updates = []
+        
+        for graph_site in graph_sites:
+            site_url = graph_site.get('webUrl')
+            
+            if not site_url:
+                continue
+            
+            # Check if site exists in database
+            if site_url in existing_sites:
+                # Update existing site
+                values, updated = self._update_site(existing_sites[site_url], graph_site)
+                site_updates.append(values)
+                if updated:
+                    stats['updated_sites'] += 1
+                else:
+                    stats['unchanged_sites'] += 1
+            else:
+                new_sites.append(graph_site)
+        
+        # One bulk UPDATE per chunk instead of a flush per dirty object
+        BulkWriter(self.db).update_by_pk(SharePointSite, site_updates)
+        
+        # Create new sites, fetching their permissions in $batch chunks
+        stats['new_sites'] += await self._create_sites(new_sites)
+    
+    async def _create_sites(self, graph_sites: List[Dict]) -> int:
+        """
+        Create new sites through a bounded concurrent pipeline
+        
+        Enrichment workers fetch permissions (one $batch call per 20 sites)
+        and SharePoint details in parallel, each integration capped by its
+        own concurrency limit. A single writer stage - this coroutine - owns
+        the database session and persists results in bulk chunks.
+        
+        Args:
+            graph_sites: Graph API site objects not yet in the database
+        
+        Returns:
+            Number of sites written
+        """
+        if not graph_sites:
+            return 0
+        
+        chunks: asyncio.Queue = asyncio.Queue()
+        for start in range(0, len(graph_sites), GRAPH_BATCH_LIMIT):
+            chunks.put_nowait(graph_sites[start:start + GRAPH_BATCH_LIMIT])
+        
+        # Bounded so workers cannot run arbitrarily far ahead of the writer
+        results: asyncio.Queue = asyncio.Queue(maxsize=settings.DISCOVERY_WORKERS * GRAPH_BATCH_LIMIT)
+        graph_limit = asyncio.Semaphore(settings.DISCOVERY_GRAPH_CONCURRENCY)
+        sharepoint_limit = asyncio.Semaphore(settings.DISCOVERY_SHAREPOINT_CONCURRENCY)
+        
+        workers = [
+            asyncio.create_task(self._enrichment_worker(chunks, results, graph_limit, sharepoint_limit))
+            for _ in range(min(settings.DISCOVERY_WORKERS, chunks.qsize()))
+        ]
+        
+        async def close_results():
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                await results.put(None)
+        
+        producer = asyncio.create_task(close_results())
+        pending = []
+        created = 0
+        
+        try:
+            while True:
+                enrichment = await results.get()
+                if enrichment is not None:
+                    pending.append(enrichment)
+                
+                if pending and (enrichment is None or len(pending) >= settings.BULK_WRITE_CHUNK_SIZE):
+                    started = time.perf_counter()
+                    created += self._write_sites(pending)
+                    DISCOVERY_STAGE_SECONDS.labels("write").observe(time.perf_counter() - started)
+                    pending = []
+                
+                if enrichment is None:
+                    break
+            
+            # Surface any worker failure
+            await producer
+        
+        finally:
+            for task in workers + [producer]:
+                task.cancel()
+        
+        return created
+    
+    async def _enrichment_worker(
+        self,
+        chunks: asyncio.Queue,
+        results: asyncio.Queue,
+        graph_limit: asyncio.Semaphore,
+        sharepoint_limit: asyncio.Semaphore
+    ):
+        """
+        Fetch permissions and SharePoint details for chunks of new sites
+        
+        Args:
+            chunks: Queue of site chunks (up to 20 sites each)
+            results: Queue receiving one enrichment dict per site
+            graph_limit: Caps concurrent Graph $batch calls
+            sharepoint_limit: Caps concurrent SharePoint REST calls
+        """
+        while True:
+            try:
+                chunk = chunks.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            
+            site_ids = [graph_site['id'] for graph_site in chunk if graph_site.get('id')]
+            permissions = {}
+            if site_ids:
+                async with graph_limit:
+                    started = time.perf_counter()
+                    permissions = await graph_service.get_site_permissions_batch(site_ids)
+                    DISCOVERY_STAGE_SECONDS.labels("graph_permissions").observe(time.perf_counter() - started)
+            
+            details = await asyncio.gather(*[
+                self._fetch_sharepoint_details(graph_site.get('webUrl'), sharepoint_limit)
+                for graph_site in chunk
+            ])
+            
+            for graph_site, (sp_details, storage) in zip(chunk, details):
+                await results.put({
+                    'graph_site': graph_site,
+                    'permissions': permissions.get(graph_site.get('id')),
+                    'sp_details': sp_details,
+                    'storage': storage,
+                })
+    
+    async def _fetch_sharepoint_details(
+        self,
+        site_url: str,
+        sharepoint_limit: asyncio.Semaphore
+    ) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        Fetch site details and storage metrics from SharePoint off the event loop
+        
+        Returns:
+            (site details, storage metrics); either may be None
+        """
+        async with sharepoint_limit:
+            started = time.perf_counter()
+            sp_details = await asyncio.to_thread(sharepoint_service.get_site_details, site_url)
+            storage = None
+            if sp_details:
+                storage = await asyncio.to_thread(sharepoint_service.get_storage_metrics, site_url)
+            DISCOVERY_STAGE_SECONDS.labels("sharepoint_details").observe(time.perf_counter() - started)
+        
+        return sp_details, storage
+    
+    def _write_sites(self, enrichments: List[Dict]) -> int:
+        """
+        Persist enriched new sites with their owners and access in bulk
+        
+        Sites are upserted on site_url, so a site created concurrently (or by
+        an earlier, interrupted run) is updated rather than failing the page.
+        
+        Args:
+            enrichments: Dicts with 'graph_site', 'permissions', 'sp_details'
+                and 'storage' as produced by the enrichment workers
+        
+        Returns:
+            Number of sites written
+        """
+        writer = BulkWriter(self.db)
+        now = datetime.utcnow()
+        
+        site_rows = []
+        for enrichment in enrichments:
+            graph_site = enrichment['graph_site']
+            sp_details = enrichment['sp_details']
+            storage = enrichment['storage']
+            
+            row = {
+                'site_url': graph_site.get('webUrl'),
+                'name': graph_site.get('displayName') or graph_site.get('name'),
+                'description': graph_site.get('description') or (sp_details.get('description') if sp_details else None),
+                'classification': self._classify_site(graph_site, sp_details),
+                'created_date': self._parse_datetime(graph_site.get('createdDateTime')),
+                'last_activity': self._parse_datetime(graph_site.get('lastModifiedDateTime')),
+                'last_discovered': now,
+                'ms_site_id': graph_site.get('id'),
+                'ms_group_id': graph_site.get('sharepointIds', {}).get('siteId') if 'sharepointIds' in graph_site else None,
+            }
+            
+            # Storage metrics if available
             if storage:
-                site.storage_used_mb = int(storage.get('storage_used', 0) / (1024 * 1024))
+                row['storage_used_mb'] = int(storage.get('storage_used', 0) / (1024 * 1024))
+            
+            site_rows.append(row)
         
-        self.db.add(site)
-        self.db.flush()  # Get site ID
+        site_ids = {
+            row.site_url: row.site_id
+            for row in writer.upsert(
+                SharePointSite,
+                site_rows,
+                conflict_columns=['site_url'],
+                update_columns=['name', 'description', 'classification', 'last_activity',
+                                'last_discovered', 'ms_site_id', 'ms_group_id'],
+                returning=['site_url', 'site_id'],
+            )
+        }
+        
+        # Owners and access matrix are both derived from the same permission set.
+        # Without it, leave them for the next run instead of recording "no access".
+        synced = {}
+        for enrichment in enrichments:
+            site_url = enrichment['graph_site'].get('webUrl')
+            if enrichment['permissions'] is None:
+                logger.warning(f"Skipped owner and access discovery for {site_url}: permissions unavailable")
+            elif site_url in site_ids:
+                synced[site_ids[site_url]] = enrichment['permissions']
         
-        # Discover and create owners
-        await self._discover_site_owners(site)
+        if synced:
+            owner_rows = []
+            access_rows = []
+            for site_id, permissions in synced.items():
+                owner_rows.extend(self._owner_rows(site_id, permissions))
+                access_rows.extend(self._access_rows(site_id, permissions))
+            
+            writer.sync_children(
+                SiteOwnership, 'site_id', list(synced), owner_rows,
+                key_columns=['site_id', 'user_id', 'ownership_type', 'is_primary_owner'],
+            )
+            writer.sync_children(
+                AccessMatrix, 'site_id', list(synced), access_rows,
+                key_columns=ACCESS_MATRIX_KEY_COLUMNS,
+            )
+            logger.info(
+                f"Discovered {len(owner_rows)} owners and {len(access_rows)} access permissions "
+                f"for {len(synced)} sites"
+            )
         
-        # Discover and create access matrix
-        await self._discover_site_access(site)
+        for row in site_rows:
+            logger.info(f"Created new site: {row['name']} ({row['site_url']})")
         
-        logger.info(f"Created new site: {site.name} ({site.site_url})")
-        return site
+        return len(site_ids)
     
-    async def _update_site(self, site: SharePointSite, graph_site: Dict) -> bool:
+    def _update_site(self, site, graph_site: Dict) -> Tuple[Dict, bool]:
         """
-        Update existing site with latest data
+        Compute the update for an existing site from its latest Graph data
+        
+        Args:
+            site: Row with site_id, name and last_activity of the stored site
+            graph_site: Graph API site object
         
         Returns:
-            True if site was updated, False if unchanged
+            (values for a bulk UPDATE by primary key, True if metadata changed)
         """
         updated = False
+        values = {
+            'site_id': site.site_id,
+            # Update last discovered timestamp
+            'last_discovered': datetime.utcnow(),
+        }
         
         # Update basic metadata
         new_name = graph_site.get('displayName') or graph_site.get('name')
         if site.name != new_name:
-            site.name = new_name
+            values['name'] = new_name
             updated = True
         
         new_last_activity = self._parse_datetime(graph_site.get('lastModifiedDateTime'))
         if new_last_activity and site.last_activity != new_last_activity:
-            site.last_activity = new_last_activity
+            values['last_activity'] = new_last_activity
             updated = True
         
-        # Update last discovered timestamp
-        site.last_discovered = datetime.utcnow()
-        
         if updated:
-            logger.info(f"Updated site: {site.name}")
+            logger.info(f"Updated site: {new_name}")
         
-        #  Refresh owners and access (can be done periodically, not every discovery)
-        # Uncomment if you want full refresh every discovery
-        # await self._discover_site_owners(site)
-        # await self._discover_site_access(site)
+        # Owners and access are only refreshed for new sites; refreshing them here
+        # would cost a permissions fetch per site on every discovery run
         
-        return updated
+        return values, updated
     
     def _classify_site(self, graph_site: Dict, sp_details: Optional[Dict]) -> SiteClassification:
         """
@@ -177,86 +551,98 @@ class SiteDiscoveryService:
         # Default to legacy
         return SiteClassification.LEGACY
     
-    async def _discover_site_owners(self, site: SharePointSite):
-        """Discover and create site ownership records"""
-        try:
-            # Get owners from Graph API
-            owners = await graph_service.get_site_owners(site.ms_site_id)
+    def _grant_email(self, perm: Dict) -> Optional[str]:
+        """Extract the grantee's email from a permission object"""
+        email = (perm.get('grantedToIdentities') or [{}])[0].get('user', {}).get('email')
+        if not email:
+            email = perm.get('grantedTo', {}).get('user', {}).get('email')
+        return email
+    
+    def _owner_rows(self, site_id, permissions: List[Dict]) -> List[Dict]:
+        """Build site ownership rows from a site's permissions"""
+        # Owners are the owner/write grants among the site's permissions
+        owners = graph_service.filter_owners(permissions)
+        rows = []
+        
+        for owner in owners:
+            email = self._grant_email(owner)
+            if not email:
+                continue
             
-            # Clear existing ownership records
-            self.db.query(SiteOwnership).filter(SiteOwnership.site_id == site.site_id).delete()
+            # Ownership requires a known user; unknown owners are picked up once
+            # the user sync has imported them
+            user_id = identity_resolver.resolve(email)
+            if user_id is None:
+                logger.debug(f"Skipping owner {email} of site {site_id}: user not in directory")
+                continue
             
-            for idx, owner in enumerate(owners):
-                # Extract email from owner object
-                email = owner.get('grantedToIdentities', [{}])[0].get('user', {}).get('email')
-                if not email:
-                    email = owner.get('grantedTo', {}).get('user', {}).get('email')
-                
-                if email:
-                    # Check if user exists in database
-                    user = self.db.query(User).filter(User.email == email).first()
-                    
-                    ownership = SiteOwnership(
-                        site_id=site.site_id,
-                        user_id=user.user_id if user else None,
-                        user_email=email,
-                        ownership_type='owner',
-                        is_primary_owner=(idx == 0),  # First owner is primary
-                    )
-                    self.db.add(ownership)
-            
-            logger.info(f"Discovered {len(owners)} owners for site {site.name}")
+            rows.append({
+                'site_id': site_id,
+                'user_id': user_id,
+                'user_email': email,
+                'ownership_type': 'owner',
+                'is_primary_owner': not rows,  # First owner kept is primary
+            })
         
-        except Exception as e:
-            logger.error(f"Error discovering owners for site {site.site_id}: {str(e)}")
+        return rows
     
-    async def _discover_site_access(self, site: SharePointSite):
-        """Discover and create access matrix records"""
-        try:
-            # Get permissions from Graph API
-            permissions = await graph_service.get_site_permissions(site.ms_site_id)
-            
-            # Also get detailed role assignments from SharePoint API
-            role_assignments = sharepoint_service.get_role_assignments(site.site_url)
-            
-            # Clear existing access records
-            self.db.query(AccessMatrix).filter(AccessMatrix.site_id == site.site_id).delete()
+    def _access_rows(self, site_id, permissions: List[Dict]) -> List[Dict]:
+        """Build access matrix rows from a site's permissions"""
+        rows = []
+        
+        for perm in permissions:
+            # Extract user/group information
+            granted_to = perm.get('grantedTo', {}).get('user', {})
+            email = granted_to.get('email')
             
-            # Process permissions
-            for perm in permissions:
-                # Extract user/group information
-                granted_to = perm.get('grantedTo', {}).get('user', {})
-                email = granted_to.get('email')
+            if email:
+                # Determine permission level
+                roles = perm.get('roles', [])
+                permission_level = ', '.join(roles) if roles else 'Read'
                 
-                if email:
-                    # Check if user exists
-                    user = self.db.query(User).filter(User.email == email).first()
-                    
-                    # Determine permission level
-                    roles = perm.get('roles', [])
-                    permission_level = ', '.join(roles) if roles else 'Read'
-                    
-                    access = AccessMatrix(
-                        site_id=site.site_id,
-                        user_id=user.user_id if user else None,
-                        permission_level=permission_level,
-                        assignment_type='direct' if perm.get('link') else 'inherited',
-                        is_external_user='@' not in email.split('@')[1] if '@' in email else False,
-                    )
-                    self.db.add(access)
-            
-            logger.info(f"Discovered {len(permissions)} access permissions for site {site.name}")
+                user_id = identity_resolver.resolve(email)
+                is_external = self._is_external(email, user_id)
+                rows.append({
+                    'site_id': site_id,
+                    'user_id': user_id,
+                    'user_email': email,
+                    'permission_level': permission_level,
+                    'assignment_type': 'direct' if perm.get('link') else 'inherited',
+                    'is_external_user': is_external,
+                    'external_user_email': email if is_external else None,
+                })
         
-        except Exception as e:
-            logger.error(f"Error discovering access for site {site.site_id}: {str(e)}")
+        return rows
+    
+    def _is_external(self, email: str, user_id) -> bool:
+        """
+        Whether a grantee is outside the tenant
+        
+        Args:
+            email: Grantee email
+            user_id: Resolved user ID (None if not in the directory)
+        
+        Returns:
+            True if the email domain is not one of TENANT_DOMAINS (or its
+            subdomains); without TENANT_DOMAINS, True if the user is not in
+            the directory
+        """
+        domains = settings.TENANT_DOMAINS
+        if not domains:
+            return user_id is None
+        domain = email.rsplit('@', 1)[-1].lower()
+        return not any(domain == tenant or domain.endswith('.' + tenant) for tenant in domains)
     
     def _parse_datetime(self, dt_str: Optional[str]) -> Optional[datetime]:
         """Parse ISO datetime string"""
         if not dt_str:
             return None
         try:
-            # Remove 'Z' and parse
-            return datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+            # Remove 'Z' and parse; stored as naive UTC like the DateTime columns
+            parsed = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            return parsed
         except Exception:
             return None
 
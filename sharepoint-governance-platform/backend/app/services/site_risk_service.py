@@ -0,0 +1,272 @@
+"""
+Site risk service - risk scores for every site, recomputed in bulk
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import logging
+import uuid
+
+from app.db.bulk import BulkWriter
+from app.db.pagination import KeysetPage, keyset_rows, paginate
+from app.models.access_review import AccessReviewCycle, ReviewStatus
+from app.models.audit import AuditAnomaly
+from app.models.site import AccessMatrix, SharePointSite, SiteRiskScore
+
+logger = logging.getLogger(__name__)
+
+# Anomalies in this window count towards a site's risk
+RISK_ANOMALY_WINDOW = timedelta(days=7)
+
+# Review cycles still open past their due date
+OPEN_REVIEW_STATUSES = [ReviewStatus.PENDING, ReviewStatus.IN_PROGRESS, ReviewStatus.OVERDUE]
+
+RISK_RANKING_KEY = [SiteRiskScore.risk_score, SiteRiskScore.site_id]
+
+# Sites read per batch while recomputing
+RECOMPUTE_BATCH_ROWS = 5000
+
+
+def score_site_risk(
+    days_inactive: Optional[int],
+    storage_usage_percent: float,
+    external_users: int,
+    overdue_reviews: int,
+    recent_anomalies: int
+) -> Tuple[int, str, List[str]]:
+    """
+    Risk score of a site from its factors
+
+    Args:
+        days_inactive: Days since the last activity (None if unknown)
+        storage_usage_percent: Storage used as a percentage of the quota
+        external_users: External user permission entries
+        overdue_reviews: Open access review cycles past their due date
+        recent_anomalies: Anomalies flagged in the last RISK_ANOMALY_WINDOW
+
+    Returns:
+        (score 0-100, risk level, human-readable factors)
+    """
+    risk_score = 0
+    factors = []
+
+    # Factor 1: Inactivity (max 20 points)
+    if days_inactive is not None:
+        if days_inactive > 180:
+            risk_score += 20
+            factors.append(f"Inactive for {days_inactive} days")
+        elif days_inactive > 90:
+            risk_score += 10
+            factors.append(f"Inactive for {days_inactive} days")
+
+    # Factor 2: Storage usage (max 15 points)
+    if storage_usage_percent > 90:
+        risk_score += 15
+        factors.append("Storage usage critical")
+    elif storage_usage_percent > 75:
+        risk_score += 8
+        factors.append("Storage usage high")
+
+    # Factor 3: External users (max 25 points)
+    if external_users > 10:
+        risk_score += 25
+        factors.append(f"{external_users} external users")
+    elif external_users > 0:
+        risk_score += 15
+        factors.append(f"{external_users} external users")
+
+    # Factor 4: Overdue access reviews (max 20 points)
+    if overdue_reviews > 0:
+        risk_score += 20
+        factors.append(f"{overdue_reviews} overdue reviews")
+
+    # Factor 5: Recent anomalies (max 20 points)
+    if recent_anomalies > 5:
+        risk_score += 20
+        factors.append(f"{recent_anomalies} recent anomalies")
+    elif recent_anomalies > 0:
+        risk_score += 10
+        factors.append(f"{recent_anomalies} recent anomalies")
+
+    # Determine risk level
+    if risk_score >= 70:
+        risk_level = "critical"
+    elif risk_score >= 50:
+        risk_level = "high"
+    elif risk_score >= 30:
+        risk_level = "medium"
+    else:
+        risk_level = "low"
+
+    return min(risk_score, 100), risk_level, factors
+
+
+class SiteRiskService:
+    """
+    Materialized site risk scores
+
+    recompute() derives every factor for every site from three grouped
+    queries (external users, overdue reviews, recent anomalies) plus one
+    pass over the sites, and upserts site_risk_scores. The scheduler runs it
+    after site discovery and after each audit sync.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def recompute(self, site_ids: Optional[Sequence[uuid.UUID]] = None) -> int:
+        """
+        Recompute and store risk scores
+
+        Args:
+            site_ids: Sites to recompute (default: all)
+
+        Returns:
+            Number of sites scored
+        """
+        now = datetime.utcnow()
+
+        external_query = self.db.query(AccessMatrix.site_id, func.count()).filter(
+            AccessMatrix.is_external_user == True
+        )
+        overdue_query = self.db.query(AccessReviewCycle.site_id, func.count()).filter(
+            AccessReviewCycle.due_date < now,
+            AccessReviewCycle.status.in_(OPEN_REVIEW_STATUSES)
+        )
+        anomaly_query = self.db.query(AuditAnomaly.site_id, func.count()).filter(
+            AuditAnomaly.event_datetime >= now - RISK_ANOMALY_WINDOW,
+            AuditAnomaly.site_id.isnot(None)
+        )
+        site_query = self.db.query(
+            SharePointSite.site_id,
+            SharePointSite.name,
+            SharePointSite.site_url,
+            SharePointSite.last_activity,
+            SharePointSite.storage_used_mb,
+            SharePointSite.storage_quota_mb,
+        )
+
+        if site_ids is not None:
+            external_query = external_query.filter(AccessMatrix.site_id.in_(site_ids))
+            overdue_query = overdue_query.filter(AccessReviewCycle.site_id.in_(site_ids))
+            anomaly_query = anomaly_query.filter(AuditAnomaly.site_id.in_(site_ids))
+            site_query = site_query.filter(SharePointSite.site_id.in_(site_ids))
+
+        external_users = dict(external_query.group_by(AccessMatrix.site_id).all())
+        overdue_reviews = dict(overdue_query.group_by(AccessReviewCycle.site_id).all())
+        recent_anomalies = dict(anomaly_query.group_by(AuditAnomaly.site_id).all())
+
+        rows = []
+        for site in site_query.yield_per(RECOMPUTE_BATCH_ROWS):
+            days_inactive = (now - site.last_activity).days if site.last_activity else None
+            storage_usage_percent = (
+                (site.storage_used_mb or 0) / site.storage_quota_mb * 100 if site.storage_quota_mb else 0.0
+            )
+            factors = {
+                'days_inactive': days_inactive,
+                'storage_usage_percent': storage_usage_percent,
+                'external_users': external_users.get(site.site_id, 0),
+                'overdue_reviews': overdue_reviews.get(site.site_id, 0),
+                'recent_anomalies': recent_anomalies.get(site.site_id, 0),
+            }
+            risk_score, risk_level, risk_factors = score_site_risk(**factors)
+            rows.append({
+                'site_id': site.site_id,
+                'site_name': site.name,
+                'site_url': site.site_url,
+                'risk_score': risk_score,
+                'risk_level': risk_level,
+                'risk_factors': risk_factors,
+                'computed_at': now,
+                **factors,
+            })
+
+        BulkWriter(self.db).upsert(
+            SiteRiskScore,
+            rows,
+            conflict_columns=['site_id'],
+            update_columns=[column for column in rows[0] if column != 'site_id'] if rows else [],
+        )
+        self.db.commit()
+
+        logger.info(f"Recomputed risk scores for {len(rows)} sites")
+        return len(rows)
+
+    def get(self, site_id: str) -> Dict[str, Any]:
+        """
+        Stored risk score of a site, computing it first if the site has none yet
+
+        Args:
+            site_id: Site ID
+
+        Returns:
+            Risk score, level, factors and factor inputs
+
+        Raises:
+            ValueError: If the site does not exist
+        """
+        try:
+            site_uuid = uuid.UUID(str(site_id))
+        except ValueError:
+            raise ValueError(f"Site {site_id} not found")
+
+        score = self.db.get(SiteRiskScore, site_uuid)
+        if score is None:
+            if not self.recompute([site_uuid]):
+                raise ValueError(f"Site {site_id} not found")
+            score = self.db.get(SiteRiskScore, site_uuid)
+
+        return self._to_dict(score)
+
+    def ranking(self, limit: int = 50, cursor: Optional[str] = None, risk_level: Optional[str] = None) -> KeysetPage:
+        """
+        Sites ranked by risk score, highest first
+
+        Args:
+            limit: Page size
+            cursor: Cursor from a previous page
+            risk_level: Optional risk level to filter
+
+        Returns:
+            Page of risk score dicts
+
+        Raises:
+            InvalidCursor: If the cursor is malformed
+        """
+        query = self.db.query(SiteRiskScore)
+        if risk_level:
+            query = query.filter(SiteRiskScore.risk_level == risk_level)
+
+        page = paginate(
+            lambda direction, key, n: keyset_rows(query, RISK_RANKING_KEY, direction, key, n, descending=True),
+            lambda score: (score.risk_score, score.site_id),
+            limit,
+            cursor
+        )
+        page.items = [self._to_dict(score) for score in page.items]
+        return page
+
+    @staticmethod
+    def _to_dict(score: SiteRiskScore) -> Dict[str, Any]:
+        return {
+            "site_id": str(score.site_id),
+            "site_name": score.site_name,
+            "site_url": score.site_url,
+            "risk_score": score.risk_score,
+            "risk_level": score.risk_level,
+            "risk_factors": score.risk_factors or [],
+            "factors": {
+                "days_inactive": score.days_inactive,
+                "storage_usage_percent": round(score.storage_usage_percent, 1),
+                "external_users": score.external_users,
+                "overdue_reviews": score.overdue_reviews,
+                "recent_anomalies": score.recent_anomalies,
+            },
+            "computed_at": score.computed_at.isoformat(),
+        }
+
+
+def get_site_risk_service(db: Session) -> SiteRiskService:
+    """Dependency to get site risk service"""
+    return SiteRiskService(db)
@@ -0,0 +1,143 @@
+"""
+Site URL index - longest-prefix mapping from resource URLs to SharePoint sites
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+from sqlalchemy.orm import Session
+import logging
+import time
+import uuid
+
+from app.models.site import SharePointSite
+
+logger = logging.getLogger(__name__)
+
+
+def split_site_url(url: str) -> Tuple[Optional[str], List[str]]:
+    """
+    Normalize a URL into its host and path segments
+
+    Scheme, query string, fragment and empty segments are dropped, percent
+    escapes are decoded and everything is lower-cased, so
+    'https://Tenant.sharepoint.com/sites/HR/Shared%20Documents/' becomes
+    ('tenant.sharepoint.com', ['sites', 'hr', 'shared documents']).
+
+    Args:
+        url: Absolute URL, host-relative URL without scheme, or server-relative path
+
+    Returns:
+        (host, segments); host is None for server-relative paths
+    """
+    url = url.strip()
+    if "://" not in url and not url.startswith("/"):
+        url = "//" + url  # 'tenant.sharepoint.com/sites/x' without a scheme
+
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname or None
+    except ValueError:
+        # e.g. unbalanced brackets in a display name that is not a URL
+        return None, []
+
+    segments = [unquote(segment).lower() for segment in parts.path.split("/") if segment]
+    return host, segments
+
+
+class _Node:
+    """Trie node keyed by path segment"""
+    __slots__ = ("children", "site_id")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.site_id: Optional[uuid.UUID] = None
+
+
+class SiteUrlIndex:
+    """
+    Host + path-segment trie over sharepoint_sites.site_url
+
+    Resolving a resource URL walks its segments once and returns the
+    deepest registered site, so lookups cost O(path length) and a file under
+    /sites/hr/projects maps to that subsite rather than to /sites/hr - or to
+    an unrelated site whose URL merely contains the same text.
+    """
+
+    def __init__(self):
+        self._hosts: Dict[str, _Node] = {}
+        self._paths = _Node()  # host-less trie for server-relative paths
+        self._built_at: Optional[float] = None
+        self.size = 0
+
+    def build(self, sites: Iterable[Tuple[uuid.UUID, str]]):
+        """
+        Replace the index with the given sites
+
+        Args:
+            sites: (site_id, site_url) pairs
+        """
+        hosts: Dict[str, _Node] = {}
+        paths = _Node()
+        size = 0
+
+        for site_id, site_url in sites:
+            if not site_url:
+                continue
+            host, segments = split_site_url(site_url)
+            if not host:
+                continue
+
+            for node in (hosts.setdefault(host, _Node()), paths):
+                for segment in segments:
+                    node = node.children.setdefault(segment, _Node())
+                # A path shared by several hosts keeps its first site
+                if node.site_id is None:
+                    node.site_id = site_id
+            size += 1
+
+        # Swap in the finished tries so concurrent readers never see a partial index
+        self._hosts, self._paths, self.size = hosts, paths, size
+        self._built_at = time.monotonic()
+
+    def rebuild(self, db: Session):
+        """Rebuild the index from the sharepoint_sites table"""
+        rows = db.query(SharePointSite.site_id, SharePointSite.site_url).yield_per(5000)
+        self.build(rows)
+        logger.info(f"Site URL index rebuilt with {self.size} sites")
+
+    def ensure_fresh(self, db: Session, max_age_seconds: float):
+        """Rebuild the index if it was never built or is older than max_age_seconds"""
+        if self._built_at is None or time.monotonic() - self._built_at > max_age_seconds:
+            self.rebuild(db)
+
+    def resolve(self, url: Optional[str]) -> Optional[uuid.UUID]:
+        """
+        Find the site containing a resource
+
+        Args:
+            url: Site, list, folder or file URL (absolute or server-relative)
+
+        Returns:
+            Site ID of the longest matching site URL, or None
+        """
+        if not url:
+            return None
+
+        host, segments = split_site_url(url)
+        if not host and not url.lstrip().startswith("/"):
+            return None
+        node = self._hosts.get(host) if host else self._paths
+        if node is None:
+            return None
+
+        match = node.site_id
+        for segment in segments:
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.site_id is not None:
+                match = node.site_id
+        return match
+
+
+# Global index shared by audit sync in this process
+site_url_index = SiteUrlIndex()
@@ -9,6 +9,7 @@ import ldap
 from app.models.user import User, UserRole
 from app.core.config import settings
 from app.core.auth import determine_role_from_groups
+from app.services.identity_resolver import identity_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -106,6 +107,9 @@ class UserService:
             self.db.commit()
             conn.unbind_s()
             
+            # Pick up new and changed users for the jobs that resolve emails
+            identity_resolver.refresh(self.db)
+            
             logger.info(f"User sync completed: {stats}")
             return stats
         
@@ -0,0 +1,54 @@
+"""
+Re-fetch the audit log history from Microsoft 365
+
+Run after a fresh install or an outage longer than the incremental sync can
+catch up on:
+
+    python -m app.tasks.audit_backfill
+    python -m app.tasks.audit_backfill --months 3
+
+Events already stored are skipped, so a backfill can be re-run safely; the
+incremental sync watermark is left unchanged.
+"""
+import argparse
+import asyncio
+import logging
+
+from app.db.session import SessionLocal
+from app.integrations.graph_client import graph_service
+from app.services.audit_service import AuditService
+
+logger = logging.getLogger(__name__)
+
+
+async def run_backfill(months=None) -> int:
+    """
+    Backfill the audit log history
+
+    Args:
+        months: How far back to go (default: AUDIT_LOG_RETENTION_MONTHS)
+
+    Returns:
+        Number of audit logs synced
+    """
+    db = SessionLocal()
+    try:
+        return await AuditService(db).backfill(months)
+    finally:
+        db.close()
+        await graph_service.aclose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-fetch the audit log history from Microsoft 365")
+    parser.add_argument("--months", type=int, help="How far back to go (default: AUDIT_LOG_RETENTION_MONTHS)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    synced = asyncio.run(run_backfill(args.months))
+    logger.info(f"Audit backfill completed: {synced} events synced")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Rebuild the hourly audit rollups and daily audit sketches from audit_logs
+
+Run after bulk-loading audit rows outside AuditService (restores, manual
+imports) or after correcting audit data:
+
+    python -m app.tasks.rollups --days 30
+    python -m app.tasks.rollups --start 2026-01-01 --end 2026-02-01
+
+--baselines also replaces the behaviour baselines with ones built from the
+start of the range (a few ANOMALY_BASELINE_HALF_LIFE_DAYS back is enough).
+"""
+from datetime import datetime, timedelta
+import argparse
+import logging
+
+from app.db.session import SessionLocal
+from app.services.audit_rollup_service import AuditRollupService
+from app.services.audit_sketch_service import AuditSketchService
+from app.services.behavior_baseline_service import BehaviorBaselineService
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_rollups(start: datetime, end: datetime, baselines: bool = False) -> int:
+    """
+    Recompute the audit rollups and sketches for a time range
+
+    Sketches are per day, so they are rebuilt for every day the range touches.
+
+    Args:
+        start: Start of the range
+        end: End of the range (exclusive)
+        baselines: Also rebuild the behaviour baselines from start
+
+    Returns:
+        Number of audit events counted
+    """
+    db = SessionLocal()
+    try:
+        counted = AuditRollupService(db).rebuild(start, end)
+        AuditSketchService(db).rebuild(start, end)
+        if baselines:
+            BehaviorBaselineService(db).rebuild(start)
+        return counted
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the hourly audit rollups and daily audit sketches from audit_logs")
+    range_group = parser.add_mutually_exclusive_group(required=True)
+    range_group.add_argument("--days", type=int, help="Rebuild the last N days")
+    range_group.add_argument("--start", type=datetime.fromisoformat, help="Start of the range (ISO date/time, UTC)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="End of the range (default: now)")
+    parser.add_argument("--baselines", action="store_true", help="Also rebuild the behaviour baselines from the start of the range")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    end = args.end or datetime.utcnow()
+    start = args.start or end - timedelta(days=args.days)
+
+    counted = rebuild_rollups(start, end, args.baselines)
+    logger.info(f"Audit rollups and sketches rebuilt from {start} to {end}: {counted} events")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,6 @@ Background job scheduler using APScheduler
 """
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
 import logging
 
 from app.core.config import settings
@@ -15,10 +14,23 @@ logger = logging.getLogger(__name__)
 scheduler = AsyncIOScheduler()
 
 
+def recompute_site_risk(db):
+    """Refresh the materialized site risk scores (failures do not fail the calling job)"""
+    try:
+        from app.services.site_risk_service import SiteRiskService
+        
+        scored = SiteRiskService(db).recompute()
+        logger.info(f"Site risk scores recomputed for {scored} sites")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Site risk recompute failed: {str(e)}", exc_info=True)
+
+
 async def site_discovery_job():
     """
     Background job for automated site discovery
-    Runs daily at 2 AM
+    Runs daily at 2 AM (incremental via delta queries unless SITE_DISCOVERY_MODE=full),
+    then recomputes the site risk scores
     """
     logger.info("Starting scheduled site discovery job")
     
@@ -28,9 +40,11 @@ async def site_discovery_job():
         db = SessionLocal()
         try:
             discovery_service = SiteDiscoveryService(db)
-            stats = await discovery_service.discover_all_sites()
+            stats = await discovery_service.discover_sites()
             
             logger.info(f"Site discovery job completed successfully: {stats}")
+            
+            recompute_site_risk(db)
         finally:
             db.close()
     
@@ -41,25 +55,30 @@ async def site_discovery_job():
 async def audit_sync_job():
     """
     Background job for syncing audit logs from Microsoft 365
-    Runs every 6 hours
+    Runs every 6 hours, resuming from the persisted watermark, then scores
+    the new events for anomalies when FEATURE_AI_ANOMALY_DETECTION is on and
+    recomputes the site risk scores
     """
     logger.info("Starting scheduled audit log sync job")
     
     try:
         from app.services.audit_service import AuditService
-        from datetime import timedelta
         
         db = SessionLocal()
         try:
             audit_service = AuditService(db)
+            stats = await audit_service.sync_incremental()
             
-            # Sync last 6 hours of audit logs
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(hours=6)
+            logger.info(f"Audit sync job completed: {stats}")
             
-            count = await audit_service.sync_audit_logs(start_date, end_date)
+            if settings.FEATURE_AI_ANOMALY_DETECTION:
+                # Score only the events this sync ingested
+                from app.services.anomaly_detection_service import AnomalyDetectionService
+                
+                anomaly_stats = await AnomalyDetectionService(db).score_new_events()
+                logger.info(f"Anomaly scoring after audit sync completed: {anomaly_stats}")
             
-            logger.info(f"Audit sync job completed: {count} logs synced")
+            recompute_site_risk(db)
         finally:
             db.close()
     
@@ -67,6 +86,52 @@ async def audit_sync_job():
         logger.error(f"Audit sync job failed: {str(e)}", exc_info=True)
 
 
+async def anomaly_training_job():
+    """
+    Background job for fitting the anomaly detection model
+    Runs daily at 3 AM on the rolling ANOMALY_TRAINING_WINDOW_DAYS window
+    """
+    logger.info("Starting scheduled anomaly model training job")
+    
+    try:
+        from app.services.anomaly_detection_service import AnomalyDetectionService
+        
+        db = SessionLocal()
+        try:
+            anomaly_service = AnomalyDetectionService(db)
+            version = await anomaly_service.train_model()
+            
+            logger.info(f"Anomaly model training completed: version {version}")
+        finally:
+            db.close()
+    
+    except Exception as e:
+        logger.error(f"Anomaly model training job failed: {str(e)}", exc_info=True)
+
+
+async def audit_partition_job():
+    """
+    Background job for audit_logs partition maintenance
+    Runs daily: pre-creates upcoming monthly partitions and expires old ones
+    """
+    logger.info("Starting scheduled audit partition maintenance job")
+    
+    try:
+        from app.services.audit_partition_service import AuditPartitionService
+        
+        db = SessionLocal()
+        try:
+            partition_service = AuditPartitionService(db)
+            stats = partition_service.run_maintenance()
+            
+            logger.info(f"Audit partition maintenance completed: {stats}")
+        finally:
+            db.close()
+    
+    except Exception as e:
+        logger.error(f"Audit partition maintenance job failed: {str(e)}", exc_info=True)
+
+
 async def user_sync_job():
     """
     Background job for syncing users from Active Directory
@@ -139,6 +204,27 @@ def start_scheduler():
     )
     logger.info(f"Scheduled: Audit Sync - {settings.AUDIT_SYNC_SCHEDULE_CRON}")
     
+    # Add audit partition maintenance job (daily)
+    scheduler.add_job(
+        audit_partition_job,
+        trigger=CronTrigger.from_crontab(settings.AUDIT_PARTITION_SCHEDULE_CRON),
+        id='audit_partition_maintenance',
+        name='Audit Partition Maintenance',
+        replace_existing=True
+    )
+    logger.info(f"Scheduled: Audit Partition Maintenance - {settings.AUDIT_PARTITION_SCHEDULE_CRON}")
+    
+    # Add anomaly model training job (daily at 3 AM)
+    if settings.FEATURE_AI_ANOMALY_DETECTION:
+        scheduler.add_job(
+            anomaly_training_job,
+            trigger=CronTrigger.from_crontab(settings.ANOMALY_TRAINING_SCHEDULE_CRON),
+            id='anomaly_training',
+            name='Anomaly Model Training',
+            replace_existing=True
+        )
+        logger.info(f"Scheduled: Anomaly Model Training - {settings.ANOMALY_TRAINING_SCHEDULE_CRON}")
+    
     # Add user sync job (daily at 1 AM)
     scheduler.add_job(
         user_sync_job,
@@ -169,3 +255,6 @@ def stop_scheduler():
     if scheduler.running:
         scheduler.shutdown()
         logger.info("Background job scheduler stopped")
+    
+    from app.services.anomaly_detection_service import shutdown_training_pool
+    shutdown_training_pool()
@@ -1,16 +1,41 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Dict, Any
 import logging
+import os
+
+from model import risk_model
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Largest batch accepted by /predict/risk/batch
+MAX_BATCH_ROWS = int(os.getenv("ML_MAX_BATCH_ROWS", "20000"))
+
+CONFIDENCE = 0.85
+
+DEFAULT_MODEL_PATH = "/app/models/risk_model.joblib"
+
+# An explicitly configured model file that is missing fails readiness rather
+# than quietly serving rule-based scores; a missing default file falls back
+MODEL_PATH = os.getenv("RISK_MODEL_PATH")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model before serving, so no request pays for it
+    await run_in_threadpool(risk_model.load_model, MODEL_PATH or DEFAULT_MODEL_PATH)
+    yield
+
+
 app = FastAPI(
     title="SharePoint Governance ML Service",
     description="ML Inference Service for predictive analytics and anomaly detection",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 class PredictionRequest(BaseModel):
@@ -23,10 +48,39 @@ class PredictionResponse(BaseModel):
     anomalies: List[str]
     confidence: float
 
+class BatchPredictionRequest(BaseModel):
+    site_ids: List[str]
+    features: Dict[str, List[float]]  # feature name -> one value per site
+
+class BatchPredictionResponse(BaseModel):
+    model_config = {"protected_namespaces": ()}  # allow the model_version field
+    
+    site_ids: List[str]
+    risk_scores: List[float]
+    anomalies: List[List[str]]
+    confidence: float
+    model_version: str
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "ml-service"}
 
+@app.get("/ready")
+async def readiness_check():
+    if not risk_model.is_loaded:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if MODEL_PATH and risk_model.missing_model_path:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model file {risk_model.missing_model_path} not found, only rule-based scores available"
+        )
+    return {
+        "status": "ready",
+        "model_version": risk_model.version,
+        "fallback": risk_model.is_fallback,
+        "loaded_at": risk_model.loaded_at.isoformat()
+    }
+
 @app.get("/")
 async def root():
     return {"message": "SharePoint Governance ML Service is running"}
@@ -35,28 +89,38 @@ async def root():
 async def predict_risk(request: PredictionRequest):
     """
     Predict risk score for a given site based on features.
-    This is a stub implementation connecting to the model skeleton.
     """
     logger.info(f"Received prediction request for site: {request.site_id}")
     
-    # Placeholder logic - to be replaced by actual model inference
-    # In a real implementation, this would call model.predict(request.features)
-    
-    risk_score = 0.15  # Low risk default
-    anomalies = []
+    risk_score, anomalies = risk_model.predict(request.features)
     
-    # Simple rule-based logic for demonstration
-    if request.features.get("external_sharing_count", 0) > 10:
-        risk_score += 0.4
-        anomalies.append("High external sharing detected")
-        
-    if request.features.get("sensitive_files_count", 0) > 50:
-        risk_score += 0.3
-        anomalies.append("Large volume of sensitive data")
-        
     return PredictionResponse(
         site_id=request.site_id,
-        risk_score=min(risk_score, 1.0),
+        risk_score=risk_score,
+        anomalies=anomalies,
+        confidence=CONFIDENCE
+    )
+
+@app.post("/predict/risk/batch", response_model=BatchPredictionResponse)
+async def predict_risk_batch(request: BatchPredictionRequest):
+    """
+    Predict risk scores for many sites in one call.
+    Features are columnar: each feature maps to one value per site, in site_ids order.
+    """
+    rows = len(request.site_ids)
+    if rows > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ROWS} sites per batch")
+    for name, values in request.features.items():
+        if len(values) != rows:
+            raise HTTPException(status_code=422, detail=f"Feature {name} has {len(values)} values for {rows} sites")
+    
+    # Scoring is CPU-bound; keep the event loop free for probes and other requests
+    scores, anomalies = await run_in_threadpool(risk_model.predict_batch, request.features, rows)
+    
+    return BatchPredictionResponse(
+        site_ids=request.site_ids,
+        risk_scores=scores.tolist(),
         anomalies=anomalies,
-        confidence=0.85
+        confidence=CONFIDENCE,
+        model_version=risk_model.version
     )
@@ -1,31 +1,100 @@
 import logging
-from typing import Dict, Any
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Features used by the rule-based fallback (and expected by a trained model
+# without feature_names_in_), in column order
+FEATURE_NAMES = ["external_sharing_count", "sensitive_files_count"]
+
+BASE_RISK = 0.15  # Low risk default
+
+
 class RiskModel:
     def __init__(self):
         self.model = None
         self.is_loaded = False
+        self.version: Optional[str] = None
+        self.loaded_at: Optional[datetime] = None
+        # Set when a model file was asked for but rule-based scores are served
+        self.missing_model_path: Optional[str] = None
+
+    @property
+    def is_fallback(self) -> bool:
+        """Whether rule-based scores are served instead of a trained model"""
+        return self.is_loaded and self.model is None
 
-    def load_model(self, model_path: str = None):
+    @property
+    def feature_names(self) -> List[str]:
+        names = getattr(self.model, "feature_names_in_", None)
+        return list(names) if names is not None else FEATURE_NAMES
+
+    def load_model(self, model_path: Optional[str] = None):
         """
-        Load ML model from path (e.g. .pkl file or MLflow)
+        Load ML model from path (a joblib file with a scikit-learn classifier)
+
+        Without a model file the rule-based scores are served.
         """
         logger.info("Loading risk prediction model...")
-        # Placeholder for loading logic:
-        # self.model = joblib.load(model_path)
+        self.missing_model_path = None
+        if model_path and os.path.exists(model_path):
+            import joblib
+
+            self.model = joblib.load(model_path)
+            self.version = os.path.basename(model_path)
+        else:
+            if model_path:
+                logger.warning(f"Model file {model_path} not found, using rule-based scoring")
+                self.missing_model_path = model_path
+            self.model = None
+            self.version = "rules"
+        self.loaded_at = datetime.utcnow()
         self.is_loaded = True
-        logger.info("Risk prediction model loaded successfully")
+        logger.info(f"Risk prediction model loaded successfully (version {self.version})")
 
-    def predict(self, features: Dict[str, Any]) -> float:
+    def predict(self, features: Dict[str, Any]) -> Tuple[float, List[str]]:
         """
         Make prediction based on features
         """
+        scores, anomalies = self.predict_batch({name: [value] for name, value in features.items()}, 1)
+        return float(scores[0]), anomalies[0]
+
+    def predict_batch(self, columns: Dict[str, Sequence[float]], rows: int) -> Tuple[np.ndarray, List[List[str]]]:
+        """
+        Score many sites at once from columnar features
+
+        Missing feature columns count as 0.
+
+        Returns:
+            (risk scores in [0, 1], anomaly descriptions per site)
+        """
         if not self.is_loaded:
-            self.load_model()
-            
-        # Placeholder prediction logic
-        return 0.5
+            raise RuntimeError("Risk model is not loaded")
+
+        def column(name: str) -> np.ndarray:
+            if name not in columns:
+                return np.zeros(rows)
+            return np.asarray(columns[name], dtype=np.float64)
+
+        high_sharing = column("external_sharing_count") > 10
+        sensitive_volume = column("sensitive_files_count") > 50
+
+        if self.model is not None:
+            matrix = np.column_stack([column(name) for name in self.feature_names])
+            scores = self.model.predict_proba(matrix)[:, 1]
+        else:
+            scores = np.minimum(BASE_RISK + 0.4 * high_sharing + 0.3 * sensitive_volume, 1.0)
+
+        anomalies = [[] for _ in range(rows)]
+        for index in np.flatnonzero(high_sharing):
+            anomalies[index].append("High external sharing detected")
+        for index in np.flatnonzero(sensitive_volume):
+            anomalies[index].append("Large volume of sensitive data")
+
+        return scores, anomalies
 
 risk_model = RiskModel()
@@ -0,0 +1,56 @@
+"""
+Unit tests for access matrix rows built by site discovery
+"""
+import uuid
+
+from app.core.config import settings
+from app.integrations.graph_client import graph_service
+from app.services.identity_resolver import identity_resolver
+from app.services.site_discovery_service import ACCESS_MATRIX_KEY_COLUMNS, SiteDiscoveryService
+
+
+def test_unresolved_grantees_stay_distinct():
+    """Test two grantees missing from the directory keep one access row each"""
+    site_id = uuid.uuid4()
+    permissions = [
+        {'roles': ['read'], 'grantedTo': {'user': {'email': 'alice@fabrikam.com'}}},
+        {'roles': ['read'], 'grantedTo': {'user': {'email': 'bob@fabrikam.com'}}},
+    ]
+
+    rows = SiteDiscoveryService(db=None)._access_rows(site_id, permissions)
+
+    assert [row['user_id'] for row in rows] == [None, None]
+    assert [row['user_email'] for row in rows] == ['alice@fabrikam.com', 'bob@fabrikam.com']
+    # BulkWriter.sync_children keeps one row per key
+    keys = {tuple(row[column] for column in ACCESS_MATRIX_KEY_COLUMNS) for row in rows}
+    assert len(keys) == 2
+
+
+def test_external_grantees_by_tenant_domain(monkeypatch):
+    """Test only grantees outside TENANT_DOMAINS are external"""
+    monkeypatch.setattr(settings, 'TENANT_DOMAINS', ['contoso.com'])
+    permissions = [
+        {'roles': ['write'], 'grantedTo': {'user': {'email': 'alice@contoso.com'}}},
+        {'roles': ['read'], 'grantedTo': {'user': {'email': 'bob@eu.contoso.com'}}},
+        {'roles': ['read'], 'grantedTo': {'user': {'email': 'guest@fabrikam.com'}}},
+    ]
+
+    rows = SiteDiscoveryService(db=None)._access_rows(uuid.uuid4(), permissions)
+
+    assert [row['is_external_user'] for row in rows] == [False, False, True]
+    assert [row['external_user_email'] for row in rows] == [None, None, 'guest@fabrikam.com']
+
+
+def test_first_kept_owner_is_primary(monkeypatch):
+    """Test the primary owner is the first owner actually kept"""
+    known = uuid.uuid4()
+    monkeypatch.setattr(graph_service, 'filter_owners', lambda permissions: permissions)
+    monkeypatch.setattr(identity_resolver, 'resolve', lambda email: known if email == 'known@contoso.com' else None)
+    permissions = [
+        {'roles': ['owner'], 'grantedTo': {'user': {'email': 'new@contoso.com'}}},
+        {'roles': ['owner'], 'grantedTo': {'user': {'email': 'known@contoso.com'}}},
+    ]
+
+    rows = SiteDiscoveryService(db=None)._owner_rows(uuid.uuid4(), permissions)
+
+    assert [(row['user_id'], row['is_primary_owner']) for row in rows] == [(known, True)]
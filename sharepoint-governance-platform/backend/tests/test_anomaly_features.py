@@ -0,0 +1,29 @@
+"""
+Unit tests for anomaly detection feature extraction
+"""
+from datetime import datetime
+
+import numpy as np
+
+from app.services.anomaly_detection_service import AnomalyDetectionService
+
+
+def test_extract_features_matches_event_fields():
+    """Test vectorized features agree with per-event datetime and operation checks"""
+    event_datetimes = [
+        datetime(2026, 10, 12, 3, 59),   # Monday
+        datetime(2026, 10, 17, 23, 0),   # Saturday
+        datetime(1969, 12, 31, 12, 30),  # Wednesday, before the epoch
+    ]
+    operations = ['FileDownloaded', 'PermissionModified', 'SiteDeleted']
+
+    features = AnomalyDetectionService(db=None)._extract_features(
+        np.array(event_datetimes, dtype='datetime64[us]'),
+        np.array(operations, dtype=object),
+    )
+
+    expected = [
+        [dt.hour, dt.weekday(), op in ('FileDownloaded', 'FileAccessed'), 'Permission' in op, 'Delete' in op]
+        for dt, op in zip(event_datetimes, operations)
+    ]
+    assert np.array_equal(features, np.array(expected, dtype=np.float64))
@@ -0,0 +1,83 @@
+"""
+Unit tests for streamed audit log exports
+"""
+from datetime import datetime
+import csv
+import gzip
+import io
+import json
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.services.audit_export_service import CSV_HEADER, AuditExportService
+
+
+def make_rows(count):
+    return [
+        {
+            'audit_id': uuid.UUID(int=i + 1),
+            'event_datetime': datetime(2026, 9, 1, 12, i),
+            'event_type': 'SharePoint',
+            'operation': 'FileAccessed',
+            'user_email': f'user{i}@contoso.com' if i % 2 else None,
+            'site_url': 'https://contoso.sharepoint.com/sites/finance',
+            'resource_name': 'budget, "final".xlsx',
+            'result_status': 'Success',
+            'client_ip': None,
+        }
+        for i in range(count)
+    ]
+
+
+def export(monkeypatch, count, format, compress=False):
+    """Encode count stub rows in small chunks"""
+    monkeypatch.setattr(settings, 'EXPORT_CHUNK_BYTES', 256)
+    service = AuditExportService(datetime(2026, 1, 1))
+    monkeypatch.setattr(service, 'iter_rows', lambda: iter(make_rows(count)))
+    return b''.join(service.stream(format, compress=compress))
+
+
+@pytest.mark.parametrize("count", [0, 1, 25])
+def test_json_export_parses(monkeypatch, count):
+    """Test the JSON array is valid for any number of rows"""
+    records = json.loads(export(monkeypatch, count, 'json'))
+
+    assert len(records) == count
+    if count:
+        assert records[0]['audit_id'] == str(uuid.UUID(int=1))
+        assert records[0]['event_datetime'] == '2026-09-01 12:00:00'
+
+
+@pytest.mark.parametrize("count", [0, 1, 25])
+def test_ndjson_export_has_one_object_per_line(monkeypatch, count):
+    """Test NDJSON has no empty lines and ends with a newline"""
+    body = export(monkeypatch, count, 'ndjson').decode('utf-8')
+
+    assert body == '' if not count else body.endswith('}\n')
+    lines = body.split('\n')[:-1] if body else []
+    assert len(lines) == count
+    assert all(line for line in lines)
+    assert [json.loads(line)['user_email'] for line in lines[:2]] == [None, 'user1@contoso.com'][:count]
+
+
+def test_csv_export_header_and_rows(monkeypatch):
+    """Test CSV output has the header and one quoted row per event"""
+    body = export(monkeypatch, 25, 'csv').decode('utf-8')
+
+    rows = list(csv.reader(io.StringIO(body)))
+    assert rows[0] == CSV_HEADER
+    assert len(rows) == 26
+    assert rows[2] == [
+        '2026-09-01T12:01:00', 'SharePoint', 'FileAccessed', 'user1@contoso.com',
+        'https://contoso.sharepoint.com/sites/finance', 'budget, "final".xlsx', 'Success', ''
+    ]
+
+
+@pytest.mark.parametrize("format", ['csv', 'json', 'ndjson'])
+def test_gzip_export_matches_plain(monkeypatch, format):
+    """Test the gzip stream decompresses to the uncompressed body"""
+    plain = export(monkeypatch, 25, format)
+
+    assert gzip.decompress(export(monkeypatch, 25, format, compress=True)) == plain
@@ -0,0 +1,86 @@
+"""
+Unit tests for incremental audit sync windows
+"""
+from datetime import datetime, timedelta
+import asyncio
+
+from app.core.config import settings
+from app.integrations.graph_client import graph_service
+from app.models.sync import SyncCheckpoint
+from app.services import audit_service
+from app.services.audit_service import AUDIT_SYNC_CHECKPOINT, AuditService
+
+
+class CheckpointSession:
+    """Just enough of a Session for sync_incremental's checkpoint handling"""
+
+    def __init__(self, checkpoint: SyncCheckpoint):
+        self.checkpoint = checkpoint
+
+    def get(self, model, key):
+        return self.checkpoint
+
+    def add(self, obj):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_catch_up_window_with_undated_event_keeps_watermark_in_window(monkeypatch):
+    """Test an event without activityDateTime cannot move the watermark past its window"""
+    watermark = datetime.utcnow() - timedelta(days=3)
+    checkpoint = SyncCheckpoint(source=AUDIT_SYNC_CHECKPOINT, watermark=watermark)
+    dated = (watermark + timedelta(hours=1)).isoformat() + 'Z'
+
+    async def fake_audit_logs(start_date, end_date, operations=None, shards=None):
+        yield [
+            {'id': 'dated', 'activityDateTime': dated},
+            {'id': 'undated'},
+        ]
+
+    monkeypatch.setattr(graph_service, 'iter_audit_logs_sharded', fake_audit_logs)
+    monkeypatch.setattr(audit_service.identity_resolver, 'refresh', lambda db: 0)
+    monkeypatch.setattr(audit_service.site_url_index, 'ensure_fresh', lambda db, max_age: None)
+    monkeypatch.setattr(AuditService, '_ingest_rows', lambda self, rows: len(rows))
+    monkeypatch.setattr(settings, 'AUDIT_SYNC_MAX_WINDOWS_PER_RUN', 1)
+
+    stats = asyncio.run(AuditService(CheckpointSession(checkpoint)).sync_incremental())
+
+    window_end = (
+        watermark
+        - timedelta(minutes=settings.AUDIT_SYNC_OVERLAP_MINUTES)
+        + timedelta(hours=settings.AUDIT_SYNC_WINDOW_HOURS)
+    )
+    assert stats['windows'] == 1
+    assert watermark < checkpoint.watermark <= window_end
+
+
+def test_undated_events_are_skipped(monkeypatch):
+    """Test events without a parseable activityDateTime are never ingested"""
+    ingested = []
+
+    async def fake_audit_logs(start_date, end_date, operations=None, shards=None):
+        yield [
+            {'id': 'dated', 'activityDateTime': '2026-10-01T08:30:00Z'},
+            {'id': 'undated'},
+            {'id': 'garbled', 'activityDateTime': 'yesterday'},
+        ]
+
+    monkeypatch.setattr(graph_service, 'iter_audit_logs_sharded', fake_audit_logs)
+    monkeypatch.setattr(audit_service.identity_resolver, 'refresh', lambda db: 0)
+    monkeypatch.setattr(audit_service.site_url_index, 'ensure_fresh', lambda db, max_age: None)
+    monkeypatch.setattr(AuditService, '_ingest_rows', lambda self, rows: ingested.extend(rows) or len(rows))
+    skipped_before = audit_service.AUDIT_UNDATED_EVENTS._value.get()
+
+    synced, latest = asyncio.run(
+        AuditService(CheckpointSession(None))._sync_window(datetime(2026, 10, 1), datetime(2026, 10, 2))
+    )
+
+    assert synced == 1
+    assert [row['ms_audit_id'] for row in ingested] == ['dated']
+    assert latest == datetime(2026, 10, 1, 8, 30)
+    assert audit_service.AUDIT_UNDATED_EVENTS._value.get() - skipped_before == 2
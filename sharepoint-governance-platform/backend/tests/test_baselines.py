@@ -0,0 +1,61 @@
+"""
+Unit tests for decayed behaviour profiles
+"""
+from datetime import datetime, timedelta
+
+from app.core.baselines import BehaviorProfile
+
+
+def _night_shift_profile() -> BehaviorProfile:
+    profile = BehaviorProfile(half_life_days=14)
+    start = datetime(2026, 9, 1)
+    for day in range(20):
+        for hour in (0, 1, 2, 3):
+            profile.add(start + timedelta(days=day, hours=hour), 'FileAccessed', 'https://contoso.sharepoint.com/sites/ops')
+    return profile
+
+
+def test_usual_behaviour_scores_zero():
+    """Test a night-shift user's usual hours, operation and site are not surprising"""
+    profile = _night_shift_profile()
+
+    deviation = profile.deviation(datetime(2026, 9, 25, 2), 'FileAccessed', 'https://contoso.sharepoint.com/sites/ops')
+
+    assert deviation['operation'] == deviation['peer'] == 0.0
+    assert deviation['hour'] < 0.01  # hour 3 is an hour more recent, so marginally heavier
+
+
+def test_unusual_behaviour_scores_bits():
+    """Test unseen hours, operations and sites deviate by several bits"""
+    profile = _night_shift_profile()
+
+    deviation = profile.deviation(datetime(2026, 9, 25, 14), 'PermissionModified', 'https://contoso.sharepoint.com/sites/hr')
+
+    assert all(bits > 3 for bits in deviation.values())
+
+
+def test_weights_decay_with_half_life():
+    """Test weights halve per half-life and late events count less"""
+    profile = BehaviorProfile(half_life_days=1)
+    profile.add(datetime(2026, 10, 1), 'FileAccessed')
+    profile.advance(datetime(2026, 10, 3))
+    profile.add(datetime(2026, 10, 2), 'FileAccessed')
+
+    assert abs(profile.total - 0.75) < 1e-9
+    assert abs(profile.operations['FileAccessed'] - 0.75) < 1e-9
+    assert profile.events == 2
+
+
+def test_round_trip_trims_peers():
+    """Test serialization keeps state and only the most weighted peers"""
+    profile = BehaviorProfile(max_peers=2)
+    when = datetime(2026, 10, 1, 9)
+    for peer, count in (('a', 3), ('b', 2), ('c', 1)):
+        for _ in range(count):
+            profile.add(when, 'FileAccessed', peer)
+
+    restored = BehaviorProfile.from_dict(profile.to_dict(), max_peers=2)
+
+    assert set(restored.peers) == {'a', 'b'}
+    assert restored.as_of == when
+    assert restored.deviation(when, 'FileAccessed', 'a') == profile.deviation(when, 'FileAccessed', 'a')
@@ -0,0 +1,43 @@
+"""
+Unit tests for search filters
+"""
+from sqlalchemy import Column, MetaData, String, Table, create_engine, insert, select
+from sqlalchemy.dialects import postgresql
+
+from app.models.site import SharePointSite
+from app.services.search_service import contains, escape_like
+
+names = Table("names", MetaData(), Column("name", String))
+
+
+def test_escape_like_escapes_wildcards_and_escape_character():
+    """Test %, _ and the escape character itself are escaped"""
+    assert escape_like(r"100%_a\b") == r"100\%\_a\\b"
+
+
+def test_contains_binds_escaped_pattern_with_escape_clause():
+    """Test the compiled filter carries the escaped pattern and an ESCAPE clause"""
+    compiled = contains(SharePointSite.name, "50%_off", case_sensitive=False).compile(dialect=postgresql.dialect())
+
+    assert "ILIKE" in str(compiled) and "ESCAPE '\\\\'" in str(compiled)
+    assert list(compiled.params.values()) == [r"%50\%\_off%"]
+
+
+def test_contains_matches_wildcards_literally():
+    """Test %, _ and backslash in the term only match themselves"""
+    engine = create_engine("sqlite://")
+    names.create(engine)
+    with engine.connect() as connection:
+        connection.execute(insert(names), [
+            {"name": "50% off"}, {"name": "500 off"},
+            {"name": "hr_team"}, {"name": "hr-team"},
+            {"name": r"C:\share"}, {"name": "C:share"},
+        ])
+
+        def search(term):
+            return connection.execute(select(names.c.name).where(contains(names.c.name, term))).scalars().all()
+
+        assert search("0%") == ["50% off"]
+        assert search("r_t") == ["hr_team"]
+        assert search("\\") == [r"C:\share"]
+
@@ -0,0 +1,24 @@
+"""
+Unit tests for site risk scoring
+"""
+from app.services.site_risk_service import score_site_risk
+
+
+def test_quiet_site_is_low_risk():
+    """Test a recently active site without risk factors scores zero"""
+    assert score_site_risk(3, 10.0, 0, 0, 0) == (0, "low", [])
+
+
+def test_factors_add_up_and_cap():
+    """Test every factor at its maximum gives a capped critical score"""
+    risk_score, risk_level, factors = score_site_risk(200, 95.0, 12, 2, 6)
+
+    assert risk_score == 100
+    assert risk_level == "critical"
+    assert factors == [
+        "Inactive for 200 days",
+        "Storage usage critical",
+        "12 external users",
+        "2 overdue reviews",
+        "6 recent anomalies",
+    ]
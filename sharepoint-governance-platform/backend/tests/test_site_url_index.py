@@ -0,0 +1,57 @@
+"""
+Unit tests for the site URL index
+"""
+import uuid
+
+from app.services.site_url_index import SiteUrlIndex, split_site_url
+
+
+ROOT = uuid.uuid4()
+HR = uuid.uuid4()
+HR_PROJECTS = uuid.uuid4()
+HR_ARCHIVE = uuid.uuid4()
+
+
+def build_index() -> SiteUrlIndex:
+    index = SiteUrlIndex()
+    index.build([
+        (ROOT, "https://contoso.sharepoint.com"),
+        (HR, "https://contoso.sharepoint.com/sites/HR"),
+        (HR_PROJECTS, "https://contoso.sharepoint.com/sites/HR/Projects"),
+        (HR_ARCHIVE, "https://contoso.sharepoint.com/sites/HR-Archive"),
+    ])
+    return index
+
+
+def test_split_site_url_normalizes():
+    """Test URLs are lower-cased, decoded and stripped of query and trailing slash"""
+    assert split_site_url("https://Contoso.SharePoint.com/sites/HR/Shared%20Documents/?web=1") == (
+        "contoso.sharepoint.com", ["sites", "hr", "shared documents"]
+    )
+    assert split_site_url("/sites/HR") == (None, ["sites", "hr"])
+
+
+def test_resolve_longest_prefix():
+    """Test a resource maps to the deepest site containing it"""
+    index = build_index()
+
+    assert index.resolve("https://contoso.sharepoint.com/sites/hr/Shared Documents/a.docx") == HR
+    assert index.resolve("https://contoso.sharepoint.com/sites/HR/Projects/Lists/Tasks") == HR_PROJECTS
+    assert index.resolve("https://contoso.sharepoint.com/sites/Finance") == ROOT
+
+
+def test_resolve_does_not_match_on_substring():
+    """Test sites sharing a name prefix are not confused"""
+    index = build_index()
+
+    assert index.resolve("https://contoso.sharepoint.com/sites/HR-Archive/doc.pdf") == HR_ARCHIVE
+    assert index.resolve("https://fabrikam.sharepoint.com/sites/HR") is None
+    assert index.resolve("HR") is None
+    assert index.resolve(None) is None
+
+
+def test_resolve_server_relative_path():
+    """Test server-relative paths resolve without a host"""
+    index = build_index()
+
+    assert index.resolve("/sites/HR/Projects/doc.docx") == HR_PROJECTS
@@ -0,0 +1,69 @@
+"""
+Unit tests for the probabilistic sketches
+"""
+from app.core.sketches import CountMinSketch, HyperLogLog, TopK
+
+
+def test_hyperloglog_estimate_within_error():
+    """Test distinct counts stay within a few standard errors"""
+    sketch = HyperLogLog(precision=12)
+    for i in range(50000):
+        sketch.add(f"user{i % 20000}@contoso.com")
+
+    assert abs(sketch.count() - 20000) <= 4 * sketch.relative_error * 20000
+
+
+def test_hyperloglog_small_counts_are_exact_enough():
+    """Test linear counting keeps small cardinalities accurate"""
+    sketch = HyperLogLog(precision=12)
+    sketch.update(["a", "b", "c", "a"])
+
+    assert sketch.count() == 3
+    assert HyperLogLog().count() == 0
+
+
+def test_hyperloglog_merge_is_union():
+    """Test merging day sketches estimates the union, not the sum"""
+    monday, tuesday, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(3000):
+        monday.add(str(i))
+        union.add(str(i))
+    for i in range(2000, 5000):
+        tuesday.add(str(i))
+        union.add(str(i))
+
+    monday.merge(HyperLogLog.from_bytes(tuesday.to_bytes()))
+
+    assert monday.registers == union.registers
+    assert abs(monday.count() - 5000) <= 4 * monday.relative_error * 5000
+
+
+def test_count_min_never_undercounts():
+    """Test Count-Min estimates are upper bounds within the error bound"""
+    sketch = CountMinSketch(width=256, depth=4)
+    for i in range(5000):
+        sketch.add(f"site{i % 500}", 1 + i % 3)
+
+    restored = CountMinSketch.from_bytes(sketch.to_bytes())
+    for i in range(500):
+        exact = sum(1 + j % 3 for j in range(i, 5000, 500))
+        assert exact <= restored.estimate(f"site{i}") <= exact + restored.error_bound
+    assert restored.total == sketch.total
+
+
+def test_top_k_finds_heavy_hitters_across_merges():
+    """Test the most active values survive merging partial sketches"""
+    parts = [TopK(k=5) for _ in range(3)]
+    for index, part in enumerate(parts):
+        for i in range(300):
+            part.add(f"light{index}-{i}")
+        part.add("alice", 100 + index)
+        part.add("bob", 50)
+
+    merged = TopK(k=5)
+    for part in parts:
+        merged.merge(TopK.from_bytes(part.to_bytes()))
+
+    top = merged.top(2)
+    assert [value for value, _ in top] == ["alice", "bob"]
+    assert top[0][1] >= 303
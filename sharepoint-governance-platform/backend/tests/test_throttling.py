@@ -0,0 +1,55 @@
+"""
+Unit tests for Microsoft 365 throttling helpers
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from app.core.config import settings
+from app.integrations.throttling import AdaptiveRateLimiter, parse_retry_after, backoff_delay
+
+
+def test_parse_retry_after_seconds():
+    """Test Retry-After given as delay-seconds"""
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_parse_retry_after_http_date():
+    """Test Retry-After given as an HTTP-date"""
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = parse_retry_after(format_datetime(retry_at, usegmt=True))
+
+    assert delay is not None
+    assert 25 <= delay <= 30
+
+
+def test_backoff_delay_is_capped():
+    """Test jittered backoff never exceeds the configured ceiling"""
+    for attempt in range(20):
+        delay = backoff_delay(attempt)
+        assert 0 <= delay <= settings.THROTTLE_BACKOFF_MAX_SECONDS
+
+
+def test_rate_limiter_allows_burst_then_waits():
+    """Test the bucket hands out its burst immediately, then asks callers to wait"""
+    limiter = AdaptiveRateLimiter("test", rate=10.0, burst=3, min_rate=1.0)
+
+    assert [limiter._reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter._reserve() > 0
+
+
+def test_rate_limiter_backs_off_on_throttle():
+    """Test throttling halves the rate and pauses for Retry-After"""
+    limiter = AdaptiveRateLimiter("test", rate=10.0, burst=5, min_rate=4.0)
+
+    limiter.on_throttled(retry_after=2.0)
+    assert limiter.rate == 5.0
+    assert limiter._reserve() >= 1.9
+
+    limiter.on_throttled()
+    assert limiter.rate == 4.0  # never below min_rate
+
+    limiter.on_success()
+    assert limiter.rate > 4.0